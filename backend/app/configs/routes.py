@@ -24,6 +24,9 @@ class ConfigPayload(BaseModel):
     analyst: Optional[str] = None
     comments: Optional[str] = None
     last_generated: Optional[str] = None
+    render_source: Optional[str] = None  # "local" | "zabbix"
+    metrics_source: Optional[str] = None  # "db" | "api"
+    use_trends: Optional[bool] = None  # None = automático pelo período
 
     class Config:
         extra = "allow"
@@ -19,3 +19,107 @@ MYSQL_HOSTGLPI = os.getenv("MYSQL_HOSTGLPI")
 MYSQL_USERGLPI = os.getenv("MYSQL_USERGLPI")
 MYSQL_PASSGLPI = os.getenv("MYSQL_PASSGLPI")
 MYSQL_DBGLPI   = os.getenv("MYSQL_DBGLPI")
+
+# Pool HTTP do cliente Zabbix (conexões keep-alive reaproveitadas entre requisições)
+ZABBIX_HTTP_POOL_SIZE = int(os.getenv("ZABBIX_HTTP_POOL_SIZE", "10"))
+
+# Cliente assíncrono (httpx) usado pelas rotas /zabbix/*
+ZABBIX_HTTP_TIMEOUT = float(os.getenv("ZABBIX_HTTP_TIMEOUT", "60"))
+ZABBIX_ASYNC_MAX_CONNECTIONS = int(os.getenv("ZABBIX_ASYNC_MAX_CONNECTIONS", "100"))
+ZABBIX_ASYNC_MAX_KEEPALIVE = int(os.getenv("ZABBIX_ASYNC_MAX_KEEPALIVE", "20"))
+
+# Origem das imagens de gráfico nos relatórios PDF:
+#   "local"  -> histórico do banco + Plotly/Kaleido (padrão)
+#   "zabbix" -> PNG renderizado pelo próprio Zabbix (chart2.php)
+REPORT_RENDER_SOURCE = os.getenv("REPORT_RENDER_SOURCE", "local").lower()
+# Máximo de downloads simultâneos de imagens no modo "zabbix"
+REPORT_IMAGE_WORKERS = int(os.getenv("REPORT_IMAGE_WORKERS", "6"))
+
+# Tamanho da página ao percorrer event.get (cursor por eventid)
+ZABBIX_EVENT_PAGE_SIZE = int(os.getenv("ZABBIX_EVENT_PAGE_SIZE", "5000"))
+# Intervalo mínimo entre atualizações do snapshot de problemas em aberto (segundos)
+ZABBIX_PROBLEMS_REFRESH_SECONDS = float(os.getenv("ZABBIX_PROBLEMS_REFRESH_SECONDS", "30"))
+
+# Espelho local (SQLite) dos eventos para downtime/top triggers/incidentes
+ZABBIX_EVENT_STORE = os.getenv("ZABBIX_EVENT_STORE", "false").lower() in ("1", "true", "yes")
+ZABBIX_EVENT_STORE_DAYS = int(os.getenv("ZABBIX_EVENT_STORE_DAYS", "400"))
+ZABBIX_EVENT_STORE_SYNC_MINUTES = int(os.getenv("ZABBIX_EVENT_STORE_SYNC_MINUTES", "5"))
+
+# Cache em memória de metadados do Zabbix (hostgroups, hosts, gráficos, triggers)
+# ZABBIX_CACHE_TTL=0 desativa o cache
+ZABBIX_CACHE_TTL = int(os.getenv("ZABBIX_CACHE_TTL", "900"))
+ZABBIX_CACHE_MAXSIZE = int(os.getenv("ZABBIX_CACHE_MAXSIZE", "5000"))
+
+# Orçamento de tempo de um relatório PDF (segundos). As chamadas ao Zabbix,
+# MySQL e GLPI usam como timeout o menor entre o padrão e o tempo restante;
+# esgotado o orçamento, os gráficos restantes saem como aviso no PDF.
+REPORT_DEADLINE_SECONDS = float(os.getenv("REPORT_DEADLINE_SECONDS", "100"))
+# Orçamento dos relatórios agendados (fora do timeout do gunicorn); 0 = sem limite
+REPORT_SCHEDULED_DEADLINE_SECONDS = float(os.getenv("REPORT_SCHEDULED_DEADLINE_SECONDS", "0"))
+# Requisição duplicada (hedge) para imagens do chart2.php que passarem do p95
+ZABBIX_HEDGE_IMAGES = os.getenv("ZABBIX_HEDGE_IMAGES", "false").lower() in ("1", "true", "yes")
+
+# Timeouts das conexões MySQL (Zabbix e GLPI), em segundos
+MYSQL_CONNECT_TIMEOUT = float(os.getenv("MYSQL_CONNECT_TIMEOUT", "10"))
+MYSQL_READ_TIMEOUT = float(os.getenv("MYSQL_READ_TIMEOUT", "60"))
+
+# Pool de conexões do MySQL do Zabbix (por processo e por fonte)
+ZABBIX_DB_POOL_SIZE = int(os.getenv("ZABBIX_DB_POOL_SIZE", "10"))
+# Espera máxima por conexão livre, vida máxima e ociosidade antes do ping (segundos)
+ZABBIX_DB_POOL_TIMEOUT = float(os.getenv("ZABBIX_DB_POOL_TIMEOUT", "30"))
+ZABBIX_DB_POOL_MAX_LIFETIME = float(os.getenv("ZABBIX_DB_POOL_MAX_LIFETIME", "1800"))
+ZABBIX_DB_POOL_PING_AFTER = float(os.getenv("ZABBIX_DB_POOL_PING_AFTER", "30"))
+# Linhas por bloco na leitura em streaming (SSCursor) do histórico
+ZABBIX_DB_STREAM_CHUNK = int(os.getenv("ZABBIX_DB_STREAM_CHUNK", "5000"))
+# Onde agregar o histórico dos gráficos (max_points): "sql" (GROUP BY no MySQL) ou "stream" (no backend, em blocos)
+ZABBIX_DB_AGGREGATION = os.getenv("ZABBIX_DB_AGGREGATION", "sql").lower()
+# Cache local (Parquet em STORAGE_DIR/history) dos dias encerrados do histórico
+ZABBIX_HISTORY_CACHE = os.getenv("ZABBIX_HISTORY_CACHE", "false").lower() in ("1", "true", "yes")
+# Tamanho máximo do cache (MB) e espera após o fim do dia para considerá-lo fechado (minutos)
+ZABBIX_HISTORY_CACHE_MAX_MB = int(os.getenv("ZABBIX_HISTORY_CACHE_MAX_MB", "2048"))
+ZABBIX_HISTORY_CACHE_SETTLE_MINUTES = int(os.getenv("ZABBIX_HISTORY_CACHE_SETTLE_MINUTES", "60"))
+# Intervalo (segundos) para reconstruir o índice em memória da view v_zabbix (em segundo plano)
+ZABBIX_TOPOLOGY_REFRESH_SECONDS = float(os.getenv("ZABBIX_TOPOLOGY_REFRESH_SECONDS", "300"))
+
+# Fonte do histórico dos gráficos nos relatórios: "db" (MySQL do Zabbix) ou "api" (history.get/trend.get)
+ZABBIX_METRICS_SOURCE = os.getenv("ZABBIX_METRICS_SOURCE", "db").lower()
+# Janelas maiores que isso (dias) usam trends (fontes "db" e "api"; use_trends por relatório sobrepõe)
+ZABBIX_TRENDS_AFTER_DAYS = float(os.getenv("ZABBIX_TRENDS_AFTER_DAYS", "7"))
+# Fonte "api": tamanho das fatias de history.get (horas) e fatias em paralelo
+ZABBIX_HISTORY_SLICE_HOURS = int(os.getenv("ZABBIX_HISTORY_SLICE_HOURS", "24"))
+ZABBIX_HISTORY_WORKERS = int(os.getenv("ZABBIX_HISTORY_WORKERS", "4"))
+
+# Fontes Zabbix adicionais (além da "default" definida acima), em JSON:
+#   ZABBIX_SOURCES='{"sp": {"api_url": "...", "web_url": "...", "user": "...", "password": "...",
+#                           "mysql": {"host": "...", "user": "...", "password": "...", "db": "..."}}}'
+# ou em um arquivo JSON com o mesmo formato (ZABBIX_SOURCES_FILE).
+ZABBIX_SOURCES = os.getenv("ZABBIX_SOURCES", "")
+ZABBIX_SOURCES_FILE = os.getenv("ZABBIX_SOURCES_FILE", "")
+
+
+def _parse_pairs(raw: str, cast) -> dict:
+    """'a=1,b=2' -> {"a": cast("1"), "b": cast("2")}"""
+    pairs = {}
+    for part in raw.split(","):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            pairs[key.strip()] = cast(value.strip())
+    return pairs
+
+
+# Limitador global (app/core/governor.py): concorrência máxima por recurso,
+# somando todos os workers, e requisições/s (token bucket; 0 = sem limite)
+GOVERNOR_LIMITS = _parse_pairs(
+    os.getenv("GOVERNOR_LIMITS", "zabbix_api=8,zabbix_db=6,glpi_db=4,smtp=2,render=2,default=8"), int
+)
+GOVERNOR_RATES = _parse_pairs(os.getenv("GOVERNOR_RATES", ""), float)
+# Espera máxima na fila de um recurso (segundos; limitada ao deadline do relatório)
+GOVERNOR_MAX_WAIT = float(os.getenv("GOVERNOR_MAX_WAIT", "60"))
+# Coordena os limites entre workers via flock em TMP_DIR/governor
+GOVERNOR_SHARED = os.getenv("GOVERNOR_SHARED", "true").lower() in ("1", "true", "yes")
+
+# Executores das rotas async (app/core/executors.py): threads por worker para trabalho
+# bloqueante (db = consultas MySQL, render = geração de PDF)
+EXECUTOR_WORKERS = _parse_pairs(os.getenv("EXECUTOR_WORKERS", "db=8,render=2"), int)
+# Atraso do event loop (segundos) a partir do qual o monitor registra aviso no log
+LOOP_LAG_WARN_SECONDS = float(os.getenv("LOOP_LAG_WARN_SECONDS", "0.25"))
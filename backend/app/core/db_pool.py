@@ -0,0 +1,202 @@
+# app/core/db_pool.py
+# ------------------------------------------------------------
+# Pool de conexões MySQL (pymysql), limitado e thread-safe.
+#
+# - No máximo 'max_size' conexões abertas por processo; quem excede
+#   espera na fila (até 'timeout', limitado ao deadline ativo).
+# - Health check: conexão ociosa há mais de 'ping_after' segundos
+#   recebe um ping antes de ser entregue; se falhar, é trocada.
+# - Tempo de vida máximo ('max_lifetime'): conexões antigas são
+#   fechadas na devolução/retirada e recriadas sob demanda.
+# - Conexão que deu erro de rede/protocolo é descartada, não volta.
+# - Métricas: abertas, em uso, ociosas, esperando, tempo de espera.
+#
+# Uso:
+#   pool = ConnectionPool("zabbix_db:default", factory, max_size=10)
+#   with pool.connection() as conn:
+#       with conn.cursor() as cursor:
+#           ...
+# ------------------------------------------------------------
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+
+from app.core.deadline import current_deadline, DeadlineExceeded
+from app.core.logging import logger
+
+# Erros que invalidam a conexão (as demais exceções a devolvem ao pool)
+BROKEN_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError, OSError)
+
+
+class PoolTimeout(DeadlineExceeded):
+    """Tempo máximo de espera por uma conexão livre esgotado."""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "returned_at")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.returned_at = self.created_at
+
+
+class ConnectionPool:
+    def __init__(self, name: str, factory, max_size: int = 10, timeout: float = 30.0,
+                 max_lifetime: float = 1800.0, ping_after: float = 30.0):
+        self.name = name
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self._cond = threading.Condition()
+        self._idle = deque()  # LIFO: a conexão mais recente (mais "quente") sai primeiro
+        self._pid = os.getpid()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+        # métricas
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    # ---------------------------- retirada ----------------------------
+
+    def _wait_budget(self) -> float:
+        deadline = current_deadline()
+        return min(self.timeout, deadline.remaining()) if deadline is not None else self.timeout
+
+    def _reset_after_fork(self) -> None:
+        """Conexões herdadas de outro processo (fork do gunicorn) não são reaproveitadas."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._open = self._in_use = self._waiting = 0
+
+    def _checkout(self) -> _PooledConnection:
+        started = time.monotonic()
+        expires = started + self._wait_budget()
+        with self._cond:
+            self._reset_after_fork()
+            self._waiting += 1
+            try:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        waited = time.monotonic() - started
+                        logger.error(f"[DB POOL] {self.name}: sem conexão livre após {waited:.1f}s")
+                        raise PoolTimeout(f"Pool '{self.name}' esgotado: espera de {waited:.1f}s")
+                    self._cond.wait(remaining)
+                pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    self._open += 1  # reserva a vaga; a conexão é aberta fora do lock
+                self._in_use += 1
+            finally:
+                self._waiting -= 1
+            waited = time.monotonic() - started
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+        try:
+            return self._validate(pooled) if pooled else self._create()
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _create(self) -> _PooledConnection:
+        pooled = _PooledConnection(self.factory())
+        with self._cond:
+            self.created += 1
+        return pooled
+
+    def _validate(self, pooled: _PooledConnection) -> _PooledConnection:
+        """Troca conexões vencidas (max_lifetime) ou que não respondem ao ping."""
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_lifetime:
+            self._close(pooled)
+            return self._create()
+        if now - pooled.returned_at > self.ping_after:
+            try:
+                pooled.conn.ping(reconnect=False)
+            except BROKEN_ERRORS:
+                logger.info(f"[DB POOL] {self.name}: conexão ociosa não respondeu ao ping, reabrindo")
+                self._close(pooled)
+                return self._create()
+        return pooled
+
+    # ---------------------------- devolução ----------------------------
+
+    def _close(self, pooled: _PooledConnection) -> None:
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.closed += 1
+
+    def _release(self, pooled: _PooledConnection, broken: bool) -> None:
+        expired = time.monotonic() - pooled.created_at > self.max_lifetime
+        if broken or expired or not pooled.conn.open:
+            self._close(pooled)
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            return
+        pooled.returned_at = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Retira uma conexão do pool; devolve (ou descarta, se quebrou) ao sair do bloco."""
+        pooled = self._checkout()
+        broken = False
+        try:
+            yield pooled.conn
+        except BROKEN_ERRORS:
+            broken = True
+            raise
+        finally:
+            self._release(pooled, broken)
+
+    def close_all(self) -> None:
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for pooled in idle:
+            self._close(pooled)
+
+    # ---------------------------- métricas ----------------------------
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_seconds": round(self.wait_total / self.checkouts, 4) if self.checkouts else 0.0,
+                "wait_max_seconds": round(self.wait_max, 4),
+            }
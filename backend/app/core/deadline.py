@@ -0,0 +1,161 @@
+# app/core/deadline.py
+# ------------------------------------------------------------
+# Orçamento de tempo (deadline) propagado para chamadas externas.
+#
+# - deadline_scope(segundos) abre um orçamento no contexto atual
+#   (contextvar); Zabbix, MySQL e GLPI derivam o timeout de cada
+#   chamada do tempo restante via call_timeout().
+# - Sem deadline ativo, call_timeout() devolve o timeout padrão.
+# - Threads não herdam contextvars: use run_in_context() ao submeter
+#   trabalho a um ThreadPoolExecutor.
+# - hedged(): para leituras idempotentes, dispara uma 2ª requisição
+#   se a 1ª passar do p95 observado e fica com a que terminar antes.
+# ------------------------------------------------------------
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+from app.core.logging import logger
+
+# Menor timeout entregue a uma chamada (evita timeouts de milissegundos)
+MIN_CALL_TIMEOUT = 1.0
+
+_current_deadline = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """O orçamento de tempo da operação acabou antes da chamada."""
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, what: str = "operação") -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"Tempo limite de {self.seconds:g}s esgotado antes de: {what}")
+
+    def timeout(self, default: float, what: str = "chamada") -> float:
+        """Timeout da próxima chamada: o menor entre o padrão e o tempo restante."""
+        self.check(what)
+        return max(MIN_CALL_TIMEOUT, min(default, self.remaining()))
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Abre um orçamento de tempo; um deadline externo mais curto prevalece."""
+    outer = _current_deadline.get()
+    deadline = Deadline(seconds)
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def call_timeout(default: float, what: str = "chamada") -> float:
+    """Timeout para uma chamada externa (lança DeadlineExceeded se o orçamento acabou)."""
+    deadline = _current_deadline.get()
+    return default if deadline is None else deadline.timeout(default, what)
+
+
+def check_deadline(what: str = "operação") -> None:
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(what)
+
+
+def run_in_context(fn):
+    """
+    Envolve fn para rodar em outra thread com uma cópia do contexto atual (deadline incluso).
+    Um Context não pode ser usado por duas threads ao mesmo tempo: crie um wrapper por submit.
+    """
+    ctx = copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+# ---------------------------- hedging ----------------------------
+
+class LatencyTracker:
+    """Janela deslizante de latências (s) para estimar o p95 de uma operação."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float = 0.95):
+        """Percentil q das amostras, ou None enquanto houver poucas amostras."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+def hedged(fn, tracker: LatencyTracker, what: str = "requisição", min_delay: float = 0.5):
+    """
+    Executa fn() e, se ela não terminar em p95 (mínimo min_delay), dispara uma cópia.
+    Devolve o primeiro resultado bem-sucedido; só usar com leituras idempotentes.
+    Sem amostras suficientes para o p95, executa fn() normalmente.
+    """
+    def timed():
+        started = time.monotonic()
+        result = fn()
+        tracker.record(time.monotonic() - started)
+        return result
+
+    p95 = tracker.percentile()
+    if p95 is None:
+        return timed()
+
+    deadline = _current_deadline.get()
+    delay = max(min_delay, p95)
+    if deadline is not None:
+        delay = min(delay, max(0.0, deadline.remaining()))
+
+    futures = [_hedge_executor.submit(run_in_context(timed))]
+    done, _ = wait(futures, timeout=delay)
+    if not done:
+        logger.info(f"[HEDGE] {what} passou de {delay:.2f}s (p95); enviando requisição duplicada")
+        futures.append(_hedge_executor.submit(run_in_context(timed)))
+
+    remaining = None if deadline is None else max(0.0, deadline.remaining())
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded(f"Tempo limite esgotado aguardando {what}")
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if deadline is not None:
+            remaining = max(0.0, deadline.remaining())
+    raise error
@@ -0,0 +1,122 @@
+# app/core/executors.py
+# ------------------------------------------------------------
+# Execução de trabalho bloqueante a partir de rotas async.
+#
+# - Executores nomeados (db, render), cada um com um número fixo de
+#   threads por worker (EXECUTOR_WORKERS): pymysql, ReportLab e
+#   Plotly/Kaleido rodam fora do event loop, e um pico de relatórios
+#   não cria threads sem limite.
+# - A função roda com uma cópia do contexto da requisição (fonte
+#   Zabbix, deadline, prioridade do governor).
+# - Monitor de atraso do event loop: uma task acorda a cada
+#   LOOP_MONITOR_INTERVAL e mede quanto passou além do previsto;
+#   atraso alto = algo bloqueou o loop (log + métricas).
+#
+# Uso:
+#   result = await run_blocking("db", get_items_metrics, items, from_time, to_time)
+#   path = await run_blocking("render", ReportService.generate_pdf_db, cfg)
+# ------------------------------------------------------------
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.core.config import EXECUTOR_WORKERS, LOOP_LAG_WARN_SECONDS
+from app.core.deadline import run_in_context
+from app.core.logging import logger
+
+LOOP_MONITOR_INTERVAL = 0.5
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def executor(name: str) -> ThreadPoolExecutor:
+    """Executor pelo nome; número de threads vem de EXECUTOR_WORKERS (padrão 'default' ou 4)."""
+    pool = _executors.get(name)
+    if pool is None:
+        with _executors_lock:
+            pool = _executors.get(name)
+            if pool is None:
+                workers = EXECUTOR_WORKERS.get(name, EXECUTOR_WORKERS.get("default", 4))
+                pool = _executors[name] = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"exec-{name}")
+    return pool
+
+
+async def run_blocking(name: str, fn, *args, **kwargs):
+    """Roda fn(*args, **kwargs) no executor 'name' sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(name), run_in_context(partial(fn, *args, **kwargs)))
+
+
+def shutdown_executors() -> None:
+    with _executors_lock:
+        pools = list(_executors.values())
+        _executors.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------------------- monitor do event loop ----------------------
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, warn_after: float = LOOP_LAG_WARN_SECONDS):
+        self.interval = interval
+        self.warn_after = warn_after
+        self._samples = deque(maxlen=120)  # último minuto com o intervalo padrão
+        self.max_lag = 0.0
+        self.warnings = 0
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+            self._samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.warn_after:
+                self.warnings += 1
+                logger.warning(f"[LOOP] Event loop bloqueado por {lag:.2f}s")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        samples = sorted(self._samples)
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval,
+            "lag_last_seconds": round(self._samples[-1], 4) if self._samples else None,
+            "lag_p95_seconds": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4) if samples else None,
+            "lag_max_seconds": round(self.max_lag, 4),
+            "warnings": self.warnings,
+        }
+
+
+loop_monitor = LoopLagMonitor()
+
+
+def executor_stats() -> dict:
+    with _executors_lock:
+        pools = dict(_executors)
+    return {
+        "loop": loop_monitor.stats(),
+        "executors": {
+            name: {"max_workers": pool._max_workers, "queued": pool._work_queue.qsize()}
+            for name, pool in sorted(pools.items())
+        },
+    }
@@ -0,0 +1,563 @@
+# app/core/governor.py
+# ------------------------------------------------------------
+# Limitador global de acesso aos sistemas externos.
+#
+# Recursos nomeados (zabbix_api, zabbix_db, glpi_db, smtp, render), cada
+# um com:
+# - concorrência máxima, valendo para TODOS os workers do gunicorn
+#   (vagas = arquivos com fcntl.flock em TMP_DIR/governor, abertos uma
+#   vez por processo e reabertos no filho após fork);
+# - token bucket opcional (requisições/s), também compartilhado entre
+#   workers via arquivo de estado protegido por flock;
+# - prioridade: "interactive" (usuário) passa na frente de "scheduled"
+#   (agendador); ver priority_scope(). Dentro do processo pela fila
+#   local; entre processos (API x container do scheduler) pelo arquivo
+#   <recurso>.interactive, onde cada processo publica quantos usuários
+#   esperam por vaga compartilhada: agendados não disputam vaga enquanto
+#   houver demanda interativa recente (DEMAND_TTL) de outro processo;
+# - métricas de fila (espera média/máxima, em uso, timeouts).
+#
+# Uso:
+#   with governor("zabbix_db").acquire():
+#       ...
+#   async with governor("smtp").acquire_async():   # espera com asyncio.sleep, sem thread
+#       ...
+#   lease = governor("glpi_db").lease()   # liberar com lease.release()
+# ------------------------------------------------------------
+
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+
+from app.core.config import GOVERNOR_LIMITS, GOVERNOR_RATES, GOVERNOR_MAX_WAIT, GOVERNOR_SHARED
+from app.core.deadline import current_deadline, DeadlineExceeded
+from app.core.logging import logger
+from app.core.paths import TMP_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows (DEV): coordenação só dentro do processo
+    fcntl = None
+
+INTERACTIVE = "interactive"
+SCHEDULED = "scheduled"
+PRIORITIES = (INTERACTIVE, SCHEDULED)
+
+# Intervalo entre tentativas ao disputar vagas/tokens com outros workers
+POLL_INTERVAL = 0.05
+# Demanda interativa publicada por outro processo vale por até N segundos sem renovação
+# (quem espera renova a cada DEMAND_REFRESH; processo que morreu deixa de contar)
+DEMAND_TTL = 5.0
+DEMAND_REFRESH = 1.0
+
+GOVERNOR_DIR = TMP_DIR / "governor"
+
+_current_priority = ContextVar("governor_priority", default=INTERACTIVE)
+
+
+class ResourceBusy(DeadlineExceeded):
+    """Tempo máximo de espera na fila do recurso esgotado."""
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_scope(priority: str):
+    """Define a classe de prioridade das chamadas feitas neste contexto."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Prioridade inválida: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class Lease:
+    """Vaga obtida em um recurso; release() é idempotente."""
+
+    def __init__(self, resource: "Resource", slot):
+        self._resource = resource
+        self._slot = slot
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._resource._release(self._slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __del__(self):
+        self.release()
+
+
+class Resource:
+    def __init__(self, name: str, limit: int, rate: float = 0.0, shared: bool = GOVERNOR_SHARED):
+        self.name = name
+        self.limit = max(1, limit)
+        self.rate = rate
+        self.shared = shared and fcntl is not None
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = {p: 0 for p in PRIORITIES}
+        self._tokens = float(max(1.0, rate))
+        self._tokens_at = time.monotonic()
+        self._slot_lock = threading.Lock()
+        self._slot_fds = None     # descritores das vagas compartilhadas, abertos uma vez por processo
+        self._held = set()        # vagas (índices) em uso por este processo
+        self._demand_lock = threading.Lock()
+        self._announced = 0       # usuários deste processo publicados como esperando vaga compartilhada
+        self._demand_at = 0.0     # última gravação da demanda (time.monotonic)
+        # métricas
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        if self.shared:
+            GOVERNOR_DIR.mkdir(parents=True, exist_ok=True)
+
+    # ---------------------------- fila local ----------------------------
+
+    def _wait_budget(self) -> float:
+        """Espera máxima: GOVERNOR_MAX_WAIT limitado ao deadline ativo."""
+        budget = GOVERNOR_MAX_WAIT
+        deadline = current_deadline()
+        if deadline is not None:
+            budget = min(budget, deadline.remaining())
+        return budget
+
+    def _timeout(self, priority: str, waited: float):
+        with self._cond:
+            self.timeouts += 1
+        logger.error(f"[GOVERNOR] {self.name}: espera de {waited:.1f}s esgotada ({priority})")
+        return ResourceBusy(f"Recurso '{self.name}' ocupado: espera de {waited:.1f}s esgotada")
+
+    def _must_wait(self, priority: str) -> bool:
+        if self._active >= self.limit:
+            return True
+        # Agendados cedem a vez para usuários esperando
+        return priority == SCHEDULED and self._waiting[INTERACTIVE] > 0
+
+    def lease(self, priority: str = None) -> Lease:
+        """Bloqueia até obter uma vaga (e um token, se houver rate). Lança ResourceBusy."""
+        priority = priority or current_priority()
+        started = time.monotonic()
+        expires = started + self._wait_budget()
+
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while self._must_wait(priority):
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timeout(priority, time.monotonic() - started)
+                    self._cond.wait(remaining)
+                self._active += 1
+            finally:
+                self._waiting[priority] -= 1
+
+        slot = None
+        try:
+            if self.shared:
+                slot = self._acquire_slot(expires, priority)
+            if self.rate > 0:
+                self._take_token(expires)
+        except BaseException:
+            self._release(slot)
+            raise
+
+        self._record(priority, time.monotonic() - started)
+        return Lease(self, slot)
+
+    def _record(self, priority: str, waited: float) -> None:
+        with self._cond:
+            self.acquired += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        if waited > 1:
+            logger.info(f"[GOVERNOR] {self.name}: {waited:.2f}s na fila ({priority})")
+
+    def _try_lease(self, priority: str):
+        """
+        Uma tentativa sem bloquear: (Lease, 0) ou (None, segundos até tentar de novo).
+        Usada pela espera async, que dorme com asyncio.sleep entre as tentativas.
+        """
+        with self._cond:
+            if self._must_wait(priority):
+                return None, POLL_INTERVAL
+            self._active += 1
+        slot = None
+        try:
+            if self.shared and priority == SCHEDULED and self._remote_interactive_waiting():
+                self._release(None)
+                return None, POLL_INTERVAL
+            if self.shared:
+                slot = self._try_slot()
+                if slot is None:
+                    self._release(None)
+                    return None, POLL_INTERVAL
+            if self.rate > 0:
+                wait = self._try_token_shared() if self.shared else self._try_token_local()
+                if wait > 0:
+                    self._release(slot)
+                    return None, max(wait, POLL_INTERVAL)
+        except BaseException:
+            self._release(slot)
+            raise
+        return Lease(self, slot), 0.0
+
+    async def lease_async(self, priority: str = None) -> Lease:
+        """
+        Como lease(), mas a espera é feita no event loop (asyncio.sleep entre tentativas
+        não bloqueantes): chamadas async na fila não ocupam threads do executor.
+        """
+        priority = priority or current_priority()
+        started = time.monotonic()
+        expires = started + self._wait_budget()
+        announce = self.shared and priority == INTERACTIVE
+        announced = False
+        with self._cond:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                lease, retry_after = self._try_lease(priority)
+                if lease is not None:
+                    self._record(priority, time.monotonic() - started)
+                    return lease
+                if time.monotonic() + retry_after > expires:
+                    raise self._timeout(priority, time.monotonic() - started)
+                if announce and not announced:
+                    self._announce(+1)
+                    announced = True
+                elif announced:
+                    self._refresh_demand()
+                await asyncio.sleep(retry_after)
+        finally:
+            if announced:
+                self._announce(-1)
+            with self._cond:
+                self._waiting[priority] -= 1
+
+    def _release(self, slot) -> None:
+        if slot is not None:
+            with self._slot_lock:
+                if slot in self._held:  # vaga de antes de um fork não pertence a este processo
+                    self._held.discard(slot)
+                    fcntl.flock(self._slot_fds[slot], fcntl.LOCK_UN)
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def acquire(self, priority: str = None):
+        lease = self.lease(priority)
+        try:
+            yield
+        finally:
+            lease.release()
+
+    @asynccontextmanager
+    async def acquire_async(self, priority: str = None):
+        """Versão para código async: espera no event loop (lease_async), sem thread."""
+        lease = await self.lease_async(priority)
+        try:
+            yield
+        finally:
+            lease.release()
+
+    # ------------------------- entre workers -------------------------
+
+    def _acquire_slot(self, expires: float, priority: str = INTERACTIVE) -> int:
+        """
+        Obtém uma das 'limit' vagas compartilhadas (arquivo com flock exclusivo).
+        Agendados não disputam vaga enquanto outro processo tiver usuários esperando;
+        usuários esperando publicam a demanda para os outros processos.
+        """
+        started = time.monotonic()
+        announced = False
+        try:
+            while True:
+                yield_turn = priority == SCHEDULED and self._remote_interactive_waiting()
+                slot = None if yield_turn else self._try_slot()
+                if slot is not None:
+                    return slot
+                if time.monotonic() >= expires:
+                    raise self._timeout(priority, time.monotonic() - started)
+                if priority == INTERACTIVE and not announced:
+                    self._announce(+1)
+                    announced = True
+                elif announced:
+                    self._refresh_demand()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            if announced:
+                self._announce(-1)
+
+    def _try_slot(self):
+        """
+        Tenta cada vaga livre neste processo com flock não bloqueante; devolve o índice
+        da vaga ou None se todas ocupadas. Os arquivos ficam abertos (um descritor por
+        vaga): no caminho quente só há flock/LOCK_UN. O flock vale por descritor, então
+        vagas já tomadas por outra thread deste processo são puladas pelo conjunto _held.
+        """
+        with self._slot_lock:
+            if self._slot_fds is None:
+                self._slot_fds = [
+                    os.open(str(GOVERNOR_DIR / f"{self.name}.{slot}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                    for slot in range(self.limit)
+                ]
+            for slot, fd in enumerate(self._slot_fds):
+                if slot in self._held:
+                    continue
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(slot)
+                return slot
+        return None
+
+    def _reset_after_fork(self) -> None:
+        """
+        No processo filho: descritores herdados compartilham o flock com o pai, então
+        são fechados (o lock do pai continua) e reabertos na próxima vaga.
+        """
+        self._slot_lock = threading.Lock()
+        fds, self._slot_fds, self._held = self._slot_fds, None, set()
+        for fd in fds or ():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    # ------------------- demanda interativa entre processos -------------------
+
+    @staticmethod
+    def _process_key() -> str:
+        # hostname distingue containers (PIDs podem se repetir entre namespaces)
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _update_demand(self, fn):
+        """Lê/altera/grava o arquivo de demanda sob flock exclusivo; fn(state) altera o dict."""
+        fd = os.open(str(GOVERNOR_DIR / f"{self.name}.interactive"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 65536)
+            try:
+                state = json.loads(raw) if raw else {}
+            except ValueError:
+                state = {}
+            now = time.time()
+            state = {k: v for k, v in state.items() if now - v.get("at", 0) <= DEMAND_TTL}
+            fn(state)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, json.dumps(state).encode())
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _publish_demand(self) -> None:
+        key, count, now = self._process_key(), self._announced, time.time()
+
+        def apply(state):
+            if count > 0:
+                state[key] = {"n": count, "at": now}
+            else:
+                state.pop(key, None)
+
+        self._update_demand(apply)
+        self._demand_at = time.monotonic()
+
+    def _announce(self, delta: int) -> None:
+        """Soma/subtrai usuários deste processo esperando vaga compartilhada e publica."""
+        with self._demand_lock:
+            self._announced += delta
+            self._publish_demand()
+
+    def _refresh_demand(self) -> None:
+        """Renova o "at" da demanda publicada (senão expira em DEMAND_TTL)."""
+        if time.monotonic() - self._demand_at < DEMAND_REFRESH:
+            return
+        with self._demand_lock:
+            if self._announced > 0:
+                self._publish_demand()
+
+    def _remote_interactive_waiting(self) -> bool:
+        """Outro processo tem usuários esperando vaga deste recurso (demanda recente)?"""
+        try:
+            fd = os.open(str(GOVERNOR_DIR / f"{self.name}.interactive"), os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            raw = os.read(fd, 65536)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        try:
+            state = json.loads(raw) if raw else {}
+        except ValueError:
+            return False
+        key, now = self._process_key(), time.time()
+        return any(
+            k != key and v.get("n", 0) > 0 and now - v.get("at", 0) <= DEMAND_TTL
+            for k, v in state.items()
+        )
+
+    def _take_token(self, expires: float) -> None:
+        """Token bucket (capacidade = rate, recarga = rate/s); compartilhado via arquivo se shared."""
+        started = time.monotonic()
+        while True:
+            wait = self._try_token_shared() if self.shared else self._try_token_local()
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > expires:
+                raise self._timeout(current_priority(), time.monotonic() - started)
+            time.sleep(max(wait, POLL_INTERVAL))
+
+    def _refill(self, tokens: float, last: float, now: float) -> float:
+        return min(max(1.0, self.rate), tokens + (now - last) * self.rate)
+
+    def _try_token_local(self) -> float:
+        with self._cond:
+            now = time.monotonic()
+            self._tokens = self._refill(self._tokens, self._tokens_at, now)
+            self._tokens_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _try_token_shared(self) -> float:
+        # time.time(): o relógio precisa ser o mesmo entre processos
+        fd = os.open(str(GOVERNOR_DIR / f"{self.name}.bucket"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 256)
+            now = time.time()
+            try:
+                state = json.loads(raw) if raw else {}
+            except ValueError:
+                state = {}
+            tokens = self._refill(state.get("tokens", max(1.0, self.rate)), state.get("at", now), now)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, json.dumps({"tokens": tokens, "at": now}).encode())
+            return wait
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    # ---------------------------- métricas ----------------------------
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "rate_per_second": self.rate,
+                "shared": self.shared,
+                "in_use": self._active,
+                "waiting": dict(self._waiting),
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "wait_avg_seconds": round(self.wait_total / self.acquired, 4) if self.acquired else 0.0,
+                "wait_max_seconds": round(self.wait_max, 4),
+            }
+
+
+# ---------------------- registro de recursos ----------------------
+
+_resources = {}
+_registry_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    for resource in _resources.values():
+        resource._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def governor(name: str) -> Resource:
+    """Recurso pelo nome; limites/rates vêm de GOVERNOR_LIMITS / GOVERNOR_RATES."""
+    resource = _resources.get(name)
+    if resource is None:
+        with _registry_lock:
+            resource = _resources.get(name)
+            if resource is None:
+                resource = _resources[name] = Resource(
+                    name, GOVERNOR_LIMITS.get(name, GOVERNOR_LIMITS.get("default", 8)), GOVERNOR_RATES.get(name, 0.0)
+                )
+    return resource
+
+
+def governed_cursor_class(base, resource_name: str):
+    """
+    Subclasse de um cursor pymysql cujo execute() ocupa uma vaga do recurso.
+    Cursores bufferizados (Cursor/DictCursor) leem todo o resultado dentro do execute().
+    """
+    class GovernedCursor(base):
+        def execute(self, query, args=None):
+            with governor(resource_name).acquire():
+                return super().execute(query, args)
+
+    GovernedCursor.__name__ = GovernedCursor.__qualname__ = f"Governed{base.__name__}"
+    return GovernedCursor
+
+
+def governed_streaming_cursor_class(base, resource_name: str):
+    """
+    Como governed_cursor_class, para cursores sem buffer (SSCursor/SSDictCursor): as linhas
+    são lidas depois do execute(), então a vaga fica ocupada do execute() até o close().
+    """
+    class GovernedStreamingCursor(base):
+        _lease = None
+
+        def _release_lease(self):
+            if self._lease is not None:
+                self._lease.release()
+                self._lease = None
+
+        def execute(self, query, args=None):
+            self._release_lease()
+            self._lease = governor(resource_name).lease()
+            try:
+                return super().execute(query, args)
+            except BaseException:
+                self._release_lease()
+                raise
+
+        def close(self):
+            try:
+                super().close()
+            finally:
+                self._release_lease()
+
+    GovernedStreamingCursor.__name__ = GovernedStreamingCursor.__qualname__ = f"Governed{base.__name__}"
+    return GovernedStreamingCursor
+
+
+def governor_stats() -> dict:
+    return {name: resource.stats() for name, resource in sorted(_resources.items())}
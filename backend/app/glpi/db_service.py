@@ -1,9 +1,14 @@
 # app/glpi/db_service.py
 
 import pymysql
-from app.core.config import MYSQL_HOSTGLPI, MYSQL_USERGLPI, MYSQL_PASSGLPI, MYSQL_DBGLPI
+from app.core.config import MYSQL_HOSTGLPI, MYSQL_USERGLPI, MYSQL_PASSGLPI, MYSQL_DBGLPI, MYSQL_CONNECT_TIMEOUT, MYSQL_READ_TIMEOUT
+from app.core.deadline import call_timeout
+from app.core.governor import governed_cursor_class
 from app.core.logging import logger
 
+# Consultas limitadas pelo governor (recurso "glpi_db")
+GlpiDictCursor = governed_cursor_class(pymysql.cursors.DictCursor, "glpi_db")
+
 
 def get_glpi_db_connection():
     """Cria conexão com o banco de dados MySQL do GLPI."""
@@ -14,7 +19,10 @@ def get_glpi_db_connection():
             password=MYSQL_PASSGLPI,
             database=MYSQL_DBGLPI,
             charset="utf8mb4",
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=GlpiDictCursor,
+            connect_timeout=call_timeout(MYSQL_CONNECT_TIMEOUT, "conexão MySQL GLPI"),
+            read_timeout=call_timeout(MYSQL_READ_TIMEOUT, "consulta MySQL GLPI"),
+            write_timeout=call_timeout(MYSQL_READ_TIMEOUT, "consulta MySQL GLPI")
         )
     except Exception as e:
         logger.error(f"[GLPI] Erro ao conectar no banco: {str(e)}")
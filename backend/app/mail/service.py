@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from app.core.logging import logger
+from app.core.governor import governor
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 import base64
 
@@ -94,7 +95,8 @@ async def send_report_email(
         )
 
         fm = FastMail(conf)
-        await fm.send_message(message)
+        async with governor("smtp").acquire_async():
+            await fm.send_message(message)
         logger.info(
             f"[Mail] Relatório enviado para: {', '.join(recipients)} | Arquivo: {file_path if file_path else '(sem anexo)'}"
         )
@@ -20,6 +20,9 @@ from app.glpi import routes as glpi_routes
 # Infra
 from app.core.logging import logger
 from app.scheduler import start_scheduler
+from app.zabbix.async_client import close_async_zabbix_client
+from app.core.governor import governor_stats
+from app.core.executors import loop_monitor, executor_stats, shutdown_executors
 
 # Proteções
 from app.auth.security import get_current_user
@@ -112,6 +115,16 @@ def root():
 def healthz():
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat() + "Z"}
 
+# Métricas do limitador global (fila/uso por recurso, neste worker)
+@app.get("/metrics/governor", dependencies=common_deps)
+def governor_metrics():
+    return governor_stats()
+
+# Atraso do event loop e fila dos executores de trabalho bloqueante (neste worker)
+@app.get("/metrics/loop", dependencies=common_deps)
+def loop_metrics():
+    return executor_stats()
+
 # Inclui routers da app (protegidos por proxy + JWT)
 app.include_router(zabbix_router, dependencies=common_deps)
 app.include_router(reports_router, dependencies=common_deps)
@@ -142,9 +155,18 @@ if ENV != "production":
 ENABLE_SCHEDULER = os.getenv("ENABLE_SCHEDULER", "false").lower() in {"1", "true", "yes"}
 
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
+    # Mede o atraso do event loop (rotas async que bloqueiam aparecem no log)
+    loop_monitor.start()
     if ENABLE_SCHEDULER:
         app.state.scheduler = start_scheduler()
         logger.info("[SCHEDULER] Iniciado no processo da API (ENABLE_SCHEDULER=true)")
     else:
         logger.info("[SCHEDULER] Desativado no processo da API (use o container 'scheduler').")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Fecha o pool httpx do cliente Zabbix assíncrono
+    await close_async_zabbix_client()
+    await loop_monitor.stop()
+    shutdown_executors()
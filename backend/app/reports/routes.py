@@ -24,6 +24,8 @@ import json
 from app.reports.service import ReportService
 from app.mail.service import send_report_email, send_report_email_sync
 from app.core.logging import logger
+from app.core.executors import run_blocking
+from app.core.config import REPORT_SCHEDULED_DEADLINE_SECONDS
 from app.core.paths import REPORTS_DIR, CONFIG_DIR  # caminhos centralizados
 
 router = APIRouter()
@@ -42,10 +44,14 @@ class HostInput(BaseModel):
     id: str
     name: str
     graphs: List[GraphInput]
+    # Fonte Zabbix do host (padrão: a do hostgroup) — permite relatórios entre servidores
+    source: Optional[str] = None
 
 class HostgroupInput(BaseModel):
     id: str
     name: str
+    # Fonte Zabbix (app/zabbix/sources.py); padrão "default"
+    source: Optional[str] = None
 
 class ReportRequest(BaseModel):
     hostgroup: HostgroupInput
@@ -56,6 +62,12 @@ class ReportRequest(BaseModel):
     comments: Optional[str] = None
     frequency: Optional[str] = None
     summaryOptions: Optional[Dict[str, Any]] = None
+    # Origem das imagens dos gráficos: "local" (Plotly) ou "zabbix" (chart2.php)
+    render_source: Optional[str] = None
+    # Origem do histórico no modo "local": "db" (MySQL) ou "api" (history.get/trend.get)
+    metrics_source: Optional[str] = None
+    # Tendências horárias (trends) em vez do histórico bruto: None = automático pelo período
+    use_trends: Optional[bool] = None
     # Blocos opcionais (GLPI/ITSM)
     itsm: Optional[Dict[str, Any]] = None
     glpi: Optional[Dict[str, Any]] = None
@@ -277,7 +289,8 @@ async def generate_and_email_report(email_req: EmailRequest, background_tasks: B
         cfg = json.loads(email_req.data.json())
         cfg = _inject_glpi_period(cfg, start_date, end_date)
 
-        file_path = ReportService.generate_pdf_db(ReportRequest(**cfg))
+        # Consultas + gráficos + ReportLab são bloqueantes: rodam no executor "render"
+        file_path = await run_blocking("render", ReportService.generate_pdf_db, ReportRequest(**cfg))
 
         recipients = email_req.recipient if isinstance(email_req.recipient, list) else [email_req.recipient]
         periodo = f"{start_date.date()} a {end_date.date()}"
@@ -555,7 +568,9 @@ def run_scheduled_reports(
                 periodo = f"{start_date.date()} a {end_date.date()}"
 
                 report_request = ReportRequest(**cfg)
-                file_path = ReportService.generate_pdf_db(report_request, config_file=config_file)
+                file_path = ReportService.generate_pdf_db(
+                    report_request, config_file=config_file, deadline_seconds=REPORT_SCHEDULED_DEADLINE_SECONDS
+                )
 
                 background_tasks.add_task(
                     send_report_email,
@@ -625,7 +640,8 @@ async def generate_pdf_report_db(request: Request):
         # Injeta GLPI
         cfg = _inject_glpi_period(dict(report_data), start_date, end_date)
 
-        file_path = ReportService.generate_pdf_db(cfg)
+        # Consultas + gráficos + ReportLab são bloqueantes: rodam no executor "render"
+        file_path = await run_blocking("render", ReportService.generate_pdf_db, cfg)
         pdf_file = Path(file_path)
         if not pdf_file.exists():
             raise HTTPException(status_code=404, detail="Arquivo PDF não encontrado após geração")
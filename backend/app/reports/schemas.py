@@ -11,10 +11,14 @@ class HostInput(BaseModel):
     id: str
     name: str
     graphs: List[GraphInput]
+    # Fonte Zabbix do host (padrão: a do hostgroup) — permite relatórios entre servidores
+    source: Optional[str] = None
 
 class HostgroupInput(BaseModel):
     id: str
     name: str
+    # Fonte Zabbix (app/zabbix/sources.py); padrão "default"
+    source: Optional[str] = None
 
 class ReportRequest(BaseModel):
     hostgroup: HostgroupInput
@@ -25,5 +29,11 @@ class ReportRequest(BaseModel):
     comments: Optional[str] = None
     frequency: Optional[str] = None
     summaryOptions: Optional[Dict[str, Any]] = None
+    # Origem das imagens dos gráficos: "local" (Plotly) ou "zabbix" (chart2.php)
+    render_source: Optional[str] = None
+    # Origem do histórico no modo "local": "db" (MySQL) ou "api" (history.get/trend.get)
+    metrics_source: Optional[str] = None
+    # Tendências horárias (trends) em vez do histórico bruto: None = automático pelo período
+    use_trends: Optional[bool] = None
     itsm: Optional[Dict[str, Any]] = None
     glpi: Optional[Dict[str, Any]] = None
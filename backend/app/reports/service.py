@@ -1,7 +1,9 @@
 import os
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from io import BytesIO
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import json
 
 from reportlab.lib.pagesizes import A4
@@ -20,15 +22,19 @@ import plotly.graph_objs as go
 from app.configs.routes import CONFIG_DIR  # diretório das configs .json dos relatórios agendados
 from app.mail.service import send_report_email_sync  # envio síncrono p/ usar dentro do scheduler
 
-# === ADICIONAR estes imports no topo do arquivo (junto dos demais) ===
-from app.configs.routes import CONFIG_DIR  # diretório das configs .json dos relatórios agendados
-from app.mail.service import send_report_email_sync  # envio síncrono p/ usar dentro do scheduler
+from app.core.config import (
+    REPORT_RENDER_SOURCE, REPORT_IMAGE_WORKERS, REPORT_DEADLINE_SECONDS, REPORT_SCHEDULED_DEADLINE_SECONDS,
+)
+from app.core.deadline import deadline_scope, check_deadline, run_in_context, DeadlineExceeded
+from app.core.governor import governor
+from app.zabbix.client import get_zabbix_client  # sessão Zabbix compartilhada (modo render "zabbix")
+from app.zabbix.metrics_source import get_metrics_source  # histórico via MySQL ou API (modo render "local")
+from app.zabbix.sources import use_source  # fonte Zabbix do hostgroup/host
 
 
 
 # ==== Simulação dos módulos externos ====
 try:
-    from app.zabbix.db_service import get_items_by_graph, get_item_metrics
     from app.core.logging import logger
     from app.glpi.services import (
         get_tempo_chamados, get_chamados_bi, get_usuarios_entidade,
@@ -40,16 +46,6 @@ except ImportError:
         def info(self, msg): print(f"INFO: {msg}")
         def error(self, msg): print(f"ERROR: {msg}")
     logger = MockLogger()
-    import numpy as np
-    def get_items_by_graph(graph_id):
-        return [{"itemid": f"10{graph_id}", "item_name": "Interface X: Bits received"}, {"itemid": f"20{graph_id}", "item_name": "Interface X: Bits sent"}]
-    def get_item_metrics(itemid, from_time, to_time):
-        start_date = datetime.strptime(from_time, "%Y-%m-%d %H:%M:%S")
-        end_date = datetime.strptime(to_time, "%Y-%m-%d %H:%M:%S")
-        num_points = 250
-        time_delta = (end_date - start_date) / num_points
-        base_value = 150 * 1024 * 1024 if "received" in itemid else 80 * 1024 * 1024
-        return [{"data_coleta": start_date + i * time_delta, "value": base_value + np.sin(i / 20.0) * (base_value/4) + np.random.rand() * (base_value/10)} for i in range(num_points)]
     def get_tempo_chamados(entidade_id, inicio, fim):
         return [
             {"id_chamado": 1234, "titulo": "Problema de conexão com a VPN", "status": 2, "requerente": "Bruno Di Giacomo", "data_abertura": datetime(2025, 7, 10, 10, 30)},
@@ -87,6 +83,13 @@ PDF_COLORS = [
     "#0D47A1", "#FF8A65", "#00B8D4", "#2E7D32", "#8E24AA",
     "#D81B60", "#FFD600", "#F44336", "#43A047", "#0288D1", "#F9A825",
 ]
+# Tamanho pedido ao chart2.php no modo "zabbix" (proporção próxima do gráfico Plotly)
+ZABBIX_IMAGE_WIDTH = 1350
+ZABBIX_IMAGE_HEIGHT = 420
+# Pontos por série nos gráficos locais (Plotly)
+PLOT_POINTS = 500
+# Texto exibido no lugar de gráficos não gerados por falta de tempo
+DEADLINE_MESSAGE = "Gráfico omitido: tempo limite de geração do relatório esgotado."
 BG_COLOR = "#FFFFFF"
 TITLE_COLOR = "#212121"
 LABEL_COLOR = "#424242"
@@ -119,14 +122,6 @@ def format_bytes(value, pos=None):
         i += 1
     return f"{value_bits:.1f} {units[i]}"
 
-def downsample_timeseries(times, values, target_points=500):
-    n = len(values)
-    if n <= target_points: return times, values
-    import numpy as np
-    idx = np.linspace(0, n - 1, target_points).astype(int)
-    return [times[i] for i in idx], [values[i] for i in idx]
-
-
 def _first_week_of_month(dt: datetime) -> bool:
     """True se a data estiver entre os 7 primeiros dias do mês."""
     return 1 <= dt.day <= 7
@@ -215,42 +210,47 @@ class ReportService:
             paper_bgcolor=BG_COLOR,
         )
         buf = BytesIO()
-        fig.write_image(buf, format="png", width=500, height=300, scale=1.5)
+        with governor("render").acquire():
+            fig.write_image(buf, format="png", width=500, height=300, scale=1.5)
         buf.seek(0)
         return buf
 
     @staticmethod
-    def _plot_graph_plotly(items, graph_data):
+    def _plot_graph_plotly(series_list, graph_data=None):
+        """Plota as séries (list[ItemSeries]) de um gráfico; a fonte dos dados é indiferente."""
         fig = go.Figure()
         has_data = False
-        for item_idx, item in enumerate(items):
-            metrics = get_item_metrics(item["itemid"], graph_data['from_time'], graph_data['to_time'])
-            if metrics and "value" in metrics[0]:
-                times = [d["data_coleta"] for d in metrics][::-1]
-                values = [float(d["value"]) for d in metrics][::-1]
-                t, v = downsample_timeseries(times, values)
-                if v:
-                    min_val = min(v)
-                    max_val = max(v)
-                    min_idx = v.index(min_val)
-                    max_idx = v.index(max_val)
-                    fig.add_trace(go.Scatter(
-                        x=[t[min_idx]], y=[min_val], mode='markers+text',
-                        marker=dict(size=12, color="#00C853", symbol='circle'),
-                        text=[f"Min: {format_bytes(min_val)}"], textposition='bottom center',
-                        name=f"Min ({item['item_name']})",
-                        showlegend=False
-                    ))
-                    fig.add_trace(go.Scatter(
-                        x=[t[max_idx]], y=[max_val], mode='markers+text',
-                        marker=dict(size=12, color="#D50000", symbol='circle'),
-                        text=[f"Max: {format_bytes(max_val)}"], textposition='top center',
-                        name=f"Max ({item['item_name']})",
-                        showlegend=False
-                    ))
+        for item_idx, series in enumerate(series_list):
+            if len(series):
+                # Picos na série completa (a amostragem pode pular o ponto extremo);
+                # com trends, mínimo/máximo vêm dos agregados horários
+                lows = series.value_min if series.value_min is not None else series.value
+                highs = series.value_max if series.value_max is not None else series.value
+                min_idx = int(lows.argmin())
+                max_idx = int(highs.argmax())
+                min_val = float(lows[min_idx])
+                max_val = float(highs[max_idx])
+                min_t, max_t = series.datetime_at(min_idx), series.datetime_at(max_idx)
+                series = series.downsample(PLOT_POINTS)
+                t = series.datetimes()
+                v = series.value
+                fig.add_trace(go.Scatter(
+                    x=[min_t], y=[min_val], mode='markers+text',
+                    marker=dict(size=12, color="#00C853", symbol='circle'),
+                    text=[f"Min: {format_bytes(min_val)}"], textposition='bottom center',
+                    name=f"Min ({series.name})",
+                    showlegend=False
+                ))
+                fig.add_trace(go.Scatter(
+                    x=[max_t], y=[max_val], mode='markers+text',
+                    marker=dict(size=12, color="#D50000", symbol='circle'),
+                    text=[f"Max: {format_bytes(max_val)}"], textposition='top center',
+                    name=f"Max ({series.name})",
+                    showlegend=False
+                ))
                 fig.add_trace(go.Scatter(
                     x=t, y=v, mode='lines',
-                    name=item["item_name"],
+                    name=series.name,
                     line=dict(width=2, color=PDF_COLORS[item_idx % len(PDF_COLORS)])
                 ))
                 has_data = True
@@ -273,16 +273,31 @@ class ReportService:
                     layer="below")
             ]
         )
-        if any('bit' in item['item_name'].lower() or 'traffic' in item['item_name'].lower() for item in items):
+        if any('bit' in s.name.lower() or 'traffic' in s.name.lower() for s in series_list):
             fig.update_yaxes(tickformat=".2s", title_text="Tráfego (bits/s)")
         fig.update_xaxes(tickformat="%d/%m %H:%M")
         buf = BytesIO()
-        fig.write_image(buf, format="png", width=900, height=350, scale=1.5)
+        with governor("render").acquire():
+            fig.write_image(buf, format="png", width=900, height=350, scale=1.5)
         buf.seek(0)
         return buf
 
     @staticmethod
-    def generate_pdf_db(data, config_file: Path = None):
+    def generate_pdf_db(data, config_file: Path = None, deadline_seconds: float = REPORT_DEADLINE_SECONDS):
+        """
+        Gera o PDF dentro de um orçamento de 'deadline_seconds' (padrão REPORT_DEADLINE_SECONDS,
+        abaixo do timeout do gunicorn): todas as chamadas ao Zabbix/MySQL/GLPI derivam o
+        timeout do tempo restante e, se ele acabar, os gráficos pendentes viram aviso no PDF
+        em vez de derrubar o relatório. None/0 = sem orçamento (relatórios agendados).
+        """
+        if hasattr(data, 'dict'): data = data.dict()
+        source = (data.get('hostgroup') or {}).get('source')
+        budget = deadline_scope(deadline_seconds) if deadline_seconds else nullcontext()
+        with budget, use_source(source):
+            return ReportService._generate_pdf_db(data, config_file)
+
+    @staticmethod
+    def _generate_pdf_db(data, config_file: Path = None):
         if hasattr(data, 'dict'): data = data.dict()
         hosts = data.get('hosts', [])
         summary_data = data.get('summary', None)
@@ -305,7 +320,10 @@ class ReportService:
                 elements.append(Paragraph("Erro ao coletar dados do Service Desk/GLPI.", styles["ErrorText"]))
                 elements.append(PageBreak())
         # CONTEÚDO DE GRÁFICOS (sem sumário e sem quebra desnecessária)
-        ReportService._add_content_pages(elements, styles, hosts)
+        render_source = (data.get('render_source') or REPORT_RENDER_SOURCE).lower()
+        images = ReportService._fetch_zabbix_images(hosts) if render_source == "zabbix" else None
+        metrics_source = data.get('metrics_source')
+        ReportService._add_content_pages(elements, styles, hosts, images, metrics_source, data.get('use_trends'))
 
         doc = SimpleDocTemplate(file_path, pagesize=A4, leftMargin=inch, rightMargin=inch, topMargin=inch, bottomMargin=inch)
         doc.build(
@@ -381,29 +399,126 @@ class ReportService:
         canvas.restoreState()
 
     @staticmethod
-    def _add_content_pages(elements, styles, hosts):
-        for i, host in enumerate(hosts, 1):
-            elements.append(Paragraph(f"Host: {host.get('name', 'N/A')}", styles["PageTitle"]))
-            elements.append(Spacer(1, 0.1 * inch))
-            for j, graph_data in enumerate(host.get('graphs', []), 1):
-                graph_elements = []
-                graph_elements.append(Paragraph(f"{graph_data.get('name', 'N/A')}", styles["GraphTitle"]))
-                try:
-                    items = get_items_by_graph(int(graph_data['id']))
-                    if not items:
-                        graph_elements.append(Paragraph("Nenhum item encontrado para este gráfico.", styles["ErrorText"]))
-                    else:
-                        buf = ReportService._plot_graph_plotly(items, graph_data)
-                        if buf:
-                            graph_elements.append(Image(buf, width=7*inch, height=2.8*inch))
-                        else:
-                            graph_elements.append(Paragraph("Não há dados para exibir neste gráfico.", styles["ErrorText"]))
-                except Exception as e:
-                    logger.error(f"Falha ao gerar gráfico para '{graph_data.get('name')}': {e}")
-                    graph_elements.append(Paragraph(f"Erro ao gerar gráfico: {e}", styles["ErrorText"]))
+    def _fetch_zabbix_images(hosts):
+        """
+        Modo render "zabbix": baixa em paralelo (REPORT_IMAGE_WORKERS) os PNGs de todos
+        os gráficos via chart2.php, usando a sessão autenticada compartilhada.
+        Retorna {(i, j): bytes | Exception} com os mesmos índices de _add_content_pages.
+        """
+        jobs = [
+            ((i, j), graph_data)
+            for i, host in enumerate(hosts, 1)
+            for j, graph_data in enumerate(host.get('graphs', []), 1)
+        ]
+        if not jobs:
+            return {}
+        # Cliente (e pool) da fonte de cada host: hosts de servidores diferentes baixam em paralelo
+        clients = {i: get_zabbix_client(host.get('source')) for i, host in enumerate(hosts, 1)}
+
+        def fetch(job):
+            key, graph_data = job
+            try:
+                check_deadline(f"imagem do gráfico {graph_data['id']}")
+                return key, clients[key[0]].get_graph_image(
+                    graph_data['id'], graph_data['from_time'], graph_data['to_time'],
+                    width=ZABBIX_IMAGE_WIDTH, height=ZABBIX_IMAGE_HEIGHT
+                )
+            except Exception as e:
+                logger.error(f"Falha ao baixar imagem do gráfico '{graph_data.get('name')}' do Zabbix: {e}")
+                return key, e
+
+        workers = max(1, min(REPORT_IMAGE_WORKERS, len(jobs)))
+        logger.info(f"[REPORT] Baixando {len(jobs)} imagens do Zabbix com {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Cada job leva uma cópia do contexto (deadline do relatório)
+            futures = [executor.submit(run_in_context(fetch), job) for job in jobs]
+            return dict(future.result() for future in futures)
+
+    @staticmethod
+    def _zabbix_image_flowable(png_bytes):
+        """Image do ReportLab com 7in de largura, mantendo a proporção do PNG do Zabbix."""
+        with PILImage.open(BytesIO(png_bytes)) as img:
+            width_px, height_px = img.size
+        return Image(BytesIO(png_bytes), width=7*inch, height=7*inch * height_px / width_px)
+
+    @staticmethod
+    def _add_content_pages(elements, styles, hosts, images=None, metrics_source=None, use_trends=None):
+        """
+        Adiciona os gráficos de cada host.
+        - images: resultado de _fetch_zabbix_images (modo "zabbix"); se None, plota localmente.
+        - metrics_source: origem do histórico no modo local ("db" | "api"; padrão do .env).
+        - use_trends: força (True/False) ou deixa automático (None) o uso de trends.
+        """
+        # Fonte Zabbix efetiva de cada host (a do host ou a do hostgroup/contexto)
+        host_sources = []
+        for host in hosts:
+            with use_source(host.get('source')) as zabbix_source:
+                host_sources.append(zabbix_source.name)
+
+        sources = {}
+        if images is None:
+            # Uma fonte de métricas por fonte Zabbix, com os itens de todos os gráficos
+            # do relatório resolvidos de uma vez (sem consulta por item/gráfico)
+            for name in dict.fromkeys(host_sources):
+                graph_ids = [
+                    g['id'] for host, host_source in zip(hosts, host_sources) if host_source == name
+                    for g in host.get('graphs', [])
+                ]
+                with use_source(name):
+                    sources[name] = get_metrics_source(metrics_source, use_trends=use_trends)
+                    try:
+                        sources[name].prefetch(graph_ids)
+                    except Exception as e:
+                        # Sem o lote, cada gráfico tenta de novo individualmente (e mostra o erro no PDF)
+                        logger.error(f"[REPORT] Falha ao buscar itens dos gráficos ({name}): {e}")
+
+        for i, (host, host_source) in enumerate(zip(hosts, host_sources), 1):
+            with use_source(host_source):
+                ReportService._add_host_graphs(elements, styles, i, host, images, sources.get(host_source))
+            # Não faz PageBreak após cada host ou gráfico!
+
+    @staticmethod
+    def _add_host_graphs(elements, styles, i, host, images=None, source=None):
+        """
+        Gráficos de um host (executado dentro da fonte Zabbix do host).
+        - source: fonte de métricas (get_metrics_source) no modo local.
+        """
+        elements.append(Paragraph(f"Host: {host.get('name', 'N/A')}", styles["PageTitle"]))
+        elements.append(Spacer(1, 0.1 * inch))
+        for j, graph_data in enumerate(host.get('graphs', []), 1):
+            graph_elements = []
+            graph_elements.append(Paragraph(f"{graph_data.get('name', 'N/A')}", styles["GraphTitle"]))
+            if images is not None:
+                image = images.get((i, j))
+                if isinstance(image, (bytes, bytearray)):
+                    graph_elements.append(ReportService._zabbix_image_flowable(image))
+                elif isinstance(image, DeadlineExceeded):
+                    graph_elements.append(Paragraph(DEADLINE_MESSAGE, styles["ErrorText"]))
+                else:
+                    graph_elements.append(Paragraph(f"Erro ao obter gráfico do Zabbix: {image}", styles["ErrorText"]))
                 elements.extend(graph_elements)
                 elements.append(Spacer(1, 0.3 * inch))
-            # Não faz PageBreak após cada host ou gráfico!
+                continue
+            try:
+                check_deadline(f"gráfico {graph_data.get('name')}")
+                items = source.graph_items(graph_data['id'])
+                if not items:
+                    graph_elements.append(Paragraph("Nenhum item encontrado para este gráfico.", styles["ErrorText"]))
+                else:
+                    series = source.fetch(items, graph_data['from_time'], graph_data['to_time'], max_points=PLOT_POINTS)
+                    buf = ReportService._plot_graph_plotly(series, graph_data)
+                    if buf:
+                        graph_elements.append(Image(buf, width=7*inch, height=2.8*inch))
+                    else:
+                        graph_elements.append(Paragraph("Não há dados para exibir neste gráfico.", styles["ErrorText"]))
+            except DeadlineExceeded as e:
+                logger.error(f"[REPORT] Gráfico '{graph_data.get('name')}' omitido: {e}")
+                graph_elements.append(Paragraph(DEADLINE_MESSAGE, styles["ErrorText"]))
+            except Exception as e:
+                logger.error(f"Falha ao gerar gráfico para '{graph_data.get('name')}': {e}")
+                graph_elements.append(Paragraph(f"Erro ao gerar gráfico: {e}", styles["ErrorText"]))
+            elements.extend(graph_elements)
+            elements.append(Spacer(1, 0.3 * inch))
 
     @staticmethod
     def _buscar_dados_glpi_local(glpi_info):
@@ -603,7 +718,9 @@ class ReportService:
 
                     # Gera PDF
                     try:
-                        file_path = ReportService.generate_pdf_db(cfg, config_file=config_file)
+                        file_path = ReportService.generate_pdf_db(
+                            cfg, config_file=config_file, deadline_seconds=REPORT_SCHEDULED_DEADLINE_SECONDS
+                        )
                     except Exception as e_gen:
                         logger.error(f"[SCHED] Falha ao gerar PDF ({config_file.name}): {e_gen}")
                         continue
@@ -1,23 +1,34 @@
 #athena-reports/app/scheduler.py
 import sys
 import os
+from datetime import datetime
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.reports.service import ReportService
 from app.core.logging import logger
+from app.core.governor import priority_scope, SCHEDULED
+from app.core.config import ZABBIX_EVENT_STORE, ZABBIX_EVENT_STORE_SYNC_MINUTES
+from app.zabbix.event_store import sync_event_stores
 
 def run_daily_reports():
     logger.info("Executando relatório DIÁRIO pelo scheduler")
-    ReportService.executar_relatorios_agendados("daily")
+    with priority_scope(SCHEDULED):  # cede vaga no governor para usuários interativos
+        ReportService.executar_relatorios_agendados("daily")
 
 def run_weekly_reports():
     logger.info("Executando relatório SEMANAL pelo scheduler")
-    ReportService.executar_relatorios_agendados("weekly")
+    with priority_scope(SCHEDULED):
+        ReportService.executar_relatorios_agendados("weekly")
 
 def run_monthly_reports():
     logger.info("Executando relatório MENSAL pelo scheduler")
-    ReportService.executar_relatorios_agendados("monthly")
+    with priority_scope(SCHEDULED):
+        ReportService.executar_relatorios_agendados("monthly")
+
+def run_event_store_sync():
+    with priority_scope(SCHEDULED):
+        sync_event_stores()
 
 def start_scheduler():
     scheduler = BackgroundScheduler(timezone="America/Sao_Paulo")
@@ -32,6 +43,13 @@ def start_scheduler():
     scheduler.add_job(run_weekly_reports, 'cron', day_of_week='mon', hour=12, minute=53, id='weekly_report')
     scheduler.add_job(run_monthly_reports, 'cron', day=1, hour=11, id='monthly_report')
 
+    # Espelho local de eventos do Zabbix (sincronização incremental)
+    if ZABBIX_EVENT_STORE:
+        scheduler.add_job(
+            run_event_store_sync, 'interval', minutes=ZABBIX_EVENT_STORE_SYNC_MINUTES,
+            id='event_store_sync', max_instances=1, coalesce=True, next_run_time=datetime.now()
+        )
+
     scheduler.start()
     logger.info("Scheduler APScheduler iniciado.")
     return scheduler  # <-- Retorna o objeto para controle futuro
@@ -0,0 +1,192 @@
+# app/zabbix/async_client.py
+# ------------------------------------------------------------
+# Versão assíncrona (httpx.AsyncClient) do cliente Zabbix.
+#
+# - Usada pelas rotas async de /zabbix/*: a espera pelo Zabbix não
+#   ocupa threads do threadpool do FastAPI.
+# - Pool de conexões limitado (ZABBIX_ASYNC_MAX_CONNECTIONS).
+# - Mesmo cache de versão/token/cookie e mesma regra de re-login do
+#   ZabbixClient síncrono.
+# - gather(): dispara chamadas independentes em paralelo.
+# - Um cliente (pool/limites próprios) por fonte Zabbix.
+# ------------------------------------------------------------
+
+import asyncio
+
+import httpx
+
+from app.core.config import ZABBIX_HTTP_TIMEOUT, ZABBIX_ASYNC_MAX_CONNECTIONS, ZABBIX_ASYNC_MAX_KEEPALIVE
+from app.core.deadline import call_timeout
+from app.core.governor import governor
+from app.core.logging import logger
+from app.zabbix.service import ZabbixService, ZabbixAPIError
+from app.zabbix.sources import DEFAULT_SOURCE, get_source, resolve_source_name
+
+
+class AsyncZabbixClient:
+    """Cliente assíncrono para API JSON-RPC e frontend Web do Zabbix."""
+
+    def __init__(
+        self,
+        api_url: str,
+        web_url: str,
+        username: str,
+        password: str,
+        max_connections: int = ZABBIX_ASYNC_MAX_CONNECTIONS,
+        max_keepalive: int = ZABBIX_ASYNC_MAX_KEEPALIVE,
+        timeout: float = ZABBIX_HTTP_TIMEOUT,
+        source: str = DEFAULT_SOURCE,
+    ):
+        self.source = source
+        self.api_url = api_url
+        self.web_url = web_url
+        self.username = username
+        self.password = password
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            timeout=timeout,
+        )
+
+        self._lock = asyncio.Lock()
+        self._version = None
+        self._api_token = None
+        self._web_cookie = None
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    # ---------------------- autenticação (cache) ----------------------
+
+    async def _post_rpc(self, calls: list, auth_token: str = None, version: str = "7.2"):
+        payload, headers = ZabbixService.build_rpc_request(calls, auth_token, version)
+        async with governor("zabbix_api").acquire_async():
+            response = await self.http.post(
+                self.api_url, json=payload, headers=headers,
+                timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, calls[0][0] if len(calls) == 1 else "lote JSON-RPC")
+            )
+        response.raise_for_status()
+        return response.json()
+
+    async def get_version(self) -> str:
+        if self._version is None:
+            async with self._lock:
+                if self._version is None:
+                    logger.info(f"Detectando versão do Zabbix (async): {self.api_url}")
+                    data = await self._post_rpc([("apiinfo.version", {})])
+                    self._version = ZabbixService.parse_rpc_response(data)
+        return self._version
+
+    async def _get_api_token(self, stale: str = None) -> str:
+        async with self._lock:
+            if self._api_token is None or self._api_token == stale:
+                logger.info(f"Autenticando via API (async): {self.api_url} - usuário: {self.username}")
+                data = await self._post_rpc([("user.login", {"username": self.username, "password": self.password})])
+                self._api_token = ZabbixService.parse_rpc_response(data)
+            return self._api_token
+
+    async def _get_web_cookie(self, stale: str = None) -> str:
+        async with self._lock:
+            if self._web_cookie is None or self._web_cookie == stale:
+                logger.info(f"Autenticando via WEB (async): {self.web_url} - usuário: {self.username}")
+                async with governor("zabbix_api").acquire_async():
+                    response = await self.http.post(f"{self.web_url}/index.php", data={
+                        "name": self.username,
+                        "password": self.password,
+                        "autologin": 1,
+                        "enter": "Sign in"
+                    }, timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, "login Web"))
+                cookie = response.cookies.get("zbx_session") or self.http.cookies.get("zbx_session")
+                if not cookie:
+                    raise Exception("zbx_session ausente (falha na autenticação WEB)")
+                self._web_cookie = cookie
+            return self._web_cookie
+
+    # ---------------------------- chamadas ----------------------------
+
+    async def call(self, method: str, params: dict):
+        """Chama um método da API; em erro de autenticação refaz login e tenta uma vez mais."""
+        version = await self.get_version()
+        token = await self._get_api_token()
+        logger.info(f"Chamando método Zabbix (async): {method} - versão {version}")
+        try:
+            return ZabbixService.parse_rpc_response(await self._post_rpc([(method, params)], token, version))
+        except ZabbixAPIError as e:
+            if not e.is_auth_error:
+                logger.error(f"Erro na chamada {method}: {str(e)}")
+                raise
+            logger.info(f"[ZABBIX] Token expirado ao chamar {method}; refazendo login na API")
+            token = await self._get_api_token(stale=token)
+            return ZabbixService.parse_rpc_response(await self._post_rpc([(method, params)], token, version))
+
+    async def call_many(self, calls: list, raise_errors: bool = True) -> list:
+        """Batch JSON-RPC em um único POST (mesma semântica de ZabbixClient.call_many)."""
+        if not calls:
+            return []
+        version = await self.get_version()
+        token = await self._get_api_token()
+        results = ZabbixService.parse_batch_response(calls, await self._post_rpc(calls, token, version))
+        if any(isinstance(r, ZabbixAPIError) and r.is_auth_error for r in results):
+            logger.info("[ZABBIX] Token expirado em chamada em lote; refazendo login na API")
+            token = await self._get_api_token(stale=token)
+            results = ZabbixService.parse_batch_response(calls, await self._post_rpc(calls, token, version))
+        if raise_errors:
+            for result in results:
+                if isinstance(result, ZabbixAPIError):
+                    raise result
+        return results
+
+    async def gather(self, calls: list, return_exceptions: bool = False) -> list:
+        """
+        Dispara chamadas independentes (method, params) em paralelo, cada uma em seu
+        próprio POST. Útil para métodos pesados (ex.: event.get) que o Zabbix
+        processaria em série dentro de um único lote.
+        """
+        return await asyncio.gather(
+            *(self.call(method, params) for method, params in calls),
+            return_exceptions=return_exceptions
+        )
+
+    async def get_graph_image(self, graph_id: str, from_time: str, to_time: str, width: int = 900, height: int = 200) -> bytes:
+        """Obtém o PNG do gráfico via chart2.php reaproveitando o cookie zbx_session."""
+        params = ZabbixService.graph_image_params(graph_id, from_time, to_time, width, height)
+        logger.info(f"Buscando imagem do gráfico {graph_id} de {from_time} até {to_time} (async)")
+        cookie = await self._get_web_cookie()
+        for attempt in range(2):
+            async with governor("zabbix_api").acquire_async():
+                response = await self.http.get(
+                    f"{self.web_url}/chart2.php", params=params, headers={"Cookie": f"zbx_session={cookie}"},
+                    timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, f"chart2.php {graph_id}")
+                )
+            response.raise_for_status()
+            if response.headers.get("Content-Type", "").startswith("image/"):
+                return response.content
+            if attempt == 0:
+                logger.info(f"[ZABBIX] Sessão Web expirada ao buscar gráfico {graph_id}; refazendo login")
+                cookie = await self._get_web_cookie(stale=cookie)
+        raise ZabbixAPIError("Not authorized", data="chart2.php não retornou imagem (sessão Web expirada?)")
+
+
+# ---------------------- instância compartilhada ----------------------
+
+_async_clients = {}
+
+
+def get_async_zabbix_client(source: str = None) -> AsyncZabbixClient:
+    """Retorna o cliente assíncrono da fonte (um event loop por worker; padrão: fonte do contexto)."""
+    name = resolve_source_name(source)
+    client = _async_clients.get(name)
+    if client is None:
+        cfg = get_source(name)
+        client = _async_clients[name] = AsyncZabbixClient(
+            cfg.api_url, cfg.web_url, cfg.user, cfg.password,
+            max_connections=cfg.max_connections, max_keepalive=cfg.max_keepalive, source=name
+        )
+        logger.info(f"[ZABBIX] Cliente assíncrono criado para {cfg.api_url} (fonte {name})")
+    return client
+
+
+async def close_async_zabbix_client() -> None:
+    """Fecha os pools httpx de todas as fontes (chamado no shutdown da aplicação)."""
+    while _async_clients:
+        _, client = _async_clients.popitem()
+        await client.aclose()
@@ -0,0 +1,92 @@
+# app/zabbix/async_service.py
+# ------------------------------------------------------------
+# Contraparte assíncrona de ZabbixService para as rotas /zabbix/*.
+# Os parâmetros das consultas vêm de ZabbixService para que as duas
+# versões devolvam exatamente os mesmos campos.
+# ------------------------------------------------------------
+
+import asyncio
+
+from app.core.logging import logger
+from app.zabbix.service import ZabbixService
+from app.zabbix.sources import SOURCES
+from app.zabbix.async_client import AsyncZabbixClient, get_async_zabbix_client
+from app.zabbix.cache import cached_call_async, cache_key, metadata_cache, source_of
+
+
+def _client(client: AsyncZabbixClient = None) -> AsyncZabbixClient:
+    return client if client is not None else get_async_zabbix_client()
+
+
+class AsyncZabbixService:
+
+    @staticmethod
+    async def list_hostgroups(client: AsyncZabbixClient = None) -> list:
+        """Retorna todos os hostgroups disponíveis no Zabbix."""
+        return await cached_call_async(_client(client), "hostgroup.get", ZabbixService.hostgroups_params())
+
+    @staticmethod
+    async def list_hostgroups_all_sources() -> dict:
+        """
+        Hostgroups de todas as fontes Zabbix em paralelo.
+        Retorna {"hostgroups": [... com "source"], "errors": {fonte: mensagem}}.
+        """
+        names = list(SOURCES)
+        results = await asyncio.gather(
+            *(AsyncZabbixService.list_hostgroups(get_async_zabbix_client(name)) for name in names),
+            return_exceptions=True
+        )
+        hostgroups, errors = [], {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"[ZABBIX] Falha ao listar hostgroups da fonte {name}: {result}")
+                errors[name] = str(result)
+                continue
+            hostgroups.extend({**group, "source": name} for group in result)
+        return {"hostgroups": hostgroups, "errors": errors}
+
+    @staticmethod
+    async def list_hosts_by_group(group_id: str, client: AsyncZabbixClient = None) -> list:
+        """Lista os hosts vinculados a um determinado hostgroup."""
+        return await cached_call_async(_client(client), "host.get", ZabbixService.hosts_by_group_params(group_id))
+
+    @staticmethod
+    async def list_graphs_by_host(host_id: str, client: AsyncZabbixClient = None) -> list:
+        """Retorna todos os gráficos associados a um host específico."""
+        return await cached_call_async(_client(client), "graph.get", ZabbixService.graphs_by_host_params(host_id))
+
+    @staticmethod
+    async def list_graphs_by_hosts(host_ids: list, client: AsyncZabbixClient = None) -> dict:
+        """Retorna {host_id: [gráficos]} para vários hosts em um único POST (batch); usa o cache por host."""
+        client = _client(client)
+        result, missing = {}, []
+        for host_id in host_ids:
+            cached = metadata_cache.get(cache_key("graph.get", ZabbixService.graphs_by_host_params(host_id), source_of(client)))
+            if cached is None:
+                missing.append(host_id)
+            else:
+                result[host_id] = cached
+        if missing:
+            calls = [("graph.get", ZabbixService.graphs_by_host_params(host_id)) for host_id in missing]
+            for (method, params), host_id, graphs in zip(calls, missing, await client.call_many(calls)):
+                metadata_cache.set(cache_key(method, params, source_of(client)), graphs)
+                result[host_id] = graphs
+        return {host_id: result[host_id] for host_id in host_ids}
+
+    @staticmethod
+    async def get_tree(group_id: str, client: AsyncZabbixClient = None) -> dict:
+        """Árvore hostgroup -> hosts -> gráficos em um único POST (com cache de metadados)."""
+        client = _client(client)
+        key = cache_key("tree", {"group_id": group_id}, source_of(client))
+        tree = metadata_cache.get(key)
+        if tree is None:
+            groups, hosts = await client.call_many(ZabbixService.tree_params(group_id))
+            tree = ZabbixService.build_tree(group_id, groups, hosts)
+            metadata_cache.set(key, tree)
+        return tree
+
+    @staticmethod
+    async def get_graph_image(graph_id: str, from_time: str, to_time: str, width: int = 900, height: int = 200,
+                              client: AsyncZabbixClient = None) -> bytes:
+        """Obtém a imagem PNG de um gráfico via chart2.php."""
+        return await _client(client).get_graph_image(graph_id, from_time, to_time, width, height)
@@ -0,0 +1,132 @@
+# app/zabbix/cache.py
+# ------------------------------------------------------------
+# Cache em memória (por processo) para metadados do Zabbix:
+# hostgroups, hosts, gráficos e detalhes de triggers.
+#
+# - TTL e tamanho máximo configuráveis (ZABBIX_CACHE_TTL / ZABBIX_CACHE_MAXSIZE).
+# - Chave = método + fonte Zabbix + parâmetros da chamada (JSON ordenado).
+# - Triggers são guardadas individualmente (trigger.get por id), assim
+#   consultas com conjuntos diferentes de ids reaproveitam o que já existe.
+# - Contadores de hit/miss e invalidação via GET/DELETE /zabbix/cache.
+# ------------------------------------------------------------
+
+import json
+import threading
+
+from cachetools import TTLCache
+
+from app.core.config import ZABBIX_CACHE_TTL, ZABBIX_CACHE_MAXSIZE
+from app.core.logging import logger
+from app.zabbix.sources import DEFAULT_SOURCE
+
+
+def cache_key(method: str, params: dict, source: str = DEFAULT_SOURCE) -> tuple:
+    return method, source, json.dumps(params, sort_keys=True, default=str)
+
+
+def source_of(client) -> str:
+    return getattr(client, "source", DEFAULT_SOURCE)
+
+
+class MetadataCache:
+    """TTLCache thread-safe com contadores de hit/miss."""
+
+    def __init__(self, ttl: int = ZABBIX_CACHE_TTL, maxsize: int = ZABBIX_CACHE_MAXSIZE):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key):
+        """Retorna o valor em cache ou None (contabiliza hit/miss)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value) -> None:
+        if self.enabled and value is not None:
+            with self._lock:
+                self._cache[key] = value
+
+    def invalidate(self, method: str = None) -> int:
+        """Remove todas as entradas (ou só as de um método). Retorna quantas saíram."""
+        with self._lock:
+            if method is None:
+                removed = len(self._cache)
+                self._cache.clear()
+            else:
+                keys = [k for k in list(self._cache.keys()) if k[0] == method]
+                for k in keys:
+                    self._cache.pop(k, None)
+                removed = len(keys)
+        logger.info(f"[ZABBIX] Cache de metadados invalidado ({method or 'tudo'}): {removed} entradas")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "ttl_seconds": self.ttl,
+                "maxsize": self._cache.maxsize,
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+metadata_cache = MetadataCache()
+
+
+# ---------------------- helpers de chamada ----------------------
+
+def cached_call(client, method: str, params: dict):
+    """client.call com cache (cliente síncrono)."""
+    key = cache_key(method, params, source_of(client))
+    result = metadata_cache.get(key)
+    if result is None:
+        result = client.call(method, params)
+        metadata_cache.set(key, result)
+    return result
+
+
+async def cached_call_async(client, method: str, params: dict):
+    """Mesmo que cached_call, para o AsyncZabbixClient."""
+    key = cache_key(method, params, source_of(client))
+    result = metadata_cache.get(key)
+    if result is None:
+        result = await client.call(method, params)
+        metadata_cache.set(key, result)
+    return result
+
+
+def cached_triggers(trigger_ids, source: str = DEFAULT_SOURCE) -> tuple:
+    """
+    Separa os ids já em cache dos que faltam.
+    Retorna ({triggerid: trigger} encontrados, [ids a consultar]).
+    """
+    found, missing = {}, []
+    for trigger_id in trigger_ids:
+        trigger = metadata_cache.get(("trigger.get", source, str(trigger_id)))
+        if trigger is None:
+            missing.append(trigger_id)
+        else:
+            found[trigger_id] = trigger
+    return found, missing
+
+
+def store_triggers(triggers: list, source: str = DEFAULT_SOURCE) -> None:
+    for trigger in triggers:
+        metadata_cache.set(("trigger.get", source, str(trigger["triggerid"])), trigger)
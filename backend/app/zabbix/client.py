@@ -0,0 +1,198 @@
+# app/zabbix/client.py
+# ------------------------------------------------------------
+# Cliente Zabbix de longa duração (um por processo).
+#
+# - Mantém um requests.Session com pool de conexões keep-alive.
+# - Guarda em cache a versão detectada, o token da API e o cookie
+#   zbx_session da interface Web.
+# - Só refaz login quando o Zabbix responde com erro de autenticação.
+#
+# Uso:
+#   from app.zabbix.client import get_zabbix_client
+#   client = get_zabbix_client()
+#   client.call("hostgroup.get", {...})
+#   client.call_many([("host.get", {...}), ("graph.get", {...})])
+#   get_zabbix_client("sp")  # outra fonte (app/zabbix/sources.py)
+# ------------------------------------------------------------
+
+import threading
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import ZABBIX_HTTP_POOL_SIZE, ZABBIX_HEDGE_IMAGES
+from app.core.deadline import LatencyTracker, hedged
+from app.core.logging import logger
+from app.zabbix.service import ZabbixService, ZabbixAPIError
+from app.zabbix.sources import DEFAULT_SOURCE, get_source, resolve_source_name
+
+
+def _build_session(pool_size: int) -> requests.Session:
+    """Cria um Session com pool de conexões dimensionado para uso concorrente."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ZabbixClient:
+    """
+    Cliente thread-safe para API JSON-RPC e frontend Web do Zabbix.
+    As credenciais ficam em cache e são renovadas sob demanda.
+    """
+
+    def __init__(self, api_url: str, web_url: str, username: str, password: str, pool_size: int = ZABBIX_HTTP_POOL_SIZE,
+                 source: str = DEFAULT_SOURCE):
+        self.source = source
+        self.api_url = api_url
+        self.web_url = web_url
+        self.username = username
+        self.password = password
+        self.session = _build_session(pool_size)
+
+        self._lock = threading.Lock()
+        self._version = None
+        self._api_token = None
+        self._web_cookie = None
+        self._image_latency = LatencyTracker()
+
+    # ---------------------- autenticação (cache) ----------------------
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            with self._lock:
+                if self._version is None:
+                    self._version = ZabbixService.get_version(self.api_url, session=self.session)
+        return self._version
+
+    def _get_api_token(self, stale: str = None) -> str:
+        """
+        Retorna o token em cache. Se 'stale' for informado e ainda for o token atual,
+        refaz o login (evita que várias threads façam login ao mesmo tempo).
+        """
+        with self._lock:
+            if self._api_token is None or self._api_token == stale:
+                self._api_token = ZabbixService.authenticate_api(
+                    self.api_url, self.username, self.password, session=self.session
+                )
+            return self._api_token
+
+    def _get_web_cookie(self, stale: str = None) -> str:
+        with self._lock:
+            if self._web_cookie is None or self._web_cookie == stale:
+                self._web_cookie = ZabbixService.authenticate_web(
+                    self.web_url, self.username, self.password, session=self.session
+                )
+            return self._web_cookie
+
+    def reset(self) -> None:
+        """Descarta credenciais e versão em cache (próxima chamada refaz login)."""
+        with self._lock:
+            self._version = None
+            self._api_token = None
+            self._web_cookie = None
+
+    def authenticate(self) -> dict:
+        """Mesmo formato de ZabbixService.authenticate, mas servido a partir do cache."""
+        return {
+            "version": self.version,
+            "api_token": self._get_api_token(),
+            "web_cookie": self._get_web_cookie()
+        }
+
+    # ---------------------------- chamadas ----------------------------
+
+    def call(self, method: str, params: dict):
+        """Chama um método da API; em erro de autenticação refaz login e tenta uma vez mais."""
+        version = self.version
+        token = self._get_api_token()
+        try:
+            return ZabbixService.call_zabbix_api(
+                self.api_url, method, params, auth_token=token, version=version, session=self.session
+            )
+        except ZabbixAPIError as e:
+            if not e.is_auth_error:
+                raise
+            logger.info(f"[ZABBIX] Token expirado ao chamar {method}; refazendo login na API")
+            token = self._get_api_token(stale=token)
+            return ZabbixService.call_zabbix_api(
+                self.api_url, method, params, auth_token=token, version=version, session=self.session
+            )
+
+    def call_many(self, calls: list, raise_errors: bool = True) -> list:
+        """
+        Envia várias chamadas (method, params) em um único POST JSON-RPC.
+        Resultados voltam na ordem de 'calls'. Com raise_errors=False, erros individuais
+        aparecem como ZabbixAPIError na posição correspondente.
+        Se alguma chamada falhar por autenticação, refaz login e reenvia o lote uma vez.
+        """
+        version = self.version
+        token = self._get_api_token()
+        results = ZabbixService.call_zabbix_api_batch(
+            self.api_url, calls, auth_token=token, version=version, session=self.session
+        )
+        if any(isinstance(r, ZabbixAPIError) and r.is_auth_error for r in results):
+            logger.info("[ZABBIX] Token expirado em chamada em lote; refazendo login na API")
+            token = self._get_api_token(stale=token)
+            results = ZabbixService.call_zabbix_api_batch(
+                self.api_url, calls, auth_token=token, version=version, session=self.session
+            )
+        if raise_errors:
+            for result in results:
+                if isinstance(result, ZabbixAPIError):
+                    raise result
+        return results
+
+    def get_graph_image(self, graph_id: str, from_time: str, to_time: str, width: int = 900, height: int = 200,
+                        hedge: bool = ZABBIX_HEDGE_IMAGES) -> bytes:
+        """
+        Obtém o PNG do gráfico via chart2.php reaproveitando o cookie zbx_session.
+        Com hedge=True, uma 2ª requisição sai se a 1ª passar do p95 das últimas imagens.
+        """
+        fetch = partial(self._fetch_graph_image, graph_id, from_time, to_time, width, height)
+        if hedge:
+            return hedged(fetch, self._image_latency, what=f"imagem do gráfico {graph_id}")
+        return fetch()
+
+    def _fetch_graph_image(self, graph_id: str, from_time: str, to_time: str, width: int, height: int) -> bytes:
+        cookie = self._get_web_cookie()
+        try:
+            return ZabbixService.get_graph_image(
+                self.web_url, cookie, graph_id, from_time, to_time, width, height, session=self.session
+            )
+        except ZabbixAPIError as e:
+            if not e.is_auth_error:
+                raise
+            logger.info(f"[ZABBIX] Sessão Web expirada ao buscar gráfico {graph_id}; refazendo login")
+            cookie = self._get_web_cookie(stale=cookie)
+            return ZabbixService.get_graph_image(
+                self.web_url, cookie, graph_id, from_time, to_time, width, height, session=self.session
+            )
+
+
+# ---------------------- instância compartilhada ----------------------
+
+_client_lock = threading.Lock()
+_clients = {}
+
+
+def get_zabbix_client(source: str = None) -> ZabbixClient:
+    """
+    Retorna o cliente Zabbix do processo para a fonte informada (padrão: fonte do
+    contexto atual, "default" = .env). Cada fonte tem seu próprio pool de conexões.
+    """
+    name = resolve_source_name(source)
+    client = _clients.get(name)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(name)
+            if client is None:
+                cfg = get_source(name)
+                client = _clients[name] = ZabbixClient(
+                    cfg.api_url, cfg.web_url, cfg.user, cfg.password, pool_size=cfg.pool_size, source=name
+                )
+                logger.info(f"[ZABBIX] Cliente compartilhado criado para {cfg.api_url} (fonte {name})")
+    return client
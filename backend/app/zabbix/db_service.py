@@ -1,21 +1,147 @@
 # app/zabbix/db_service.py
 
+import math
+import threading
+from contextlib import contextmanager
+
+import numpy as np
 import pymysql
-from datetime import datetime
-from app.core.config import MYSQL_HOST, MYSQL_USER, MYSQL_PASS, MYSQL_DB
+from datetime import datetime, timezone
+from app.core.config import (
+    MYSQL_CONNECT_TIMEOUT, MYSQL_READ_TIMEOUT,
+    ZABBIX_DB_POOL_SIZE, ZABBIX_DB_POOL_TIMEOUT, ZABBIX_DB_POOL_MAX_LIFETIME, ZABBIX_DB_POOL_PING_AFTER,
+    ZABBIX_DB_STREAM_CHUNK, ZABBIX_HISTORY_CACHE,
+)
+from app.core.db_pool import ConnectionPool
+from app.core.deadline import call_timeout
+from app.core.governor import governed_cursor_class, governed_streaming_cursor_class
 from app.core.logging import logger
+from app.zabbix.series import BucketAggregator, ItemSeries
+from app.zabbix.sources import get_source
+
+# Consultas limitadas pelo governor (recurso "zabbix_db")
+ZabbixDictCursor = governed_cursor_class(pymysql.cursors.DictCursor, "zabbix_db")
+# Cursor de tuplas (sem dict por linha) para leituras grandes de histórico
+ZabbixCursor = governed_cursor_class(pymysql.cursors.Cursor, "zabbix_db")
+# Cursor sem buffer no cliente (linhas lidas do socket sob demanda), para streaming
+ZabbixStreamingCursor = governed_streaming_cursor_class(pymysql.cursors.SSCursor, "zabbix_db")
+
+# value_type do item -> (tabela de histórico, nome do tipo)
+HISTORY_TABLES = {
+    0: ('history',       'float'),
+    1: ('history_str',   'str'),
+    2: ('history_log',   'log'),
+    3: ('history_uint',  'uint'),
+    4: ('history_text',  'text')
+}
+# Tendências horárias (min/avg/max) existem só para os tipos numéricos
+TRENDS_TABLES = {0: 'trends', 3: 'trends_uint'}
+NUMERIC_TYPES = tuple(TRENDS_TABLES)
+
+# Ids por consulta em "WHERE ... IN (...)" (evita pacotes/planos gigantes)
+IN_CHUNK_SIZE = 1000
+# Itens por consulta nas leituras "últimos N pontos" (um SELECT ... LIMIT por item, em UNION ALL)
+LATEST_CHUNK_SIZE = 100
+
+
+def _chunks(ids: list, size: int = IN_CHUNK_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _placeholders(ids: list) -> str:
+    return ", ".join(["%s"] * len(ids))
+
+
+def _clock_between(from_time, to_time) -> str:
+    """
+    Filtro de período em clock. Epoch (int) vai direto para o SQL; texto
+    'AAAA-MM-DD HH:MM:SS' passa por UNIX_TIMESTAMP (interpretado no fuso da sessão MySQL).
+    """
+    if isinstance(from_time, (int, np.integer)) and isinstance(to_time, (int, np.integer)):
+        return "clock BETWEEN %s AND %s"
+    return "clock BETWEEN UNIX_TIMESTAMP(%s) AND UNIX_TIMESTAMP(%s)"
+
+
+def _latest_query(table: str, n_ids: int, columns: str, order: str) -> tuple:
+    """
+    Últimos N pontos de cada item em uma consulta: um ramo por item com
+    ORDER BY clock DESC LIMIT N (usa o índice itemid+clock), unidos com UNION ALL.
+    Argumentos por ramo: itemid, from_time, to_time, limit.
+    """
+    branch = f"""(
+        SELECT itemid, clock, {columns}
+        FROM {table}
+        WHERE itemid = %s
+          AND clock BETWEEN UNIX_TIMESTAMP(%s) AND UNIX_TIMESTAMP(%s)
+        ORDER BY clock DESC
+        LIMIT %s
+    )"""
+    return f"SELECT * FROM ({' UNION ALL '.join([branch] * n_ids)}) latest ORDER BY {order}"
 
-def get_db_connection():
-    """Conexão com o banco MySQL do Zabbix."""
+def get_db_connection(source: str = None):
+    """
+    Abre uma conexão NOVA com o banco MySQL do Zabbix da fonte informada (padrão: fonte
+    do contexto atual). Usada pelo pool; para consultas use db_connection().
+    """
+    cfg = get_source(source)
+    if not cfg.mysql:
+        raise RuntimeError(f"Fonte Zabbix '{cfg.name}' sem acesso ao banco configurado (use a fonte de métricas 'api')")
     return pymysql.connect(
-        host=MYSQL_HOST,
-        user=MYSQL_USER,
-        password=MYSQL_PASS,
-        database=MYSQL_DB,
+        host=cfg.mysql.get("host"),
+        user=cfg.mysql.get("user"),
+        password=cfg.mysql.get("password"),
+        database=cfg.mysql.get("db"),
+        port=int(cfg.mysql.get("port", 3306)),
         charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
+        cursorclass=ZabbixDictCursor,
+        # Conexões reaproveitadas: sem autocommit, o InnoDB (REPEATABLE READ) manteria o
+        # snapshot da primeira consulta e o histórico novo não apareceria
+        autocommit=True,
+        connect_timeout=call_timeout(MYSQL_CONNECT_TIMEOUT, "conexão MySQL Zabbix"),
+        read_timeout=call_timeout(MYSQL_READ_TIMEOUT, "consulta MySQL Zabbix"),
+        write_timeout=call_timeout(MYSQL_READ_TIMEOUT, "consulta MySQL Zabbix")
     )
 
+# ---------------------- pool de conexões ----------------------
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_db_pool(source: str = None) -> ConnectionPool:
+    """Pool da fonte informada (padrão: fonte do contexto atual), criado no primeiro uso."""
+    name = get_source(source).name
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ConnectionPool(
+                f"zabbix_db:{name}", lambda: get_db_connection(name),
+                max_size=ZABBIX_DB_POOL_SIZE, timeout=ZABBIX_DB_POOL_TIMEOUT,
+                max_lifetime=ZABBIX_DB_POOL_MAX_LIFETIME, ping_after=ZABBIX_DB_POOL_PING_AFTER
+            )
+        return pool
+
+
+@contextmanager
+def db_connection(source: str = None):
+    """
+    Conexão do pool do MySQL do Zabbix. O timeout de leitura/escrita é renovado a cada
+    retirada (respeita o deadline do relatório atual, não o de quem abriu a conexão).
+    """
+    with get_db_pool(source).connection() as conn:
+        # pymysql aplica _read_timeout/_write_timeout no socket a cada leitura/escrita
+        conn._read_timeout = call_timeout(MYSQL_READ_TIMEOUT, "consulta MySQL Zabbix")
+        conn._write_timeout = conn._read_timeout
+        yield conn
+
+
+def db_pool_stats() -> dict:
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.stats() for name, pool in sorted(pools.items())}
+
+
 def get_metrics_by_item(itemid: int, from_time: str, to_time: str):
     """Consulta a view v_zabbix_metrics para valores do gráfico."""
     query = """
@@ -26,16 +152,73 @@ def get_metrics_by_item(itemid: int, from_time: str, to_time: str):
         ORDER BY clock ASC
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with db_connection() as conn, conn.cursor() as cursor:
             cursor.execute(query, (itemid, from_time, to_time))
-            results = cursor.fetchall()
-        return results
+            return cursor.fetchall()
     except Exception as e:
         logger.error(f"Erro ao buscar métricas do banco: {str(e)}")
         raise
-    finally:
-        conn.close()
+
+def get_items_metadata(itemids) -> dict:
+    """
+    Metadados de vários itens em uma consulta por bloco de IN_CHUNK_SIZE ids:
+    {itemid: {"itemid", "name", "value_type", "units", "graphids"}}.
+    Itens inexistentes ficam de fora do dicionário.
+    """
+    ids = sorted({int(i) for i in itemids})
+    result = {}
+    if not ids:
+        return result
+    with db_connection() as conn, conn.cursor() as cursor:
+        for chunk in _chunks(ids):
+            cursor.execute(f"""
+                SELECT i.itemid, i.name, i.value_type, i.units,
+                       GROUP_CONCAT(gi.graphid) AS graphids
+                FROM items i
+                LEFT JOIN graphs_items gi ON gi.itemid = i.itemid
+                WHERE i.itemid IN ({_placeholders(chunk)})
+                GROUP BY i.itemid, i.name, i.value_type, i.units
+            """, chunk)
+            for r in cursor.fetchall():
+                result[r["itemid"]] = {
+                    "itemid": r["itemid"],
+                    "name": r["name"],
+                    "value_type": r["value_type"],
+                    "units": r["units"] or "",
+                    "graphids": [int(g) for g in r["graphids"].split(",")] if r["graphids"] else [],
+                }
+    logger.info(f"[ZABBIX] Metadados de {len(result)}/{len(ids)} itens em {-(-len(ids) // IN_CHUNK_SIZE)} consulta(s).")
+    return result
+
+
+def get_items_by_graphs(graph_ids) -> dict:
+    """
+    Itens de vários gráficos com value_type/units, em uma consulta por bloco:
+    {graphid: [{"itemid", "item_name", "value_type", "units"}]} (ordem do gráfico).
+    Gráficos sem itens aparecem com lista vazia.
+    """
+    ids = sorted({int(g) for g in graph_ids})
+    result = {graph_id: [] for graph_id in ids}
+    if not ids:
+        return result
+    with db_connection() as conn, conn.cursor() as cursor:
+        for chunk in _chunks(ids):
+            cursor.execute(f"""
+                SELECT gi.graphid, gi.itemid, i.name AS item_name, i.value_type, i.units
+                FROM graphs_items gi
+                JOIN items i ON gi.itemid = i.itemid
+                WHERE gi.graphid IN ({_placeholders(chunk)})
+                ORDER BY gi.graphid, gi.sortorder, gi.gitemid
+            """, chunk)
+            for r in cursor.fetchall():
+                result[r["graphid"]].append({
+                    "itemid": r["itemid"],
+                    "item_name": r["item_name"],
+                    "value_type": r["value_type"],
+                    "units": r["units"] or "",
+                })
+    return result
+
 
 def get_item_value_type(itemid):
     """
@@ -43,9 +226,8 @@ def get_item_value_type(itemid):
     Retorna um inteiro correspondente ao tipo (0=float, 1=str, 2=log, 3=uint, 4=text)
     """
     query = "SELECT value_type FROM items WHERE itemid = %s"
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
+        with db_connection() as conn, conn.cursor() as cursor:
             cursor.execute(query, (itemid,))
             result = cursor.fetchone()
         if not result:
@@ -55,96 +237,473 @@ def get_item_value_type(itemid):
     except Exception as e:
         logger.error(f"[ZABBIX] Erro ao buscar value_type do item {itemid}: {str(e)}")
         return None
-    finally:
-        conn.close()
 
-def get_item_metrics(itemid, from_time, to_time,):
+def get_item_metrics(itemid, from_time, to_time, limit: int = None, value_type: int = None):
     """
-    Busca o histórico de um item, automaticamente escolhendo a tabela de acordo com o tipo do dado.
+    Histórico de um item no formato antigo (adaptador de get_items_metrics).
     Sempre retorna lista de dicts: {itemid, item_name, data_coleta, value, value_type, tipo_str}
+    - limit: no máximo N registros (os mais recentes)
+    - value_type: mantido por compatibilidade; nome/tipo vêm de get_items_metadata
     """
-    value_type = get_item_value_type(itemid)
-    if value_type is None:
-        logger.warning(f"[ZABBIX] value_type não encontrado para itemid {itemid}.")
-        return []
-
-    type_map = {
-        0: ('history',       'float'),
-        1: ('history_str',   'str'),
-        2: ('history_log',   'log'),
-        3: ('history_uint',  'uint'),
-        4: ('history_text',  'text')
-    }
-    if value_type not in type_map:
-        logger.error(f"[ZABBIX] value_type {value_type} desconhecido para itemid {itemid}.")
-        return []
-    table, tipo_str = type_map[value_type]
-
-    query = f"""
-        SELECT 
-            h.itemid, 
-            i.name AS item_name,
-            FROM_UNIXTIME(h.clock) AS data_coleta,
-            h.value,
-            i.value_type
-        FROM {table} h
-        JOIN items i ON h.itemid = i.itemid
-        WHERE h.itemid = %s 
-          AND h.clock BETWEEN UNIX_TIMESTAMP(%s) AND UNIX_TIMESTAMP(%s)
-        ORDER BY h.clock DESC
-    """
-
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            logger.info(f"[ZABBIX] Buscando dados do item {itemid} ({tipo_str}) entre {from_time} e {to_time} na tabela {table}.")
-            cursor.execute(query, (itemid, from_time, to_time))
-            rows = cursor.fetchall()
-            for r in rows:
-                r['tipo_str'] = tipo_str
+        rows = get_items_metrics([{"itemid": itemid}], from_time, to_time, limit=limit).get(int(itemid), [])
         logger.info(f"[ZABBIX] {len(rows)} registros retornados para item {itemid}.")
         return rows
     except Exception as e:
-        logger.error(f"[ZABBIX] Erro ao buscar dados do item {itemid} na tabela {table}: {str(e)}")
+        logger.error(f"[ZABBIX] Erro ao buscar dados do item {itemid}: {str(e)}")
         return []
-    finally:
-        conn.close()
 
-def get_last_value_of_item(itemid):
+def get_item_history_points(itemid, from_time, to_time, value_type: int = None):
     """
-    Retorna o último valor de um item (qualquer tipo). Para texto, retorna apenas o último.
-    Para numéricos, retorna todos os pontos do período.
+    Histórico numérico de um item como (value_type, [{clock, value}]) em ordem crescente,
+    com clock em epoch (sem FROM_UNIXTIME). Usado pela fonte de métricas "db".
+    Para itens não numéricos retorna (value_type, []).
     """
-    value_type = get_item_value_type(itemid)
     if value_type is None:
-        return None
+        value_type = get_item_value_type(itemid)
+    table = {0: 'history', 3: 'history_uint'}.get(value_type)
+    if table is None:
+        return value_type, []
+
+    query = f"""
+        SELECT clock, value
+        FROM {table}
+        WHERE itemid = %s
+          AND clock BETWEEN UNIX_TIMESTAMP(%s) AND UNIX_TIMESTAMP(%s)
+        ORDER BY clock ASC
+    """
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(query, (itemid, from_time, to_time))
+        rows = cursor.fetchall()
+    logger.info(f"[ZABBIX] {len(rows)} pontos retornados para item {itemid} ({table}).")
+    return value_type, rows
+
+def _with_value_types(items: list) -> list:
+    """Completa value_type/name/units dos itens que vierem sem eles (uma consulta em lote)."""
+    missing = [i["itemid"] for i in items if i.get("value_type") is None]
+    if not missing:
+        return items
+    metadata = get_items_metadata(missing)
+    completed = []
+    for item in items:
+        meta = metadata.get(int(item["itemid"]))
+        if item.get("value_type") is None and meta:
+            item = {"item_name": meta["name"], "units": meta["units"], **item, "value_type": meta["value_type"]}
+        completed.append(item)
+    return completed
+
+
+def _group_by_value_type(items: list, value_types=None) -> dict:
+    """{value_type: [itemids]} para os itens cujo tipo está em value_types."""
+    by_type = {}
+    for item in items:
+        value_type = item.get("value_type")
+        if value_type in HISTORY_TABLES and (value_types is None or value_type in value_types):
+            by_type.setdefault(value_type, []).append(int(item["itemid"]))
+    return by_type
+
+
+def _group_by_table(items: list, value_types=None) -> dict:
+    """{tabela de histórico: [itemids]} para os itens cujo tipo está em value_types."""
+    return {HISTORY_TABLES[value_type][0]: ids for value_type, ids in _group_by_value_type(items, value_types).items()}
+
+
+def _split_by_item(rows, itemids, n_values: int) -> dict:
+    """
+    Linhas (itemid, clock, v1..vn) ordenadas por itemid -> {itemid: (clock int64[], v1 float64[], ...)}.
+    Itens de 'itemids' sem linhas ficam com arrays vazios.
+    """
+    empty = (np.empty(0, dtype=np.int64),) + tuple(np.empty(0, dtype=np.float64) for _ in range(n_values))
+    result = {itemid: empty for itemid in itemids}
+    if not rows:
+        return result
+    ids, clocks, *values = (np.asarray(col) for col in zip(*rows))
+    # Linhas já vêm agrupadas por itemid: cada bloco começa onde o id muda
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], ids.size]):
+        result[int(ids[start])] = (clocks[start:end].astype(np.int64),) + tuple(
+            v[start:end].astype(np.float64) for v in values
+        )
+    return result
 
-    # Para texto/str/log (1, 2, 4), busca só o último
-    if value_type in [1, 2, 4]:
-        type_map = {
-            1: 'history_str',
-            2: 'history_log',
-            4: 'history_text'
+
+def iter_items_history(items: list, from_time, to_time, chunk_size: int = ZABBIX_DB_STREAM_CHUNK):
+    """
+    Histórico numérico de vários itens em streaming (SSCursor): uma consulta por tabela,
+    linhas lidas do socket em blocos de 'chunk_size' e entregues como arrays NumPy.
+    Gera (itemid, clock int64[], value float64[]) por trecho contíguo de um item (ordem
+    itemid, clock); um item pode vir em vários trechos. Memória limitada ao bloco.
+    - from_time/to_time: texto (fuso da sessão MySQL) ou epoch int (limites exatos)
+    """
+    items = _with_value_types(items)
+    with db_connection() as conn:
+        for table, itemids in _group_by_table(items, value_types=NUMERIC_TYPES).items():
+            for chunk in _chunks(itemids):
+                # O cursor sem buffer ocupa a conexão até ser lido por completo/fechado
+                with conn.cursor(ZabbixStreamingCursor) as cursor:
+                    cursor.execute(f"""
+                        SELECT itemid, clock, value
+                        FROM {table}
+                        WHERE itemid IN ({_placeholders(chunk)})
+                          AND {_clock_between(from_time, to_time)}
+                        ORDER BY itemid, clock
+                    """, [*chunk, from_time, to_time])
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        for itemid, (clock, value) in _split_by_item(rows, (), 1).items():
+                            yield itemid, clock, value
+
+
+def get_items_history(items: list, from_time, to_time) -> dict:
+    """
+    Histórico numérico de vários itens com UMA consulta por tabela de histórico
+    (itemid IN (...) AND clock BETWEEN ...), sem join com items.
+    - items: [{"itemid", "value_type"?}] (value_type ausente é buscado em lote)
+    - from_time/to_time: texto (fuso da sessão MySQL) ou epoch int (limites exatos)
+    Retorna {itemid: (clock int64[], value float64[])} em ordem crescente de clock;
+    itens sem dados no período ficam com arrays vazios.
+    Lido em streaming: só os arrays finais ficam em memória, não as tuplas do driver.
+    """
+    items = _with_value_types(items)
+    parts = {int(i["itemid"]): ([], []) for i in items if i.get("value_type") in NUMERIC_TYPES}
+    total = 0
+    for itemid, clock, value in iter_items_history(items, from_time, to_time):
+        parts[itemid][0].append(clock)
+        parts[itemid][1].append(value)
+        total += clock.size
+    logger.info(f"[ZABBIX] {total} pontos de histórico lidos para {len(parts)} itens.")
+    return {
+        itemid: (
+            np.concatenate(clocks) if clocks else np.empty(0, dtype=np.int64),
+            np.concatenate(values) if values else np.empty(0, dtype=np.float64),
+        )
+        for itemid, (clocks, values) in parts.items()
+    }
+
+
+def cached_items_history(items: list, from_time: str, to_time: str) -> dict:
+    """
+    get_items_history passando pelo cache local (ZABBIX_HISTORY_CACHE): dias encerrados
+    vêm dos arquivos Parquet, só o trecho aberto é lido do MySQL. Mesmo formato de retorno.
+    """
+    if not ZABBIX_HISTORY_CACHE:
+        return get_items_history(items, from_time, to_time)
+    from app.zabbix.history_cache import get_history_cache
+    numeric = [i for i in _with_value_types(items) if i.get("value_type") in NUMERIC_TYPES]
+    return get_history_cache(get_source().name).get(numeric, from_time, to_time, iter_items_history)
+
+
+def iter_cached_items_history(items: list, from_ts: int, to_ts: int):
+    """
+    iter_items_history passando pelo cache local (ZABBIX_HISTORY_CACHE): gera
+    (itemid, clock, value) por item-dia dos arquivos Parquet e por trecho do streaming
+    ao vivo, sem concatenar a janela. Um item pode vir em vários blocos, fora de ordem.
+    Janela em epoch nos dois caminhos: o fuso da sessão MySQL não entra na conta.
+    """
+    if not ZABBIX_HISTORY_CACHE:
+        return iter_items_history(items, from_ts, to_ts)
+    from app.zabbix.history_cache import get_history_cache
+    numeric = [i for i in _with_value_types(items) if i.get("value_type") in NUMERIC_TYPES]
+    return get_history_cache(get_source().name).iter_blocks(numeric, from_ts, to_ts, iter_items_history)
+
+
+def aggregate_items_history(items: list, from_time: str, to_time: str, max_points: int, tz=None) -> dict:
+    """
+    Mesmo resultado de get_items_history_buckets, agregado no cliente: o histórico bruto
+    vem em streaming (ou do cache local, se habilitado) e cada bloco alimenta um
+    BucketAggregator por item (memória proporcional a max_points, não à janela).
+    Alivia o MySQL de GROUP BY em janelas longas. Retorna {itemid: BucketAggregator}.
+    """
+    if tz is None:
+        from app.zabbix.service import ZABBIX_TIMEZONE as tz
+    from_ts = int(datetime.strptime(from_time, "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz).timestamp())
+    to_ts = int(datetime.strptime(to_time, "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz).timestamp())
+    items = _with_value_types(items)
+    aggregators = {
+        int(i["itemid"]): BucketAggregator(from_ts, to_ts, max_points)
+        for i in items if i.get("value_type") in NUMERIC_TYPES
+    }
+    # Mesmos limites (epoch, no fuso tz) para o SQL e para os buckets
+    for itemid, clock, value in iter_cached_items_history(items, from_ts, to_ts):
+        aggregators[itemid].feed(clock, value)
+    return aggregators
+
+
+def get_items_trends(items: list, from_time: str, to_time: str) -> dict:
+    """
+    Tendência horária (trends/trends_uint) de vários itens, uma consulta por tabela.
+    A hora corrente ainda não está em trends: esse trecho final vem do histórico
+    (mínimo = média = máximo = valor), para o gráfico não terminar antes do fim da janela.
+    Retorna {itemid: (clock int64[], avg float64[], min float64[], max float64[])}; itens sem
+    nenhuma linha de trends na janela ficam de fora (quem chama decide o fallback).
+    """
+    items = _with_value_types(items)
+    result = {}
+    with db_connection() as conn, conn.cursor(ZabbixCursor) as cursor:
+        for value_type, itemids in _group_by_value_type(items, NUMERIC_TYPES).items():
+            trends_table, history_table = TRENDS_TABLES[value_type], HISTORY_TABLES[value_type][0]
+            for chunk in _chunks(itemids):
+                cursor.execute(f"""
+                    SELECT itemid, clock, value_avg, value_min, value_max
+                    FROM {trends_table}
+                    WHERE itemid IN ({_placeholders(chunk)})
+                      AND clock BETWEEN FLOOR(UNIX_TIMESTAMP(%s) / 3600) * 3600 AND UNIX_TIMESTAMP(%s)
+                    ORDER BY itemid, clock
+                """, [*chunk, from_time, to_time])
+                trends = _split_by_item(cursor.fetchall(), chunk, 3)
+                # Hora corrente (ainda sem trends); janela no passado = intervalo vazio
+                cursor.execute(f"""
+                    SELECT itemid, clock, value
+                    FROM {history_table}
+                    WHERE itemid IN ({_placeholders(chunk)})
+                      AND clock BETWEEN GREATEST(UNIX_TIMESTAMP(%s), FLOOR(UNIX_TIMESTAMP() / 3600) * 3600)
+                                    AND UNIX_TIMESTAMP(%s)
+                    ORDER BY itemid, clock
+                """, [*chunk, from_time, to_time])
+                tail = _split_by_item(cursor.fetchall(), chunk, 1)
+                for itemid in chunk:
+                    clock, avg, low, high = trends[itemid]
+                    if not clock.size:
+                        continue
+                    tail_clock, tail_value = tail[itemid]
+                    keep = clock < (tail_clock[0] // 3600) * 3600 if tail_clock.size else slice(None)
+                    result[itemid] = (
+                        np.concatenate([clock[keep], tail_clock]),
+                        np.concatenate([avg[keep], tail_value]),
+                        np.concatenate([low[keep], tail_value]),
+                        np.concatenate([high[keep], tail_value]),
+                    )
+            logger.info(f"[ZABBIX] {len(itemids)} itens lidos de {trends_table} (+ hora corrente de {history_table}).")
+    return result
+
+
+def hourly_points(from_time: str, to_time: str) -> int:
+    """Número de pontos com 1 por hora na janela (mesma resolução de trends)."""
+    return max(1, bucket_seconds(from_time, to_time, 1) // 3600)
+
+
+def bucket_seconds(from_time: str, to_time: str, max_points: int) -> int:
+    """Tamanho do bucket (s) para no máximo 'max_points' pontos na janela."""
+    window = (
+        datetime.strptime(to_time, "%Y-%m-%d %H:%M:%S") - datetime.strptime(from_time, "%Y-%m-%d %H:%M:%S")
+    ).total_seconds()
+    return max(1, math.ceil(window / max(1, max_points)))
+
+
+def _bucket_query(table: str, n_ids: int) -> str:
+    """Agregação no MySQL: um registro (avg/min/max/count) por item e bucket de tempo."""
+    return f"""
+        SELECT itemid, (clock DIV %s) * %s AS bucket,
+               AVG(value) AS value_avg, MIN(value) AS value_min, MAX(value) AS value_max, COUNT(*) AS num
+        FROM {table}
+        WHERE itemid IN ({", ".join(["%s"] * n_ids)})
+          AND clock BETWEEN UNIX_TIMESTAMP(%s) AND UNIX_TIMESTAMP(%s)
+        GROUP BY itemid, bucket
+        ORDER BY itemid, bucket
+    """
+
+
+def get_items_history_buckets(items: list, from_time: str, to_time: str, max_points: int) -> dict:
+    """
+    Histórico numérico agregado no MySQL (GROUP BY clock DIV bucket), com no máximo
+    'max_points' pontos por item: só os agregados trafegam, não as linhas brutas.
+    Retorna {itemid: (bucket int64[], avg float64[], min float64[], max float64[], count float64[])}.
+    """
+    items = _with_value_types(items)
+    bucket = bucket_seconds(from_time, to_time, max_points)
+    result = {}
+    with db_connection() as conn, conn.cursor(ZabbixCursor) as cursor:
+        for table, itemids in _group_by_table(items, value_types=NUMERIC_TYPES).items():
+            for chunk in _chunks(itemids):
+                cursor.execute(_bucket_query(table, len(chunk)), [bucket, bucket, *chunk, from_time, to_time])
+                result.update(_split_by_item(cursor.fetchall(), chunk, 4))
+            logger.info(f"[ZABBIX] {len(itemids)} itens agregados de {table} em buckets de {bucket}s.")
+    return result
+
+
+def get_items_history_latest(items: list, from_time: str, to_time: str, limit: int) -> dict:
+    """
+    Os 'limit' pontos mais recentes de cada item numérico na janela, com o LIMIT no
+    MySQL (só esses pontos são lidos). Mesmo formato de get_items_history.
+    """
+    items = _with_value_types(items)
+    result = {}
+    with db_connection() as conn, conn.cursor(ZabbixCursor) as cursor:
+        for table, itemids in _group_by_table(items, value_types=NUMERIC_TYPES).items():
+            for chunk in _chunks(itemids, LATEST_CHUNK_SIZE):
+                cursor.execute(
+                    _latest_query(table, len(chunk), "value", "itemid, clock"),
+                    [arg for itemid in chunk for arg in (itemid, from_time, to_time, int(limit))]
+                )
+                result.update(_split_by_item(cursor.fetchall(), chunk, 1))
+    return result
+
+
+def get_items_series(items: list, from_time: str, to_time: str, max_points: int = None,
+                     use_trends: bool = False, aggregation: str = "sql", tz=None, limit: int = None) -> dict:
+    """
+    Séries colunares (ItemSeries: clock int64[] + value float64[], metadados uma vez) dos
+    itens numéricos, lidas com cursores de tuplas; é a API usada por relatórios e rotas.
+    - use_trends: trends/trends_uint (média horária com envelope mín/máx)
+    - max_points: histórico agregado em até N buckets (média com envelope mín/máx),
+      no MySQL (aggregation="sql") ou no backend em streaming (aggregation="stream")
+    - limit: só os N pontos mais recentes do histórico bruto (LIMIT no MySQL; sem max_points)
+    Com ZABBIX_HISTORY_CACHE, o histórico bruto sai do cache local (dias encerrados) e,
+    com max_points, é agregado no backend (o GROUP BY do MySQL releria os dias do cache).
+    Itens sem trends na janela (trends=0 no item, ou housekeeping de trends antes do
+    histórico) caem para o histórico agregado em max_points (padrão: 1 ponto por hora).
+    Retorna {itemid: ItemSeries}; itens não numéricos ficam de fora.
+    """
+    items = _with_value_types(items)
+    fallback = {}
+    if use_trends:
+        fetched, source = get_items_trends(items, from_time, to_time), "trends"
+        no_trends = [i for i in items if i.get("value_type") in NUMERIC_TYPES and int(i["itemid"]) not in fetched]
+        if no_trends:
+            logger.info(f"[ZABBIX] {len(no_trends)} itens sem trends na janela: usando o histórico agregado.")
+            fallback = get_items_series(
+                no_trends, from_time, to_time, max_points=max_points or hourly_points(from_time, to_time),
+                aggregation=aggregation, tz=tz
+            )
+    elif max_points and (aggregation == "stream" or ZABBIX_HISTORY_CACHE):
+        aggregators = aggregate_items_history(items, from_time, to_time, max_points, tz)
+        return {
+            int(i["itemid"]): aggregators[int(i["itemid"])].to_series(
+                i["itemid"], i.get("item_name") or i.get("name"),
+                units=i.get("units") or "", value_type=i["value_type"], source="history"
+            )
+            for i in items if int(i["itemid"]) in aggregators
         }
-        table = type_map.get(value_type)
-        query = f"""
-            SELECT h.itemid, i.name AS item_name, FROM_UNIXTIME(h.clock) AS data_coleta, h.value
-            FROM {table} h
-            JOIN items i ON h.itemid = i.itemid
-            WHERE h.itemid = %s
-            ORDER BY h.clock DESC
-            LIMIT 1
-        """
-        conn = get_db_connection()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(query, (itemid,))
-                row = cursor.fetchone()
-            return row
-        finally:
-            conn.close()
+    elif max_points:
+        fetched, source = get_items_history_buckets(items, from_time, to_time, max_points), "history"
+    elif limit:
+        fetched, source = get_items_history_latest(items, from_time, to_time, limit), "history"
     else:
-        return get_item_metrics(itemid, '1970-01-01 00:00:00', datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 100)
+        fetched, source = cached_items_history(items, from_time, to_time), "history"
+
+    series = {}
+    for item in items:
+        itemid = int(item["itemid"])
+        points = fetched.get(itemid)
+        if points is None:  # item não numérico (ou inexistente), ou sem trends
+            if itemid in fallback:
+                series[itemid] = fallback[itemid]
+            continue
+        clock, value, *envelope = points[:4]
+        series[itemid] = ItemSeries(
+            str(itemid), item.get("item_name") or item.get("name"), clock, value, *envelope,
+            units=item.get("units") or "", value_type=item["value_type"], source=source,
+            count=points[4].astype(np.int64) if len(points) > 4 else None
+        )
+    return series
+
+
+def get_items_metrics(items: list, from_time: str, to_time: str, limit: int = None, max_points: int = None,
+                      tz=None) -> dict:
+    """
+    Versão em lote de get_item_metrics (mesmo formato de linha, clock decrescente):
+    uma consulta por tabela de histórico; item_name vem dos metadados, não de join.
+    Numéricos são adaptados de get_items_series; texto/log/str continuam lidos linha a
+    linha. data_coleta sai do clock no fuso tz (padrão o do Zabbix) para os dois tipos.
+    - limit: no máximo N registros por item (os mais recentes)
+    - max_points: itens numéricos agregados no MySQL em até N buckets; cada linha
+      traz value (média), min, max e count do bucket, e data_coleta = início do bucket
+    Retorna {itemid: [linhas]}.
+    """
+    if tz is None:
+        from app.zabbix.service import ZABBIX_TIMEZONE as tz
+    items = _with_value_types(items)
+    result = {int(i["itemid"]): [] for i in items}
+    numeric = [i for i in items if i.get("value_type") in NUMERIC_TYPES]
+    series_by_item = get_items_series(
+        numeric, from_time, to_time, max_points=max_points, limit=None if max_points else limit
+    )
+    for itemid, series in series_by_item.items():
+        result[itemid] = series_rows(series, HISTORY_TABLES[series.value_type][1], tz, limit)
+
+    text = [i for i in items if i.get("value_type") not in NUMERIC_TYPES]
+    names = {int(i["itemid"]): i.get("item_name") or i.get("name") for i in text}
+    with db_connection() as conn, conn.cursor() as cursor:
+        for value_type, itemids in _group_by_value_type(text).items():
+            table, tipo_str = HISTORY_TABLES[value_type]
+            for chunk in _chunks(itemids, LATEST_CHUNK_SIZE if limit else IN_CHUNK_SIZE):
+                if limit:
+                    cursor.execute(
+                        _latest_query(table, len(chunk), "value", "itemid, clock DESC"),
+                        [arg for itemid in chunk for arg in (itemid, from_time, to_time, int(limit))]
+                    )
+                else:
+                    cursor.execute(f"""
+                        SELECT itemid, clock, value
+                        FROM {table}
+                        WHERE itemid IN ({_placeholders(chunk)})
+                          AND clock BETWEEN UNIX_TIMESTAMP(%s) AND UNIX_TIMESTAMP(%s)
+                        ORDER BY itemid, clock DESC
+                    """, [*chunk, from_time, to_time])
+                for r in cursor.fetchall():
+                    rows = result[r["itemid"]]
+                    rows.append({
+                        "itemid": r["itemid"],
+                        "item_name": names[r["itemid"]],
+                        # Mesmo fuso das linhas numéricas (series_rows), não o da sessão MySQL
+                        "data_coleta": datetime.fromtimestamp(int(r["clock"]), tz=timezone.utc).astimezone(tz).replace(tzinfo=None),
+                        "value": r["value"],
+                        "value_type": value_type,
+                        "tipo_str": tipo_str,
+                    })
+    return result
+
+
+def series_rows(series: ItemSeries, tipo_str: str, tz, limit: int = None) -> list:
+    """
+    Adaptador ItemSeries -> linhas no formato antigo (clock decrescente):
+    {itemid, item_name, data_coleta, value, value_type, tipo_str} (+ min/max/count se agregada).
+    """
+    n = len(series)
+    start = max(0, n - limit) if limit else 0
+    times = series.datetimes(tz)
+    rows = []
+    for k in range(n - 1, start - 1, -1):
+        row = {
+            "itemid": int(series.itemid),
+            "item_name": series.name,
+            "data_coleta": times[k],
+            "value": float(series.value[k]),
+            "value_type": series.value_type,
+            "tipo_str": tipo_str,
+        }
+        if series.value_min is not None:
+            row.update(min=float(series.value_min[k]), max=float(series.value_max[k]))
+        if series.count is not None:
+            row["count"] = int(series.count[k])
+        rows.append(row)
+    return rows
+
+
+def get_last_value_of_item(itemid, value_type: int = None):
+    """
+    Retorna o último valor de um item (qualquer tipo): {itemid, item_name, data_coleta, value},
+    com ORDER BY clock DESC LIMIT 1 (só uma linha é lida, pelo índice itemid+clock).
+    """
+    if value_type is None:
+        value_type = get_item_value_type(itemid)
+    if value_type not in HISTORY_TABLES:
+        return None
+
+    table = HISTORY_TABLES[value_type][0]
+    query = f"""
+        SELECT h.itemid, i.name AS item_name, FROM_UNIXTIME(h.clock) AS data_coleta, h.value
+        FROM {table} h
+        JOIN items i ON h.itemid = i.itemid
+        WHERE h.itemid = %s
+        ORDER BY h.clock DESC
+        LIMIT 1
+    """
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(query, (itemid,))
+        return cursor.fetchone()
 
 def get_items_by_graph(graph_id: int):
     """
@@ -157,16 +716,11 @@ def get_items_by_graph(graph_id: int):
         JOIN items i ON gi.itemid = i.itemid
         WHERE gi.graphid = %s
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with db_connection() as conn, conn.cursor() as cursor:
             cursor.execute(query, (graph_id,))
             rows = cursor.fetchall()
             return [{"itemid": r["itemid"], "item_name": r["item_name"]} for r in rows]
     except Exception as e:
         logger.error(f"Erro ao buscar itens do gráfico {graph_id}: {str(e)}")
         return []
-    finally:
-        if conn:
-            conn.close()
@@ -0,0 +1,195 @@
+# app/zabbix/downtime.py
+# ------------------------------------------------------------
+# Motor de cálculo de downtime a partir de eventos de trigger.
+#
+# - Estado PROBLEM/OK mantido por trigger (objectid): problemas
+#   simultâneos de triggers diferentes não se sobrepõem nem se perdem.
+# - Intervalos guardados em arrays compactos (array('q') -> NumPy),
+#   já recortados à janela [from_ts, to_ts].
+# - União dos intervalos por host e por hostgroup vetorizada em NumPy.
+# - Timestamps só são formatados na saída (to_dict).
+# ------------------------------------------------------------
+
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+
+def union_seconds(starts: np.ndarray, ends: np.ndarray) -> int:
+    """Duração total (s) da união de intervalos [start, end), sem contar sobreposições."""
+    if starts.size == 0:
+        return 0
+    order = np.argsort(starts, kind="stable")
+    s = starts[order]
+    e = ends[order]
+    run_end = np.maximum.accumulate(e)
+    # Um novo bloco começa quando o início passa do maior fim visto até ali
+    new_block = np.empty(s.size, dtype=bool)
+    new_block[0] = True
+    new_block[1:] = s[1:] > run_end[:-1]
+    block_idx = np.flatnonzero(new_block)
+    block_start = s[block_idx]
+    block_end = np.maximum.reduceat(e, block_idx)
+    return int((block_end - block_start).sum())
+
+
+class DowntimeEngine:
+    """
+    Consome eventos (em qualquer tamanho de página) e constrói os intervalos de
+    downtime por trigger. Uso:
+        engine = DowntimeEngine(from_ts, to_ts)
+        for page in pages: engine.feed(page, triggers_info)
+        result = engine.to_dict(tz)
+    """
+
+    def __init__(self, from_ts: int, to_ts: int):
+        self.from_ts = from_ts
+        self.to_ts = to_ts
+        self._open = {}           # objectid -> índice em _meta do PROBLEM aberto
+        self._seen = set()        # objectids com algum evento já processado na janela
+        self._starts = array("q")
+        self._ends = array("q")
+        self._hosts = array("q")  # código do host (índice em _host_names)
+        self._interval_meta = []  # (índice em _meta do PROBLEM, eventid do OK ou None)
+        self._meta = []           # metadados dos eventos PROBLEM (só o necessário)
+        self._host_codes = {}
+        self._host_names = []
+
+    def _host_code(self, event: dict) -> int:
+        host = (event.get("hosts") or [{}])[0]
+        key = host.get("hostid", "")
+        code = self._host_codes.get(key)
+        if code is None:
+            code = self._host_codes[key] = len(self._host_names)
+            self._host_names.append((key, host.get("name", "Unknown")))
+        return code
+
+    def _close(self, meta_idx: int, end_ts: int, event_id_end):
+        start_ts = max(self._meta[meta_idx]["start_ts"], self.from_ts)
+        end_ts = min(end_ts, self.to_ts)
+        if start_ts >= end_ts:
+            return
+        self._starts.append(start_ts)
+        self._ends.append(end_ts)
+        self._hosts.append(self._meta[meta_idx]["host_code"])
+        self._interval_meta.append((meta_idx, event_id_end))
+
+    def _problem_meta(self, event: dict, start_ts: int, triggers_info: dict, event_id_start) -> int:
+        trigger = triggers_info.get(event["objectid"], {})
+        self._meta.append({
+            "start_ts": start_ts,
+            "event_id_start": event_id_start,
+            "trigger_id": event["objectid"],
+            "acknowledged": bool(int(event.get("acknowledged", 0) or 0)),
+            "severity": event.get("severity", "unknown"),
+            "tags": event.get("tags", []),
+            "host_code": self._host_code(event),
+            "trigger_name": trigger.get("description", "N/A"),
+            "trigger_priority": trigger.get("priority", "N/A"),
+        })
+        return len(self._meta) - 1
+
+    def feed(self, events, triggers_info: dict = None) -> None:
+        """Processa uma página de eventos (ordem crescente de eventid/clock)."""
+        triggers_info = triggers_info or {}
+        for event in events:
+            objectid = event["objectid"]
+            clock = int(event["clock"])
+            first_event = objectid not in self._seen
+            self._seen.add(objectid)
+            if int(event["value"]) == 1:
+                # PROBLEM repetido da mesma trigger (múltiplos problemas) mantém o início mais antigo
+                if objectid not in self._open:
+                    self._open[objectid] = self._problem_meta(event, clock, triggers_info, event["eventid"])
+            else:
+                meta_idx = self._open.pop(objectid, None)
+                if meta_idx is None:
+                    if not first_event:
+                        # OK repetido/atrasado (fechamento manual, correlação): trigger já estava OK
+                        continue
+                    # Primeiro evento da trigger na janela é um OK: o problema começou antes de from_ts
+                    meta_idx = self._problem_meta(event, self.from_ts, triggers_info, None)
+                self._close(meta_idx, clock, event["eventid"])
+
+    def finish(self) -> None:
+        """Fecha no fim da janela os problemas que continuam abertos."""
+        for meta_idx in self._open.values():
+            self._close(meta_idx, self.to_ts, None)
+        self._open.clear()
+
+    # ---------------------------- agregação ----------------------------
+
+    def arrays(self):
+        """(starts, ends, host_codes) como arrays NumPy int64 (cópias dos buffers)."""
+        return tuple(
+            np.frombuffer(buf, dtype=np.int64).copy() if buf else np.empty(0, dtype=np.int64)
+            for buf in (self._starts, self._ends, self._hosts)
+        )
+
+    def total_seconds(self) -> int:
+        """Downtime do hostgroup: união de todos os intervalos."""
+        starts, ends, _ = self.arrays()
+        return union_seconds(starts, ends)
+
+    def seconds_by_host(self) -> dict:
+        """{código do host: união dos intervalos daquele host}."""
+        starts, ends, hosts = self.arrays()
+        if hosts.size == 0:
+            return {}
+        order = np.argsort(hosts, kind="stable")
+        hosts_sorted = hosts[order]
+        codes, first = np.unique(hosts_sorted, return_index=True)
+        bounds = list(first[1:]) + [hosts_sorted.size]
+        result = {}
+        for code, lo, hi in zip(codes, first, bounds):
+            idx = order[lo:hi]
+            result[int(code)] = union_seconds(starts[idx], ends[idx])
+        return result
+
+    def to_dict(self, tz) -> dict:
+        """Saída no formato da API (datas formatadas só aqui)."""
+        starts, ends, _ = self.arrays()
+        total = self.total_seconds()
+        if starts.size == 0:
+            return {"downtime_seconds": 0, "downtime_human": "0s", "intervals": [], "hosts": []}
+
+        def fmt(ts):
+            return datetime.fromtimestamp(int(ts), tz=timezone.utc).astimezone(tz).strftime("%Y-%m-%d %H:%M:%S")
+
+        durations = ends - starts
+        intervals = []
+        for k in np.argsort(starts, kind="stable"):
+            meta_idx, event_id_end = self._interval_meta[k]
+            meta = self._meta[meta_idx]
+            intervals.append({
+                "start": fmt(starts[k]),
+                "end": fmt(ends[k]),
+                "duration_seconds": int(durations[k]),
+                "event_id_start": meta["event_id_start"],
+                "event_id_end": event_id_end,
+                "trigger_id": meta["trigger_id"],
+                "trigger_name": meta["trigger_name"],
+                "trigger_priority": meta["trigger_priority"],
+                "host": self._host_names[meta["host_code"]][1],
+                "severity": meta["severity"],
+                "acknowledged": meta["acknowledged"],
+                "tags": meta["tags"],
+            })
+
+        hosts = [
+            {
+                "hostid": self._host_names[code][0],
+                "host": self._host_names[code][1],
+                "downtime_seconds": seconds,
+                "downtime_human": str(timedelta(seconds=seconds)),
+            }
+            for code, seconds in sorted(self.seconds_by_host().items(), key=lambda kv: -kv[1])
+        ]
+
+        return {
+            "downtime_seconds": total,
+            "downtime_human": str(timedelta(seconds=total)),
+            "intervals": intervals,
+            "hosts": hosts,
+        }
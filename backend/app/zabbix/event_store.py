@@ -0,0 +1,411 @@
+# app/zabbix/event_store.py
+# ------------------------------------------------------------
+# Espelho local (SQLite) dos eventos de trigger do Zabbix.
+#
+# - Um arquivo por fonte Zabbix em STORAGE_DIR/events/<fonte>.sqlite
+#   (WAL: workers leem enquanto o sincronizador escreve).
+# - Sincronização incremental: só eventos com eventid > último
+#   sincronizado (event.get paginado por eventid), mais o estado
+#   (r_eventid/acknowledged) dos problemas ainda abertos, no mesmo
+#   POST da primeira página.
+# - Carga inicial: últimos ZABBIX_EVENT_STORE_DAYS dias; consultas
+#   que começam antes disso continuam indo à API.
+# - Hostgroups: mapa host -> grupos atualizado a cada sincronização
+#   (hostgroup.get com selectHosts).
+# - Sincronização só pelo scheduler (a cada ZABBIX_EVENT_STORE_SYNC_MINUTES).
+#   Requisições nunca sincronizam: espelho atrasado (mais de 2
+#   intervalos) ou que não cobre o período = consulta vai à API.
+#   Um flock por arquivo evita duas sincronizações simultâneas.
+#
+# Usado por calculate_downtime, list_top_triggers, count_incidents e
+# incident_histogram (app/zabbix/service.py) quando ZABBIX_EVENT_STORE=true.
+# ------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from app.core.config import (
+    ZABBIX_EVENT_PAGE_SIZE, ZABBIX_EVENT_STORE, ZABBIX_EVENT_STORE_DAYS, ZABBIX_EVENT_STORE_SYNC_MINUTES,
+)
+from app.core.logging import logger
+from app.core.paths import STORAGE_DIR
+from app.zabbix.cache import source_of
+
+try:
+    import fcntl
+except ImportError:  # Windows (DEV): sem coordenação entre processos
+    fcntl = None
+
+EVENTS_DIR = STORAGE_DIR / "events"
+
+EVENT_OUTPUT = ["eventid", "clock", "value", "objectid", "severity", "acknowledged", "r_eventid"]
+
+# Eventos por leitura ao consultar o espelho (mesmo papel da página do event.get)
+READ_CHUNK = 5000
+# Ids por chamada ao conferir o estado dos problemas abertos
+STATE_CHUNK = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    eventid      INTEGER PRIMARY KEY,
+    clock        INTEGER NOT NULL,
+    value        INTEGER NOT NULL,
+    objectid     INTEGER NOT NULL,
+    severity     INTEGER NOT NULL DEFAULT 0,
+    acknowledged INTEGER NOT NULL DEFAULT 0,
+    r_eventid    INTEGER NOT NULL DEFAULT 0,
+    tags         TEXT
+);
+CREATE INDEX IF NOT EXISTS events_clock ON events (clock, value);
+CREATE INDEX IF NOT EXISTS events_open ON events (value, r_eventid);
+CREATE TABLE IF NOT EXISTS event_hosts (
+    eventid INTEGER NOT NULL,
+    hostid  INTEGER NOT NULL,
+    PRIMARY KEY (eventid, hostid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS event_hosts_host ON event_hosts (hostid, eventid);
+CREATE TABLE IF NOT EXISTS hosts (
+    hostid INTEGER PRIMARY KEY,
+    name   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS host_groups (
+    groupid INTEGER NOT NULL,
+    hostid  INTEGER NOT NULL,
+    PRIMARY KEY (groupid, hostid)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class EventStore:
+    def __init__(self, source: str):
+        self.source = source
+        EVENTS_DIR.mkdir(parents=True, exist_ok=True)
+        self.path = EVENTS_DIR / f"{source}.sqlite"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    # ---------------------------- conexão ----------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _state(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_state(self, key: str, value) -> None:
+        self.conn.execute(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value))
+        )
+
+    @property
+    def last_eventid(self) -> int:
+        return self._state("last_eventid", 0)
+
+    @property
+    def covered_from(self):
+        """Epoch a partir do qual o espelho tem todos os eventos (None = vazio)."""
+        return self._state("covered_from")
+
+    @property
+    def synced_at(self):
+        return self._state("synced_at")
+
+    def covers(self, from_ts: int) -> bool:
+        covered_from = self.covered_from
+        return covered_from is not None and from_ts >= covered_from
+
+    # -------------------------- sincronização --------------------------
+
+    @contextmanager
+    def _sync_lock(self, wait: bool):
+        """flock no arquivo .lock; com wait=False retorna False se outro processo já sincroniza."""
+        if fcntl is None:
+            yield True
+            return
+        fd = os.open(str(self.path) + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def sync(self, client, wait: bool = True) -> dict:
+        """
+        Baixa os eventos novos e atualiza o estado dos problemas abertos.
+        Retorna um resumo ({"skipped": True} se outra sincronização estava em curso).
+        """
+        from app.zabbix.service import ZabbixService
+
+        with self._sync_lock(wait) as locked:
+            if not locked:
+                return {"source": self.source, "skipped": True}
+            started = time.monotonic()
+            params = {
+                "source": 0,
+                "object": 0,
+                "value": [0, 1],
+                "output": EVENT_OUTPUT,
+                "selectHosts": ["hostid", "name"],
+                "selectTags": ["tag", "value"]
+            }
+            last_eventid = self.last_eventid
+            covered_from = self.covered_from
+            if covered_from is None:
+                covered_from = int(time.time()) - ZABBIX_EVENT_STORE_DAYS * 86400
+                params["time_from"] = covered_from
+            eventid_from = last_eventid + 1 if last_eventid else None
+
+            # 1ª página de eventos novos + estado dos problemas abertos no mesmo POST
+            open_ids = [row[0] for row in self.conn.execute(
+                "SELECT eventid FROM events WHERE value = 1 AND r_eventid = 0"
+            )]
+            state_calls = [
+                ("event.get", {"eventids": chunk, "output": ["eventid", "r_eventid", "acknowledged"]})
+                for chunk in (open_ids[i:i + STATE_CHUNK] for i in range(0, len(open_ids), STATE_CHUNK))
+            ]
+            results = client.call_many(
+                [("event.get", ZabbixService.event_page_params(params, ZABBIX_EVENT_PAGE_SIZE, eventid_from))]
+                + state_calls
+                + [("hostgroup.get", {"output": ["groupid"], "selectHosts": ["hostid"]})]
+            )
+            first_page, states, groups = results[0], results[1:-1], results[-1]
+
+            added = 0
+            with self.conn:
+                for page in ZabbixService.iter_event_pages(params, client=client, first_page=first_page):
+                    self._insert(page)
+                    added += len(page)
+                    last_eventid = max(last_eventid, int(page[-1]["eventid"]))
+                    # Progresso salvo por página: uma falha no meio não refaz o que já entrou
+                    self._set_state("last_eventid", last_eventid)
+                    self.conn.commit()
+
+                self.conn.executemany(
+                    "UPDATE events SET r_eventid = ?, acknowledged = ? WHERE eventid = ?",
+                    [
+                        (int(e.get("r_eventid") or 0), int(e.get("acknowledged") or 0), int(e["eventid"]))
+                        for state in states for e in state
+                    ]
+                )
+                self.conn.execute("DELETE FROM host_groups")
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO host_groups (groupid, hostid) VALUES (?, ?)",
+                    [(int(g["groupid"]), int(h["hostid"])) for g in groups for h in g.get("hosts", [])]
+                )
+                self._prune()
+                self._set_state("covered_from", max(covered_from, int(time.time()) - ZABBIX_EVENT_STORE_DAYS * 86400))
+                self._set_state("synced_at", time.time())
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"[ZABBIX] Espelho de eventos '{self.source}': +{added} eventos, "
+                f"{len(open_ids)} problemas abertos conferidos em {elapsed:.1f}s"
+            )
+            return {"source": self.source, "added": added, "open_checked": len(open_ids),
+                    "last_eventid": last_eventid, "seconds": round(elapsed, 2)}
+
+    def _insert(self, events: list) -> None:
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO events "
+            "(eventid, clock, value, objectid, severity, acknowledged, r_eventid, tags) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    int(e["eventid"]), int(e["clock"]), int(e["value"]), int(e["objectid"]),
+                    int(e.get("severity") or 0), int(e.get("acknowledged") or 0), int(e.get("r_eventid") or 0),
+                    json.dumps(e["tags"]) if e.get("tags") else None,
+                )
+                for e in events
+            ]
+        )
+        hosts = [(int(e["eventid"]), h) for e in events for h in e.get("hosts", [])]
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO event_hosts (eventid, hostid) VALUES (?, ?)",
+            [(eventid, int(h["hostid"])) for eventid, h in hosts]
+        )
+        self.conn.executemany(
+            "INSERT INTO hosts (hostid, name) VALUES (?, ?) "
+            "ON CONFLICT(hostid) DO UPDATE SET name = excluded.name",
+            {(int(h["hostid"]), h.get("name", "")) for _, h in hosts}
+        )
+
+    def _prune(self) -> None:
+        """Descarta eventos fora da retenção (ZABBIX_EVENT_STORE_DAYS)."""
+        cutoff = int(time.time()) - ZABBIX_EVENT_STORE_DAYS * 86400
+        self.conn.execute(
+            "DELETE FROM event_hosts WHERE eventid IN (SELECT eventid FROM events WHERE clock < ?)", (cutoff,)
+        )
+        self.conn.execute("DELETE FROM events WHERE clock < ?", (cutoff,))
+
+    def is_fresh(self) -> bool:
+        """Última sincronização há no máximo 2 intervalos do scheduler."""
+        synced_at = self.synced_at
+        return synced_at is not None and time.time() - synced_at <= 2 * ZABBIX_EVENT_STORE_SYNC_MINUTES * 60
+
+    # ---------------------------- consultas ----------------------------
+
+    @staticmethod
+    def _where(from_ts: int, to_ts: int, values, group_id=None, trigger_id=None) -> tuple:
+        sql = f"e.clock BETWEEN ? AND ? AND e.value IN ({', '.join('?' * len(values))})"
+        args = [from_ts, to_ts, *values]
+        if trigger_id:
+            sql += " AND e.objectid = ?"
+            args.append(int(trigger_id))
+        if group_id:
+            sql += (
+                " AND e.eventid IN (SELECT eh.eventid FROM event_hosts eh"
+                " JOIN host_groups hg ON hg.hostid = eh.hostid WHERE hg.groupid = ?)"
+            )
+            args.append(int(group_id))
+        return sql, args
+
+    def count(self, from_ts: int, to_ts: int, group_id=None) -> int:
+        where, args = self._where(from_ts, to_ts, (1,), group_id)
+        return self.conn.execute(f"SELECT COUNT(*) FROM events e WHERE {where}", args).fetchone()[0]
+
+    def top_triggers(self, from_ts: int, to_ts: int, group_id=None, limit: int = 5) -> list:
+        """[(objectid, contagem)] em ordem decrescente."""
+        where, args = self._where(from_ts, to_ts, (1,), group_id)
+        rows = self.conn.execute(
+            f"SELECT e.objectid, COUNT(*) AS n FROM events e WHERE {where} "
+            f"GROUP BY e.objectid ORDER BY n DESC, MIN(e.eventid) LIMIT ?",
+            args + [limit]
+        )
+        return [(str(objectid), n) for objectid, n in rows]
+
+    def iter_event_pages(self, from_ts: int, to_ts: int, values=(0, 1), group_id=None, trigger_id=None,
+                         with_details: bool = True):
+        """
+        Páginas de eventos (ordem de eventid) no mesmo formato do event.get, para
+        alimentar DowntimeEngine / IncidentHistogram sem ir à API.
+        """
+        where, args = self._where(from_ts, to_ts, values, group_id, trigger_id)
+        cursor = self.conn.execute(
+            f"SELECT e.eventid, e.clock, e.value, e.objectid, e.severity, e.acknowledged, e.tags "
+            f"FROM events e WHERE {where} ORDER BY e.eventid",
+            args
+        )
+        while True:
+            rows = cursor.fetchmany(READ_CHUNK)
+            if not rows:
+                return
+            page = [
+                {
+                    "eventid": str(eventid), "clock": str(clock), "value": str(value), "objectid": str(objectid),
+                    "severity": str(severity), "acknowledged": str(acknowledged),
+                    "tags": json.loads(tags) if tags else [],
+                }
+                for eventid, clock, value, objectid, severity, acknowledged, tags in rows
+            ]
+            if with_details:
+                self._attach_hosts(page)
+            yield page
+
+    def _attach_hosts(self, page: list) -> None:
+        by_event = {}
+        eventids = [int(e["eventid"]) for e in page]
+        for i in range(0, len(eventids), 900):  # limite de variáveis do SQLite
+            chunk = eventids[i:i + 900]
+            rows = self.conn.execute(
+                f"SELECT eh.eventid, h.hostid, h.name FROM event_hosts eh "
+                f"JOIN hosts h ON h.hostid = eh.hostid WHERE eh.eventid IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            for eventid, hostid, name in rows:
+                by_event.setdefault(eventid, []).append({"hostid": str(hostid), "name": name})
+        for event in page:
+            event["hosts"] = by_event.get(int(event["eventid"]), [])
+
+    def stats(self) -> dict:
+        events, open_problems = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(value = 1 AND r_eventid = 0), 0) FROM events"
+        ).fetchone()
+        return {
+            "source": self.source,
+            "events": events,
+            "open_problems": open_problems,
+            "last_eventid": self.last_eventid,
+            "covered_from": self.covered_from,
+            "synced_at": self.synced_at,
+        }
+
+
+# ---------------------- registro por fonte ----------------------
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_event_store(source: str) -> EventStore:
+    with _stores_lock:
+        store = _stores.get(source)
+        if store is None:
+            store = _stores[source] = EventStore(source)
+        return store
+
+
+def event_store_for(client, from_ts: int):
+    """
+    Espelho da fonte do cliente, se estiver habilitado, em dia e cobrir from_ts.
+    None = consultar a API. Não sincroniza aqui (só o scheduler): a requisição não
+    baixa a retenção inteira nem espera o flock de outra sincronização.
+    """
+    if not ZABBIX_EVENT_STORE:
+        return None
+    try:
+        store = get_event_store(source_of(client))
+        if not store.is_fresh():
+            logger.info(f"[ZABBIX] Espelho de eventos '{store.source}' desatualizado: usando a API")
+            return None
+        if store.covers(from_ts):
+            return store
+        logger.info(f"[ZABBIX] Período anterior ao espelho de eventos '{store.source}': usando a API")
+    except Exception as e:
+        # Espelho indisponível não pode derrubar o relatório: cai para a API
+        logger.error(f"[ZABBIX] Espelho de eventos indisponível ({source_of(client)}): {e}")
+    return None
+
+
+def sync_event_stores() -> list:
+    """Sincroniza o espelho de todas as fontes (job do scheduler)."""
+    from app.zabbix.client import get_zabbix_client
+    from app.zabbix.sources import SOURCES
+
+    results = []
+    for name in SOURCES:
+        try:
+            results.append(get_event_store(name).sync(get_zabbix_client(name), wait=False))
+        except Exception as e:
+            logger.error(f"[ZABBIX] Falha ao sincronizar espelho de eventos '{name}': {e}")
+            results.append({"source": name, "error": str(e)})
+    return results
@@ -0,0 +1,301 @@
+# app/zabbix/history_cache.py
+# ------------------------------------------------------------
+# Cache local (Parquet) do histórico numérico do MySQL do Zabbix.
+#
+# - Um arquivo por item e dia (fuso do Zabbix):
+#     STORAGE_DIR/history/<fonte>/<itemid>/<AAAA-MM-DD>.parquet
+#   com as colunas clock (int64) e value (float64).
+# - Dias encerrados (fim do dia há mais de
+#   ZABBIX_HISTORY_CACHE_SETTLE_MINUTES, tempo para dados atrasados
+#   de proxies chegarem) são imutáveis: gravados uma vez e lidos com
+#   memory map nas próximas execuções. Dias sem dados também viram
+#   arquivo (vazio), para não voltar ao banco.
+# - Só o trecho aberto (hoje / dias ainda não encerrados) é lido ao
+#   vivo do MySQL, a cada chamada.
+# - Leitura em blocos (iter_blocks): item-dia do cache e trechos do
+#   streaming ao vivo vão direto para quem agrega, sem montar a série
+#   inteira; get() concatena para quem precisa dos pontos brutos.
+# - Dias faltantes viram faixas contíguas por item; itens com as
+#   mesmas faixas são buscados juntos (uma consulta por tabela de
+#   histórico e faixa). Limites sempre em epoch: o fuso da sessão
+#   MySQL não desloca as bordas dos dias gravados.
+# - Gravação atômica (arquivo temporário + rename): workers do
+#   gunicorn podem preencher o mesmo dia sem se atrapalhar.
+# - Limite de tamanho (ZABBIX_HISTORY_CACHE_MAX_MB): ao passar, os
+#   arquivos lidos há mais tempo (mtime, renovado a cada acerto) são
+#   removidos até 90% do limite.
+# - Métricas: acertos/faltas (item-dia), leituras ao vivo, tamanho.
+# ------------------------------------------------------------
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.config import ZABBIX_HISTORY_CACHE_MAX_MB, ZABBIX_HISTORY_CACHE_SETTLE_MINUTES
+from app.core.logging import logger
+from app.core.paths import STORAGE_DIR
+
+HISTORY_DIR = STORAGE_DIR / "history"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _empty():
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+
+def _clip(clock: np.ndarray, value: np.ndarray, from_ts: int, to_ts: int):
+    """Recorta um bloco ordenado por clock a [from_ts, to_ts]."""
+    lo, hi = np.searchsorted(clock, [from_ts, to_ts + 1])
+    return clock[lo:hi], value[lo:hi]
+
+
+class HistoryCache:
+    def __init__(self, source: str, tz, max_bytes: int = ZABBIX_HISTORY_CACHE_MAX_MB * 1024 * 1024,
+                 settle_seconds: float = ZABBIX_HISTORY_CACHE_SETTLE_MINUTES * 60):
+        self.source = source
+        self.tz = tz
+        self.root = HISTORY_DIR / source
+        self.max_bytes = max_bytes
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+        self._bytes = None  # tamanho em disco (varrido na primeira gravação)
+        # métricas
+        self.hits = 0
+        self.misses = 0
+        self.live_reads = 0
+        self.evicted = 0
+
+    # ---------------------------- dias ----------------------------
+
+    def _day_start(self, day) -> int:
+        return int(datetime(day.year, day.month, day.day, tzinfo=self.tz).timestamp())
+
+    def _days(self, from_ts: int, to_ts: int) -> list:
+        first = datetime.fromtimestamp(from_ts, tz=timezone.utc).astimezone(self.tz).date()
+        last = datetime.fromtimestamp(to_ts, tz=timezone.utc).astimezone(self.tz).date()
+        return [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+    def _closed(self, day) -> bool:
+        """Dia encerrado há mais de settle_seconds: conteúdo não muda mais."""
+        return self._day_start(day + timedelta(days=1)) <= time.time() - self.settle_seconds
+
+    def _path(self, itemid: int, day):
+        return self.root / str(itemid) / f"{day.isoformat()}.parquet"
+
+    # ---------------------------- arquivos ----------------------------
+
+    def _read(self, path):
+        try:
+            table = pq.read_table(path, memory_map=True)
+            os.utime(path)  # renova o "último acesso" usado na remoção por tamanho
+        except (OSError, pa.ArrowInvalid):
+            return None
+        return table.column("clock").to_numpy(), table.column("value").to_numpy()
+
+    def _write(self, path, clock: np.ndarray, value: np.ndarray) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        pq.write_table(pa.table({"clock": clock.astype(np.int64), "value": value.astype(np.float64)}), tmp)
+        os.replace(tmp, path)
+        return path.stat().st_size
+
+    def _files(self):
+        return list(self.root.glob("*/*.parquet")) if self.root.exists() else []
+
+    def _account(self, written: int) -> None:
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(p.stat().st_size for p in self._files())
+            else:
+                self._bytes += written
+            if self._bytes <= self.max_bytes:
+                return
+            self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target: int) -> None:
+        """Remove os arquivos acessados há mais tempo até o cache caber em 'target' bytes."""
+        files = []
+        for path in self._files():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._bytes = total
+        self.evicted += removed
+        logger.info(f"[ZABBIX] Cache de histórico ({self.source}): {removed} arquivos removidos por tamanho")
+
+    # ---------------------------- leitura ----------------------------
+
+    def iter_blocks(self, items: list, from_ts: int, to_ts: int, stream):
+        """
+        Histórico de 'items' (value_type já conhecido) em [from_ts, to_ts] (epoch) em blocos
+        (itemid, clock int64[], value float64[]), já recortados à janela: um por item-dia
+        do cache e um por trecho do streaming ao vivo. Nada é concatenado aqui; a memória
+        fica limitada a um bloco (ou a um item-faixa durante o preenchimento).
+        - stream(items, from_ts, to_ts): leitura em streaming no MySQL com limites em epoch
+          (iter_items_history)
+        """
+        itemids = [int(i["itemid"]) for i in items]
+        by_id = {int(i["itemid"]): i for i in items}
+        closed = [day for day in self._days(from_ts, to_ts) if self._closed(day)]
+
+        # 1) dias encerrados: arquivo local; o que faltar é buscado em lote e gravado
+        missing = {}
+        hits = 0
+        for day in closed:
+            for itemid in itemids:
+                cached = self._read(self._path(itemid, day))
+                if cached is None:
+                    missing.setdefault(itemid, []).append(day)
+                    continue
+                hits += 1
+                clock, value = _clip(*cached, from_ts, to_ts)
+                if clock.size:
+                    yield itemid, clock, value
+        with self._lock:
+            self.hits += hits
+            self.misses += sum(len(d) for d in missing.values())
+        if missing:
+            for itemid, clock, value in self._fill(missing, by_id, stream):
+                clock, value = _clip(clock, value, from_ts, to_ts)
+                if clock.size:
+                    yield itemid, clock, value
+
+        # 2) trecho aberto: sempre ao vivo
+        live_from = max(from_ts, self._day_start(closed[-1] + timedelta(days=1))) if closed else from_ts
+        if live_from <= to_ts:
+            with self._lock:
+                self.live_reads += 1
+            yield from stream(items, live_from, to_ts)
+
+    def get(self, items: list, from_time: str, to_time: str, stream) -> dict:
+        """
+        iter_blocks concatenado por item, no formato de get_items_history:
+        {itemid: (clock int64[], value float64[])}. from_time/to_time no fuso do Zabbix.
+        """
+        from_ts = int(datetime.strptime(from_time, TIME_FORMAT).replace(tzinfo=self.tz).timestamp())
+        to_ts = int(datetime.strptime(to_time, TIME_FORMAT).replace(tzinfo=self.tz).timestamp())
+        parts = {int(i["itemid"]): [] for i in items}
+        for itemid, clock, value in self.iter_blocks(items, from_ts, to_ts, stream):
+            parts.setdefault(itemid, []).append((clock, value))
+
+        result = {}
+        for itemid, chunks in parts.items():
+            if not chunks:
+                result[itemid] = _empty()
+                continue
+            # dias lidos do arquivo e dias recém-buscados chegam fora de ordem; são disjuntos
+            chunks.sort(key=lambda c: c[0][0])
+            result[itemid] = (np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks]))
+        return result
+
+    @staticmethod
+    def _runs(days: list) -> tuple:
+        """Dias (crescentes) -> faixas contíguas ((primeiro, último), ...)."""
+        runs = []
+        for day in days:
+            if runs and day == runs[-1][1] + timedelta(days=1):
+                runs[-1][1] = day
+            else:
+                runs.append([day, day])
+        return tuple((first, last) for first, last in runs)
+
+    def _fill(self, missing: dict, by_id: dict, stream):
+        """
+        Busca os dias faltantes, grava item-dia e gera (itemid, clock, value) por dia.
+        Os dias de cada item viram faixas contíguas; itens com as mesmas faixas são
+        buscados juntos, uma leitura por faixa (um item sem o dia 1 e outro sem o dia 30
+        não leem os 30 dias). O streaming vem em ordem de itemid: só um item-faixa
+        fica em memória por vez.
+        """
+        groups = {}
+        for itemid, days in missing.items():
+            groups.setdefault(self._runs(days), []).append(itemid)
+
+        for runs, itemids in groups.items():
+            for first, last in runs:
+                start, end = self._day_start(first), self._day_start(last + timedelta(days=1))
+                pending = set(itemids)
+                # Limites em epoch: o MySQL não reinterpreta no fuso da sessão
+                for itemid, blocks in groupby(stream([by_id[i] for i in itemids], start, end - 1), key=itemgetter(0)):
+                    pending.discard(itemid)
+                    yield from self._store(itemid, first, last, [b[1:] for b in blocks])
+                for itemid in pending:  # sem dados na faixa: dias vazios também são gravados
+                    yield from self._store(itemid, first, last, [])
+                logger.info(
+                    f"[ZABBIX] Cache de histórico ({self.source}): {len(itemids)} itens x "
+                    f"{(last - first).days + 1} dias gravados ({first} a {last})"
+                )
+
+    def _store(self, itemid: int, first, last, blocks: list):
+        """Grava os dias [first, last] de um item a partir dos blocos lidos e gera cada dia."""
+        clock = np.concatenate([b[0] for b in blocks]) if blocks else _empty()[0]
+        value = np.concatenate([b[1] for b in blocks]) if blocks else _empty()[1]
+        written = 0
+        day = first
+        while day <= last:
+            lo, hi = np.searchsorted(clock, [self._day_start(day), self._day_start(day + timedelta(days=1))])
+            written += self._write(self._path(itemid, day), clock[lo:hi], value[lo:hi])
+            yield itemid, clock[lo:hi], value[lo:hi]
+            day += timedelta(days=1)
+        self._account(written)
+
+    # ---------------------------- métricas ----------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(p.stat().st_size for p in self._files())
+            lookups = self.hits + self.misses
+            return {
+                "source": self.source,
+                "path": str(self.root),
+                "max_bytes": self.max_bytes,
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "live_reads": self.live_reads,
+                "evicted": self.evicted,
+            }
+
+
+# ---------------------- registro de caches ----------------------
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_history_cache(source: str) -> HistoryCache:
+    from app.zabbix.service import ZABBIX_TIMEZONE
+    with _caches_lock:
+        cache = _caches.get(source)
+        if cache is None:
+            cache = _caches[source] = HistoryCache(source, ZABBIX_TIMEZONE)
+        return cache
+
+
+def history_cache_stats() -> list:
+    with _caches_lock:
+        return [cache.stats() for _, cache in sorted(_caches.items())]
@@ -0,0 +1,159 @@
+# app/zabbix/incidents.py
+# ------------------------------------------------------------
+# Histograma de incidentes (eventos PROBLEM) em uma única leitura.
+#
+# - Os eventos da janela são lidos uma vez, paginados, só com
+#   clock/severity/objectid; cada página vira arrays compactos
+#   (array('q')) e é descartada.
+# - No final, np.bincount gera de uma vez:
+#     * série por bucket (hora/dia/semana, no fuso do Zabbix),
+#       total e por severidade;
+#     * distribuição por hora do dia (0-23) e por severidade;
+#     * ranking de triggers (top N).
+# - Bordas dos buckets calculadas no fuso local (trocas de horário
+#   de verão ficam corretas).
+# ------------------------------------------------------------
+
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+BUCKETS = ("hour", "day", "week")
+SEVERITIES = 6  # 0 (não classificada) .. 5 (desastre)
+
+
+def bucket_edges(from_ts: int, to_ts: int, bucket: str, tz) -> np.ndarray:
+    """Inícios dos buckets (epoch) cobrindo [from_ts, to_ts], alinhados no fuso 'tz'."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"Bucket inválido: {bucket} (use {', '.join(BUCKETS)})")
+    start = datetime.fromtimestamp(from_ts, tz=timezone.utc).astimezone(tz)
+    if bucket == "hour":
+        start = start.replace(minute=0, second=0, microsecond=0)
+    else:
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        if bucket == "week":
+            start -= timedelta(days=start.weekday())  # semana começa na segunda
+
+    edges = []
+    current = start
+    while int(current.timestamp()) <= to_ts:
+        edges.append(int(current.timestamp()))
+        if bucket == "hour":
+            # Soma em UTC: horas locais repetidas/puladas no horário de verão
+            current = (current.astimezone(timezone.utc) + timedelta(hours=1)).astimezone(tz)
+        else:
+            # Soma no relógio local e normaliza o offset (dia de 23h/25h)
+            step = timedelta(days=7 if bucket == "week" else 1)
+            current = (current.replace(tzinfo=None) + step).replace(tzinfo=tz)
+    return np.asarray(edges, dtype=np.int64)
+
+
+class IncidentHistogram:
+    """
+    Acumula eventos PROBLEM e agrega tudo com NumPy no final. Uso:
+        histogram = IncidentHistogram(from_ts, to_ts, "day", tz)
+        for page in pages: histogram.feed(page)
+        result = histogram.to_dict(top=5, triggers_info=...)
+    """
+
+    def __init__(self, from_ts: int, to_ts: int, bucket: str, tz):
+        self.from_ts = from_ts
+        self.to_ts = to_ts
+        self.bucket = bucket
+        self.tz = tz
+        self.edges = bucket_edges(from_ts, to_ts, bucket, tz)
+        self._clocks = array("q")
+        self._severities = array("q")
+        self._triggers = array("q")  # código da trigger (índice em _trigger_ids)
+        self._trigger_codes = {}
+        self._trigger_ids = []
+
+    def _trigger_code(self, objectid: str) -> int:
+        code = self._trigger_codes.get(objectid)
+        if code is None:
+            code = self._trigger_codes[objectid] = len(self._trigger_ids)
+            self._trigger_ids.append(objectid)
+        return code
+
+    def feed(self, events) -> None:
+        """Processa uma página de eventos PROBLEM."""
+        for event in events:
+            self._clocks.append(int(event["clock"]))
+            self._severities.append(int(event.get("severity", 0) or 0))
+            self._triggers.append(self._trigger_code(event["objectid"]))
+
+    @property
+    def total(self) -> int:
+        return len(self._clocks)
+
+    def arrays(self):
+        """(clocks, severities, trigger_codes) como arrays NumPy int64."""
+        return tuple(
+            np.frombuffer(buf, dtype=np.int64).copy() if buf else np.empty(0, dtype=np.int64)
+            for buf in (self._clocks, self._severities, self._triggers)
+        )
+
+    def top_triggers(self, limit: int) -> list:
+        """[(objectid, contagem)] das triggers com mais incidentes."""
+        _, _, codes = self.arrays()
+        if codes.size == 0 or limit <= 0:
+            return []
+        counts = np.bincount(codes, minlength=len(self._trigger_ids))
+        # Ordem estável: empates mantêm a ordem em que a trigger apareceu
+        order = np.argsort(-counts, kind="stable")[:limit]
+        return [(self._trigger_ids[i], int(counts[i])) for i in order if counts[i] > 0]
+
+    def to_dict(self, top: int = 5, triggers_info: dict = None) -> dict:
+        triggers_info = triggers_info or {}
+        clocks, severities, _ = self.arrays()
+        n_buckets = self.edges.size
+        severities = np.clip(severities, 0, SEVERITIES - 1)
+
+        # Índice do bucket de cada evento (edges é crescente)
+        bucket_idx = np.clip(np.searchsorted(self.edges, clocks, side="right") - 1, 0, max(n_buckets - 1, 0))
+        by_bucket_severity = np.bincount(
+            bucket_idx * SEVERITIES + severities, minlength=n_buckets * SEVERITIES
+        ).reshape(n_buckets, SEVERITIES)
+
+        # Hora local do dia: offset do fuso no início do bucket de cada evento
+        offsets = np.asarray([
+            int(datetime.fromtimestamp(int(edge), tz=timezone.utc).astimezone(self.tz).utcoffset().total_seconds())
+            for edge in self.edges
+        ], dtype=np.int64)
+        hour_of_day = ((clocks + offsets[bucket_idx]) // 3600) % 24 if clocks.size else clocks
+        by_hour = np.bincount(hour_of_day, minlength=24)
+
+        def fmt(ts):
+            return datetime.fromtimestamp(int(ts), tz=timezone.utc).astimezone(self.tz).strftime("%Y-%m-%d %H:%M:%S")
+
+        series = [
+            {
+                "start": fmt(self.edges[i]),
+                "count": int(by_bucket_severity[i].sum()),
+                "by_severity": by_bucket_severity[i].tolist(),
+            }
+            for i in range(n_buckets)
+        ]
+
+        top_triggers = []
+        for trigger_id, count in self.top_triggers(top):
+            trigger = triggers_info.get(trigger_id, {})
+            top_triggers.append({
+                "triggerid": trigger_id,
+                "description": trigger.get("description", "N/A"),
+                "priority": trigger.get("priority", "N/A"),
+                "host": (trigger.get("hosts") or [{}])[0].get("name", ""),
+                "incident_count": count,
+            })
+
+        return {
+            "from": fmt(self.from_ts),
+            "to": fmt(self.to_ts),
+            "bucket": self.bucket,
+            "total": self.total,
+            "series": series,
+            "by_severity": by_bucket_severity.sum(axis=0).tolist(),
+            "by_hour_of_day": by_hour.tolist(),
+            "top_triggers": top_triggers,
+        }
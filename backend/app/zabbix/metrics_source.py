@@ -0,0 +1,281 @@
+# app/zabbix/metrics_source.py
+# ------------------------------------------------------------
+# Fontes de métricas (histórico/tendência) para os relatórios.
+#
+# - "db":  MySQL do Zabbix direto (app/zabbix/db_service.py).
+# - "api": API JSON-RPC (history.get / trend.get), para clientes que
+#          só expõem a API.
+# Ambas devolvem list[ItemSeries] (app/zabbix/series.py).
+#
+# Na fonte "api":
+# - todos os itens de um gráfico vão no mesmo lote (uma chamada por
+#   value_type e fatia de tempo, em um único POST por fatia);
+# - janelas longas são fatiadas (ZABBIX_HISTORY_SLICE_HOURS) e as
+#   fatias consultadas em paralelo;
+# - acima de ZABBIX_TRENDS_AFTER_DAYS usa trend.get (médias horárias
+#   com mínimo/máximo), mais history.get da hora corrente no mesmo
+#   POST (como get_items_trends no MySQL); itens sem trends na janela
+#   voltam ao history.get, agregado no backend.
+#
+# Nas duas fontes a escolha histórico x trends é a mesma (use_trends_for):
+# janela maior que ZABBIX_TRENDS_AFTER_DAYS, ou resolução pedida
+# (max_points) de 1 ponto por hora ou menos; use_trends=True/False força.
+#
+# Uso:
+#   source = get_metrics_source("api")
+#   source.prefetch(graph_ids)          # itens de todos os gráficos de uma vez
+#   items = source.graph_items(graph_id)
+#   series = source.fetch(items, from_time, to_time)
+# ------------------------------------------------------------
+
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from app.core.config import (
+    ZABBIX_METRICS_SOURCE, ZABBIX_TRENDS_AFTER_DAYS, ZABBIX_HISTORY_SLICE_HOURS, ZABBIX_HISTORY_WORKERS,
+    ZABBIX_DB_AGGREGATION,
+)
+from app.core.deadline import run_in_context
+from app.core.logging import logger
+from app.zabbix.cache import cached_call
+from app.zabbix.series import BucketAggregator, ItemSeries, NUMERIC_VALUE_TYPES
+
+METRICS_SOURCES = ("db", "api")
+
+
+def _to_ts(value: str, tz) -> int:
+    return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz).timestamp())
+
+
+def _with_current_hour(rows: list) -> list:
+    """
+    Linhas de trend.get + history.get da hora corrente -> linhas de trend: as horas de
+    trends a partir da primeira hora do histórico saem, e cada ponto do histórico entra
+    com mínimo = média = máximo = valor (mesma regra de get_items_trends).
+    """
+    trends = [r for r in rows if "value_avg" in r]
+    tail = sorted((r for r in rows if "value_avg" not in r), key=lambda r: int(r["clock"]))
+    if not tail:
+        return trends
+    cut = int(tail[0]["clock"]) // 3600 * 3600
+    return [r for r in trends if int(r["clock"]) < cut] + [
+        {"itemid": r["itemid"], "clock": r["clock"], "value_avg": r["value"], "value_min": r["value"], "value_max": r["value"]}
+        for r in tail
+    ]
+
+
+def use_trends_for(from_ts: int, to_ts: int, max_points: int = None, override: bool = None) -> bool:
+    """Decide entre histórico bruto e trends (médias horárias) para a janela."""
+    if override is not None:
+        return override
+    window = to_ts - from_ts
+    if window > ZABBIX_TRENDS_AFTER_DAYS * 86400:
+        return True
+    # Cada ponto do gráfico cobre 1h ou mais: a média horária não perde resolução
+    return bool(max_points) and window / max_points >= 3600
+
+
+class DbMetricsSource:
+    """Histórico lido direto das tabelas history/history_uint do MySQL do Zabbix."""
+
+    name = "db"
+
+    def __init__(self, use_trends: bool = None):
+        self.use_trends = use_trends
+        self._graph_items = {}
+
+    def prefetch(self, graph_ids) -> None:
+        """Itens (com value_type/units) de todos os gráficos do relatório em uma consulta."""
+        from app.zabbix.db_service import get_items_by_graphs
+        missing = {int(g) for g in graph_ids} - self._graph_items.keys()
+        if missing:
+            self._graph_items.update(get_items_by_graphs(missing))
+
+    def graph_items(self, graph_id) -> list:
+        self.prefetch([graph_id])
+        return self._graph_items[int(graph_id)]
+
+    def fetch(self, items: list, from_time: str, to_time: str, max_points: int = None, tz=None) -> list:
+        """
+        Todos os itens do gráfico com uma consulta por tabela (db_service.get_items_series):
+        history/history_uint, ou trends/trends_uint (com envelope mínimo/máximo) quando
+        use_trends_for indicar. Com max_points, o histórico bruto já vem agregado do MySQL
+        (média/mín/máx por bucket), ou, com ZABBIX_DB_AGGREGATION=stream, é lido em
+        streaming e agregado no backend em blocos.
+        """
+        from app.zabbix.db_service import get_items_series
+        from app.zabbix.service import ZABBIX_TIMEZONE
+        tz = tz or ZABBIX_TIMEZONE
+        use_trends = use_trends_for(_to_ts(from_time, tz), _to_ts(to_time, tz), max_points, self.use_trends)
+        fetched = get_items_series(
+            items, from_time, to_time, max_points=max_points, use_trends=use_trends,
+            aggregation=ZABBIX_DB_AGGREGATION, tz=tz
+        )
+        return [fetched[int(item["itemid"])] for item in items if int(item["itemid"]) in fetched]
+
+
+class ApiMetricsSource:
+    """Histórico/tendência via API JSON-RPC (history.get / trend.get)."""
+
+    name = "api"
+
+    def __init__(self, client=None, use_trends: bool = None):
+        self.use_trends = use_trends
+        if client is None:
+            from app.zabbix.client import get_zabbix_client
+            client = get_zabbix_client()
+        self.client = client
+        self._graph_items = {}
+
+    def prefetch(self, graph_ids) -> None:
+        """Itens de todos os gráficos do relatório em um único graph.get (selectItems)."""
+        missing = sorted({str(g) for g in graph_ids} - self._graph_items.keys())
+        if not missing:
+            return
+        graphs = cached_call(self.client, "graph.get", {
+            "graphids": missing,
+            "output": ["graphid"],
+            "selectItems": ["itemid", "name", "value_type", "units"]
+        })
+        self._graph_items.update({graph_id: [] for graph_id in missing})
+        for graph in graphs:
+            self._graph_items[graph["graphid"]] = [
+                {"itemid": i["itemid"], "item_name": i["name"], "value_type": int(i["value_type"]), "units": i.get("units", "")}
+                for i in graph.get("items", [])
+            ]
+
+    def graph_items(self, graph_id) -> list:
+        """Itens do gráfico, no mesmo formato de get_items_by_graphs."""
+        self.prefetch([graph_id])
+        return self._graph_items[str(graph_id)]
+
+    @staticmethod
+    def _slices(from_ts: int, to_ts: int, hours: int) -> list:
+        """Fatias [início, fim] sem sobreposição (time_till do Zabbix é inclusivo)."""
+        step = max(1, hours) * 3600
+        bounds = list(range(from_ts, to_ts, step)) + [to_ts]
+        return [
+            (start, end - 1 if end != to_ts else end)
+            for start, end in zip(bounds, bounds[1:])
+        ] or [(from_ts, to_ts)]
+
+    def _slice_calls(self, items: list, time_from: int, time_till: int, use_trends: bool) -> list:
+        if use_trends:
+            calls = [("trend.get", {
+                "itemids": [i["itemid"] for i in items],
+                "time_from": time_from,
+                "time_till": time_till,
+                "output": ["itemid", "clock", "value_min", "value_avg", "value_max"]
+            })]
+            # Hora corrente (ainda sem trends) no mesmo POST, como get_items_trends no MySQL
+            tail_from = max(time_from, int(time.time()) // 3600 * 3600)
+            if tail_from <= time_till:
+                calls += self._slice_calls(items, tail_from, time_till, False)
+            return calls
+        by_type = defaultdict(list)
+        for item in items:
+            by_type[item["value_type"]].append(item["itemid"])
+        return [
+            ("history.get", {
+                "history": value_type,
+                "itemids": itemids,
+                "time_from": time_from,
+                "time_till": time_till,
+                "output": ["itemid", "clock", "value"],
+                "sortfield": "clock",
+                "sortorder": "ASC"
+            })
+            for value_type, itemids in by_type.items()
+        ]
+
+    def _fetch_rows(self, items: list, from_ts: int, to_ts: int, use_trends: bool) -> dict:
+        """Linhas de history.get/trend.get por itemid (fatias consultadas em paralelo)."""
+        # trend.get já é agregado por hora: uma fatia basta
+        slices = [(from_ts, to_ts)] if use_trends else self._slices(from_ts, to_ts, ZABBIX_HISTORY_SLICE_HOURS)
+        logger.info(
+            f"[ZABBIX] {'trend.get' if use_trends else 'history.get'} para {len(items)} itens "
+            f"em {len(slices)} fatia(s)"
+        )
+
+        def fetch_slice(bounds):
+            return [
+                row
+                for result in self.client.call_many(self._slice_calls(items, *bounds, use_trends))
+                for row in result
+            ]
+
+        workers = max(1, min(ZABBIX_HISTORY_WORKERS, len(slices)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_in_context(fetch_slice), bounds) for bounds in slices]
+            rows = [row for future in futures for row in future.result()]
+
+        by_item = defaultdict(list)
+        for row in rows:
+            by_item[row["itemid"]].append(row)
+        return by_item
+
+    def fetch(self, items: list, from_time: str, to_time: str, max_points: int = None, tz=None) -> list:
+        """
+        Mesmo contrato de DbMetricsSource.fetch. Itens sem nenhuma linha de trend.get
+        (trends=0 no item, ou housekeeping de trends antes do histórico) caem para o
+        history.get, agregado em max_points (padrão: 1 ponto por hora).
+        """
+        from app.zabbix.service import ZABBIX_TIMEZONE
+        tz = tz or ZABBIX_TIMEZONE
+        items = [i for i in items if int(i.get("value_type", 0)) in NUMERIC_VALUE_TYPES]
+        if not items:
+            return []
+
+        from_ts, to_ts = _to_ts(from_time, tz), _to_ts(to_time, tz)
+        use_trends = use_trends_for(from_ts, to_ts, max_points, self.use_trends)
+        by_item = self._fetch_rows(items, from_ts, to_ts, use_trends)
+        no_trends = [
+            i for i in items if not any("value_avg" in r for r in by_item.get(i["itemid"], []))
+        ] if use_trends else []
+        history = self._fetch_rows(no_trends, from_ts, to_ts, False) if no_trends else {}
+        no_trends = {i["itemid"] for i in no_trends}
+
+        series = []
+        for item in items:
+            item_rows = by_item.get(item["itemid"], [])
+            if use_trends:
+                item_rows = _with_current_hour(item_rows)
+            clocks = [r["clock"] for r in item_rows]
+            meta = {"value_type": item["value_type"], "units": item.get("units", "")}
+            if item["itemid"] in no_trends:
+                rows = history.get(item["itemid"], [])
+                aggregator = BucketAggregator(from_ts, to_ts, max_points or max(1, (to_ts - from_ts) // 3600))
+                aggregator.feed(
+                    np.asarray([r["clock"] for r in rows], dtype=np.int64),
+                    np.asarray([r["value"] for r in rows], dtype=np.float64)
+                )
+                series.append(aggregator.to_series(item["itemid"], item["item_name"], source="history", **meta))
+            elif use_trends:
+                series.append(ItemSeries.from_points(
+                    item["itemid"], item["item_name"], clocks, [r["value_avg"] for r in item_rows],
+                    value_min=[r["value_min"] for r in item_rows],
+                    value_max=[r["value_max"] for r in item_rows],
+                    source="trends", **meta
+                ))
+            else:
+                series.append(ItemSeries.from_points(
+                    item["itemid"], item["item_name"], clocks, [r["value"] for r in item_rows], **meta
+                ))
+        return series
+
+
+def get_metrics_source(name: str = None, client=None, use_trends: bool = None):
+    """
+    Fonte de métricas pelo nome ("db" | "api"); padrão ZABBIX_METRICS_SOURCE.
+    - use_trends: True/False força trends/histórico; None decide pela janela (use_trends_for).
+    """
+    name = (name or ZABBIX_METRICS_SOURCE).lower()
+    if name == "db":
+        return DbMetricsSource(use_trends)
+    if name == "api":
+        return ApiMetricsSource(client, use_trends)
+    raise ValueError(f"Fonte de métricas desconhecida: {name} (use {', '.join(METRICS_SOURCES)})")
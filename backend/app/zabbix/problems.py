@@ -0,0 +1,154 @@
+# app/zabbix/problems.py
+# ------------------------------------------------------------
+# Feed de problemas em aberto (problem.get) para dashboards.
+#
+# - Um snapshot local por combinação fonte + hostgroup + severidades +
+#   tags; os filtros vão para o Zabbix, não são aplicados aqui.
+# - Carga inicial paginada por eventid (eventid_from, como event.get).
+# - Atualização incremental (no máximo a cada
+#   ZABBIX_PROBLEMS_REFRESH_SECONDS), em um único POST em lote:
+#     1) problemas com eventid > último visto;
+#     2) problem.get recent=true só dos eventids do snapshot, com
+#        saída mínima: r_eventid != 0 (resolvido) ou ausente sai do
+#        snapshot; acknowledged/severity são atualizados.
+# - Leitura paginada por keyset (eventid decrescente + cursor).
+# - Sem selectAcknowledges: o histórico de ack não entra no feed.
+# ------------------------------------------------------------
+
+import threading
+import time
+from datetime import datetime
+
+from cachetools import TTLCache
+
+from app.core.config import ZABBIX_EVENT_PAGE_SIZE, ZABBIX_PROBLEMS_REFRESH_SECONDS
+from app.core.logging import logger
+from app.zabbix.service import ZabbixService, _client
+from app.zabbix.cache import source_of
+
+PROBLEM_OUTPUT = ["eventid", "objectid", "name", "severity", "clock", "acknowledged", "suppressed"]
+STATE_OUTPUT = ["eventid", "r_eventid", "acknowledged", "severity"]
+
+
+def parse_tag_filters(tags: list) -> list:
+    """["tag:valor", "tag"] -> filtros "tags" do problem.get (valor exato quando informado)."""
+    filters = []
+    for raw in tags or []:
+        tag, _, value = raw.partition(":")
+        filters.append({"tag": tag, "value": value, "operator": 1 if value else 0})
+    return filters
+
+
+class ProblemSnapshot:
+    def __init__(self, group_id: str = None, severities: tuple = (), tags: tuple = ()):
+        self.group_id = group_id
+        self.severities = severities
+        self.tags = tags
+        self.problems = {}        # eventid (int) -> problema
+        self.last_eventid = 0
+        self.refreshed_at = None  # epoch da última atualização
+        self._refreshed_mono = 0.0
+        self._lock = threading.Lock()
+
+    def base_params(self) -> dict:
+        params = {"output": PROBLEM_OUTPUT, "selectTags": ["tag", "value"]}
+        if self.group_id:
+            params["groupids"] = self.group_id
+        if self.severities:
+            params["severities"] = list(self.severities)
+        if self.tags:
+            params["tags"] = parse_tag_filters(self.tags)
+            params["evaltype"] = 0  # AND/OR
+        return params
+
+    def _add(self, pages) -> int:
+        added = 0
+        for page in pages:
+            for problem in page:
+                eventid = int(problem["eventid"])
+                self.problems[eventid] = problem
+                self.last_eventid = max(self.last_eventid, eventid)
+                added += 1
+        return added
+
+    def refresh(self, client=None, force: bool = False) -> None:
+        client = _client(client)
+        with self._lock:
+            if not force and self.refreshed_at and time.monotonic() - self._refreshed_mono < ZABBIX_PROBLEMS_REFRESH_SECONDS:
+                return
+            params = self.base_params()
+            if self.refreshed_at is None:
+                added = self._add(ZabbixService.iter_event_pages(params, client=client, method="problem.get"))
+                logger.info(f"[ZABBIX] Snapshot de problemas carregado: {added} problemas")
+            else:
+                self._refresh_incremental(client, params)
+            self.refreshed_at = time.time()
+            self._refreshed_mono = time.monotonic()
+
+    def _refresh_incremental(self, client, params: dict) -> None:
+        known = list(self.problems)
+        calls = [("problem.get", ZabbixService.event_page_params(params, ZABBIX_EVENT_PAGE_SIZE, self.last_eventid + 1))]
+        if known:
+            calls.append(("problem.get", {
+                "eventids": [str(eventid) for eventid in known],
+                "recent": True,
+                "output": STATE_OUTPUT
+            }))
+        results = client.call_many(calls)
+
+        removed = 0
+        if known:
+            current = {int(p["eventid"]): p for p in results[1]}
+            for eventid in known:
+                state = current.get(eventid)
+                if state is None or state.get("r_eventid", "0") != "0":
+                    del self.problems[eventid]
+                    removed += 1
+                else:
+                    self.problems[eventid].update(acknowledged=state["acknowledged"], severity=state["severity"])
+
+        added = self._add(ZabbixService.iter_event_pages(
+            params, client=client, method="problem.get", first_page=results[0]
+        ))
+        if added or removed:
+            logger.info(f"[ZABBIX] Snapshot de problemas: +{added} novos, -{removed} resolvidos")
+
+    def page(self, cursor: int = None, limit: int = 100) -> dict:
+        """Página por keyset: eventids < cursor, do mais recente para o mais antigo."""
+        with self._lock:
+            ids = sorted((e for e in self.problems if cursor is None or e < cursor), reverse=True)
+            chunk = [self.problems[e] for e in ids[:limit]]
+            total = len(self.problems)
+        return {
+            "problems": chunk,
+            "next_cursor": int(chunk[-1]["eventid"]) if len(ids) > limit else None,
+            "total": total,
+            "refreshed_at": datetime.fromtimestamp(self.refreshed_at).isoformat() if self.refreshed_at else None,
+        }
+
+
+# ---------------------- registro de snapshots ----------------------
+
+# Snapshots sem leitura por 10 min são descartados
+_snapshots = TTLCache(maxsize=64, ttl=600)
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot(group_id: str = None, severities=None, tags=None, client=None) -> ProblemSnapshot:
+    client = _client(client)
+    key = (source_of(client), group_id, tuple(sorted(severities or ())), tuple(sorted(tags or ())))
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            snapshot = ProblemSnapshot(*key[1:])
+        _snapshots[key] = snapshot  # renova o TTL a cada leitura
+    return snapshot
+
+
+def problems_feed(group_id: str = None, severities=None, tags=None, cursor: int = None, limit: int = 100,
+                  force_refresh: bool = False, client=None) -> dict:
+    """Página do feed de problemas (snapshot atualizado incrementalmente se necessário)."""
+    client = _client(client)
+    snapshot = get_snapshot(group_id, severities, tags, client)
+    snapshot.refresh(client, force=force_refresh)
+    return snapshot.page(cursor, limit)
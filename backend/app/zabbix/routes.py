@@ -1,15 +1,43 @@
 # app/zabbix/routes.py
 
-from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from app.zabbix.service import ZabbixService
+from app.zabbix.async_service import AsyncZabbixService
+from app.zabbix.cache import metadata_cache
+from app.zabbix.problems import problems_feed
+from app.zabbix.incidents import BUCKETS
+from app.zabbix.event_store import get_event_store
+from app.zabbix.history_cache import history_cache_stats
+from app.zabbix.topology import get_topology, topology_stats
+from app.zabbix.sources import list_sources, set_current_source, resolve_source_name
 from app.core.logging import logger
-from fastapi.responses import StreamingResponse
+from app.core.executors import run_blocking
+from fastapi.responses import StreamingResponse, Response
 from io import BytesIO
+import gzip
+import hashlib
+import json
 from datetime import datetime
-from app.zabbix.db_service import get_db_connection
-from app.zabbix.db_service import get_item_metrics, get_item_value_type
-from app.core.config import ZABBIX_API_URL, ZABBIX_WEB_URL, ZABBIX_USER, ZABBIX_PASS
-router = APIRouter()
+from typing import List, Optional
+from app.zabbix.db_service import db_connection, get_db_pool, db_pool_stats
+from app.zabbix.db_service import get_item_metrics, get_item_value_type, get_items_by_graphs, get_items_metrics, get_items_series, get_last_value_of_item
+from app.core.config import ZABBIX_API_URL, ZABBIX_WEB_URL, ZABBIX_USER, ZABBIX_PASS, ZABBIX_EVENT_STORE, ZABBIX_HISTORY_CACHE
+from app.core.config import ZABBIX_TOPOLOGY_REFRESH_SECONDS
+from app.zabbix.client import get_zabbix_client
+
+
+async def select_source(source: Optional[str] = Query(None, description="Fonte Zabbix (padrão: default)")):
+    """
+    Dependência de todas as rotas /zabbix/*: fixa a fonte Zabbix da requisição.
+    Clientes da API e conexões MySQL sem fonte explícita passam a usar essa.
+    """
+    try:
+        set_current_source(source)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+router = APIRouter(dependencies=[Depends(select_source)])
 
 @router.get("/zabbix/version")
 def check_zabbix_version(api_url: str = Query(..., description="URL da API JSON-RPC do Zabbix")):
@@ -50,84 +78,73 @@ def test_auth_env():
     return results
 
 @router.get("/zabbix/hostgroups")
-def get_hostgroups():
+async def get_hostgroups():
     """
     Retorna a lista de hostgroups disponíveis no Zabbix.
-    Utiliza credenciais do .env.
+    Utiliza o cliente assíncrono compartilhado (credenciais do .env, token em cache).
     """
     try:
-        auth = ZabbixService.authenticate(
-            ZABBIX_API_URL,
-            ZABBIX_WEB_URL,
-            ZABBIX_USER,
-            ZABBIX_PASS
-        )
-
-        hostgroups = ZabbixService.list_hostgroups(
-            ZABBIX_API_URL,
-            auth_token=auth["api_token"],
-            version=auth["version"]
-        )
-        return hostgroups
+        return await AsyncZabbixService.list_hostgroups()
     except Exception as e:
         logger.error(f"Erro ao buscar hostgroups: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar hostgroups")
 
+@router.get("/zabbix/sources")
+def get_sources():
+    """
+    Lista as fontes Zabbix configuradas (sem credenciais).
+    """
+    return list_sources()
+
+@router.get("/zabbix/sources/hostgroups")
+async def get_hostgroups_all_sources():
+    """
+    Hostgroups de todas as fontes em paralelo; cada hostgroup traz o campo "source".
+    Fontes indisponíveis aparecem em "errors" sem derrubar a resposta.
+    """
+    return await AsyncZabbixService.list_hostgroups_all_sources()
+
 @router.get("/zabbix/hosts")
-def get_hosts_by_group(group_id: str = Query(..., description="ID do hostgroup")):
+async def get_hosts_by_group(group_id: str = Query(..., description="ID do hostgroup")):
     """
     Retorna os hosts vinculados a um hostgroup específico.
-    Utiliza credenciais e versão do .env.
+    Utiliza o cliente assíncrono compartilhado (credenciais do .env, token em cache).
     """
     try:
-        auth = ZabbixService.authenticate(
-            ZABBIX_API_URL,
-            ZABBIX_WEB_URL,
-            ZABBIX_USER,
-            ZABBIX_PASS
-        )
-
-        hosts = ZabbixService.list_hosts_by_group(
-            api_url=ZABBIX_API_URL,
-            auth_token=auth["api_token"],
-            version=auth["version"],
-            group_id=group_id
-        )
-        return hosts
+        return await AsyncZabbixService.list_hosts_by_group(group_id)
     except Exception as e:
         logger.error(f"Erro ao buscar hosts do grupo {group_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar hosts do grupo")
 
 @router.get("/zabbix/graphs")
-def get_graphs_by_host(host_id: str = Query(..., description="ID do host")):
+async def get_graphs_by_host(host_id: str = Query(..., description="ID do host")):
     """
     Retorna os gráficos vinculados a um host.
-    Utiliza credenciais e versão do .env.
+    Utiliza o cliente assíncrono compartilhado (credenciais do .env, token em cache).
     """
     try:
-        auth = ZabbixService.authenticate(
-            ZABBIX_API_URL,
-            ZABBIX_WEB_URL,
-            ZABBIX_USER,
-            ZABBIX_PASS
-        )
-
-        graphs = ZabbixService.list_graphs_by_host(
-            api_url=ZABBIX_API_URL,
-            auth_token=auth["api_token"],
-            version=auth["version"],
-            host_id=host_id
-        )
-        return graphs
+        return await AsyncZabbixService.list_graphs_by_host(host_id)
     except Exception as e:
         logger.error(f"Erro ao buscar gráficos do host {host_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar gráficos do host")
 
 
+@router.get("/zabbix/graphs/batch")
+async def get_graphs_by_hosts(host_id: List[str] = Query(..., description="IDs dos hosts (repita o parâmetro)")):
+    """
+    Retorna {host_id: [gráficos]} para vários hosts em um único POST (batch JSON-RPC).
+    Evita uma requisição por host no drill-down do construtor de relatórios.
+    """
+    try:
+        return await AsyncZabbixService.list_graphs_by_hosts(host_id)
+    except Exception as e:
+        logger.error(f"Erro ao buscar gráficos dos hosts {host_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar gráficos dos hosts")
+
 
 ####http://127.0.0.1:8000/zabbix/graphs/image?graph_id=3192&from_time=2025-06-29%2023:00:00&to_time=2025-06-30%2005:00:00
 @router.get("/zabbix/graphs/image")
-def get_graph_image(
+async def get_graph_image(
     graph_id: str = Query(...),
     from_time: str = Query(..., description="Formato: YYYY-MM-DD HH:MM:SS"),
     to_time: str = Query(..., description="Formato: YYYY-MM-DD HH:MM:SS"),
@@ -138,16 +155,7 @@ def get_graph_image(
     Retorna a imagem PNG de um gráfico do Zabbix.
     """
     try:
-        auth = ZabbixService.authenticate(
-            ZABBIX_API_URL,
-            ZABBIX_WEB_URL,
-            ZABBIX_USER,
-            ZABBIX_PASS
-        )
-
-        image_bytes = ZabbixService.get_graph_image(
-            web_url=ZABBIX_WEB_URL,
-            auth_token=auth["web_cookie"],
+        image_bytes = await AsyncZabbixService.get_graph_image(
             graph_id=graph_id,
             from_time=from_time,
             to_time=to_time,
@@ -161,18 +169,141 @@ def get_graph_image(
         raise HTTPException(status_code=500, detail="Erro ao buscar imagem do gráfico")
 
 
+####http://127.0.0.1:8000/zabbix/tree?group_id=5
+@router.get("/zabbix/tree")
+async def get_topology_tree(request: Request, group_id: str = Query(..., description="ID do hostgroup")):
+    """
+    Retorna hostgroup -> hosts -> gráficos em uma única resposta (construtor de relatórios).
+    - host.get com selectGraphs (um único POST ao Zabbix).
+    - ETag / If-None-Match: 304 quando a árvore não mudou.
+    - Corpo comprimido com gzip se o cliente aceitar.
+    """
+    try:
+        tree = await AsyncZabbixService.get_tree(group_id)
+    except Exception as e:
+        logger.error(f"Erro ao montar árvore do grupo {group_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao montar árvore do grupo")
+
+    body = json.dumps(tree, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", "") and len(body) > 1024:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+####http://127.0.0.1:8000/zabbix/problems?group_id=5&severity=4&severity=5&tag=service:web&limit=100
+@router.get("/zabbix/problems")
+def get_problems_feed(
+    group_id: Optional[str] = Query(None, description="ID do hostgroup"),
+    severity: Optional[List[int]] = Query(None, description="Severidades (0-5), repita o parâmetro"),
+    tag: Optional[List[str]] = Query(None, description="Filtro de tag 'tag' ou 'tag:valor', repita o parâmetro"),
+    cursor: Optional[int] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    refresh: bool = Query(False, description="Força atualização do snapshot")
+):
+    """
+    Problemas em aberto paginados por eventid (mais recentes primeiro).
+    Os filtros são enviados ao Zabbix; o snapshot é atualizado de forma incremental.
+    """
+    try:
+        return problems_feed(group_id, severity, tag, cursor, limit, force_refresh=refresh)
+    except Exception as e:
+        logger.error(f"Erro ao buscar problemas em aberto: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar problemas em aberto")
+
+
+####http://127.0.0.1:8000/zabbix/incidents/histogram?from_time=2025-05-01 00:00:00&to_time=2025-05-31 23:59:59&bucket=day&top=5
+@router.get("/zabbix/incidents/histogram")
+def get_incident_histogram(
+    from_time: str = Query(..., description="Início (YYYY-MM-DD HH:MM:SS)"),
+    to_time: str = Query(..., description="Fim (YYYY-MM-DD HH:MM:SS)"),
+    group_id: Optional[str] = Query(None, description="ID do hostgroup"),
+    bucket: str = Query("day", description="hour | day | week"),
+    top: int = Query(5, ge=0, le=100, description="Quantidade de triggers no ranking")
+):
+    """
+    Incidentes do período agregados por bucket e severidade, por hora do dia
+    e top N triggers, com uma única leitura dos eventos no Zabbix.
+    """
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket inválido (use {', '.join(BUCKETS)})")
+    try:
+        return ZabbixService.incident_histogram(from_time, to_time, group_id, bucket, top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao gerar histograma de incidentes: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao gerar histograma de incidentes")
+
+
+###Espelho local de eventos (GET/POST http://127.0.0.1:8000/zabbix/event-store)
+@router.get("/zabbix/event-store")
+def get_event_store_stats():
+    """
+    Situação do espelho de eventos da fonte selecionada (eventos, abertos, última sincronização).
+    """
+    if not ZABBIX_EVENT_STORE:
+        return {"enabled": False}
+    return {"enabled": True, **get_event_store(resolve_source_name()).stats()}
+
+
+@router.post("/zabbix/event-store/sync")
+def sync_event_store():
+    """
+    Sincroniza agora o espelho de eventos da fonte selecionada (incremental).
+    """
+    if not ZABBIX_EVENT_STORE:
+        raise HTTPException(status_code=400, detail="Espelho de eventos desativado (ZABBIX_EVENT_STORE)")
+    try:
+        source = resolve_source_name()
+        return get_event_store(source).sync(get_zabbix_client(source))
+    except Exception as e:
+        logger.error(f"Erro ao sincronizar espelho de eventos: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao sincronizar espelho de eventos")
+
+
+###Cache de metadados (GET/DELETE http://127.0.0.1:8000/zabbix/cache)
+@router.get("/zabbix/cache")
+def get_metadata_cache_stats():
+    """
+    Retorna tamanho, TTL e contadores de hit/miss do cache de metadados.
+    """
+    return metadata_cache.stats()
+
+
+@router.delete("/zabbix/cache")
+def invalidate_metadata_cache(
+    method: Optional[str] = Query(None, description="Ex.: host.get, graph.get, trigger.get (vazio = tudo)")
+):
+    """
+    Invalida o cache de metadados (todo ou só de um método da API).
+    """
+    removed = metadata_cache.invalidate(method)
+    return {"removed": removed, **metadata_cache.stats()}
+
+
 ###Rotas baseadas no DB
 
 @router.get("/zabbix/db/graph-data")
 def get_graph_data_from_db(
     itemid: int = Query(..., description="ID do item (gráfico) na view"),
     from_time: str = Query(None, description="YYYY-MM-DD HH:MM:SS"),
-    to_time: str = Query(None, description="YYYY-MM-DD HH:MM:SS")
+    to_time: str = Query(None, description="YYYY-MM-DD HH:MM:SS"),
+    max_points: Optional[int] = Query(None, ge=1, le=10000, description="Agrega no banco em até N pontos (avg/min/max/count)"),
+    format: str = Query("rows", description="rows (lista de pontos) ou columns (arrays clock/value)")
 ):
     """
     Retorna dados do gráfico direto do banco para plotagem no frontend.
     Para itens numéricos retorna lista de pontos, para itens texto/log/str retorna só o último valor.
+    Com max_points, os pontos são buckets agregados no MySQL (value = média, mais min/max/count).
+    Com format=columns, os numéricos vêm como {"series": {itemid, item_name, units, clock[], value[], ...}}.
     """
+    if format not in ("rows", "columns"):
+        raise HTTPException(status_code=400, detail="format deve ser 'rows' ou 'columns'.")
     from app.zabbix.db_service import get_item_value_type, get_item_metrics, get_last_value_of_item
     try:
         value_type = get_item_value_type(itemid)
@@ -183,7 +314,7 @@ def get_graph_data_from_db(
         if value_type in [1, 2, 4]:
             from app.zabbix.db_service import get_last_value_of_item
             logger.info(f"[ZABBIX] Item {itemid} é texto/log/str. Retornando apenas último valor.")
-            result = get_last_value_of_item(itemid)
+            result = get_last_value_of_item(itemid, value_type)
             return {"last_value": result}
 
         # Para numéricos, retorna lista de pontos (para gráfico)
@@ -194,21 +325,45 @@ def get_graph_data_from_db(
             from_time = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
         from app.zabbix.db_service import get_item_metrics
         logger.info(f"[ZABBIX] Item {itemid} é numérico. Buscando histórico para gráfico.")
-        data = get_item_metrics(itemid, from_time, to_time, limit=1000)
+        if format == "columns":
+            series = get_items_series([{"itemid": itemid}], from_time, to_time, max_points=max_points).get(itemid)
+            return {"series": series.to_dict() if series is not None else None}
+        if max_points:
+            item = {"itemid": itemid, "value_type": value_type}
+            data = get_items_metrics([item], from_time, to_time, max_points=max_points)[itemid]
+        else:
+            data = get_item_metrics(itemid, from_time, to_time, limit=1000, value_type=value_type)
         return {"data": data}
     except Exception as e:
         logger.error(f"Erro ao buscar dados do gráfico DB: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar dados do gráfico no banco")
 
 
+@router.get("/zabbix/db/pool")
+def get_db_pool_stats():
+    """Métricas dos pools de conexão MySQL do Zabbix (por fonte, neste worker)."""
+    return db_pool_stats()
+
+
+@router.get("/zabbix/db/topology")
+def get_topology_stats():
+    """Índices em memória da view v_zabbix (por fonte, neste worker): idade e tamanhos."""
+    return {"refresh_seconds": ZABBIX_TOPOLOGY_REFRESH_SECONDS, "indexes": topology_stats()}
+
+
+@router.get("/zabbix/db/history-cache")
+def get_history_cache_stats():
+    """Cache local do histórico (Parquet): acertos/faltas por item-dia, tamanho (neste worker)."""
+    return {"enabled": ZABBIX_HISTORY_CACHE, "caches": history_cache_stats()}
+
+
 @router.get("/zabbix/db/test-conn")
 def test_db_connection():
     """Testa conexão com o banco MySQL do Zabbix."""
-    from app.zabbix.db_service import get_db_connection
     try:
-        conn = get_db_connection()
-        conn.close()
-        return {"status": "ok", "message": "Conexão ao banco bem-sucedida"}
+        with db_connection() as conn:
+            conn.ping(reconnect=False)
+        return {"status": "ok", "message": "Conexão ao banco bem-sucedida", "pool": get_db_pool().stats()}
     except Exception as e:
         logger.error(f"Erro ao conectar ao banco: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao conectar ao banco")
@@ -217,99 +372,49 @@ def test_db_connection():
 @router.get("/zabbix/db/hostgroups")
 def get_hostgroups_from_db():
     """
-    Retorna a lista de hostgroups disponíveis diretamente do banco de dados.
-    """
-    query = """
-        SELECT DISTINCT hostgroup_id, hostgroup_name
-        FROM v_zabbix
-        ORDER BY hostgroup_name
+    Retorna a lista de hostgroups disponíveis (índice em memória da view v_zabbix).
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-        return {"hostgroups": results}
+        return {"hostgroups": get_topology().hostgroups}
     except Exception as e:
         logger.error(f"Erro ao buscar hostgroups do banco: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar hostgroups do banco")
-    finally:
-        conn.close()
 
 @router.get("/zabbix/db/hosts")
 def get_hosts_from_db(hostgroup_id: int = Query(..., description="ID do hostgroup")):
     """
-    Retorna os hosts de um hostgroup específico diretamente do banco de dados.
-    """
-    query = """
-        SELECT DISTINCT host_id, host_name
-        FROM v_zabbix
-        WHERE hostgroup_id = %s
-        ORDER BY host_name
+    Retorna os hosts de um hostgroup específico (índice em memória da view v_zabbix).
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(query, (hostgroup_id,))
-            results = cursor.fetchall()
-        return {"hosts": results}
+        return {"hosts": get_topology().hosts(hostgroup_id)}
     except Exception as e:
         logger.error(f"Erro ao buscar hosts do banco: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar hosts do banco")
-    finally:
-        conn.close()
 
 @router.get("/zabbix/db/items")
 def get_items_from_db(host_id: int = Query(..., description="ID do host")):
     """
-    Retorna os itens de um host específico diretamente do banco de dados.
-    """
-    query = """
-        SELECT DISTINCT item_id, item_name
-        FROM v_zabbix
-        WHERE host_id = %s
-        ORDER BY item_name
+    Retorna os itens de um host específico (índice em memória da view v_zabbix).
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(query, (host_id,))
-            results = cursor.fetchall()
-        return {"items": results}
+        return {"items": get_topology().items(host_id)}
     except Exception as e:
         logger.error(f"Erro ao buscar itens do banco: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar itens do banco")
-    finally:
-        conn.close()
 
 @router.get("/zabbix/db/item-info")
 def get_item_info_from_db(item_id: int = Query(..., description="ID do item")):
     """
-    Retorna informações detalhadas de um item específico.
-    """
-    query = """
-        SELECT hostgroup_id, hostgroup_name, host_id, host_name, 
-               item_id, item_name, graph_ids, graph_names, 
-               trigger_ids, trigger_names
-        FROM v_zabbix
-        WHERE item_id = %s
-        LIMIT 1
+    Retorna informações detalhadas de um item específico (índice em memória da view v_zabbix).
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(query, (item_id,))
-            result = cursor.fetchone()
-        
-        if not result:
-            raise HTTPException(status_code=404, detail="Item não encontrado")
-            
-        return {"item_info": result}
+        result = get_topology().item_info.get(item_id)
     except Exception as e:
         logger.error(f"Erro ao buscar informações do item: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar informações do item")
-    finally:
-        conn.close()
+    if not result:
+        raise HTTPException(status_code=404, detail="Item não encontrado")
+    return {"item_info": result}
 
 @router.get("/zabbix/db/metrics-summary")
 def get_metrics_summary_from_db(item_id: int = Query(..., description="ID do item")):
@@ -328,8 +433,7 @@ def get_metrics_summary_from_db(item_id: int = Query(..., description="ID do ite
         WHERE itemid = %s
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with db_connection() as conn, conn.cursor() as cursor:
             cursor.execute(query, (item_id,))
             result = cursor.fetchone()
         
@@ -337,8 +441,6 @@ def get_metrics_summary_from_db(item_id: int = Query(..., description="ID do ite
     except Exception as e:
         logger.error(f"Erro ao buscar resumo das métricas: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar resumo das métricas")
-    finally:
-        conn.close()
 
 # Endpoint adicional para buscar itens com informações de métricas disponíveis
 @router.get("/zabbix/db/items-with-metrics")
@@ -358,44 +460,43 @@ def get_items_with_metrics_from_db(host_id: int = Query(..., description="ID do
         ORDER BY v.item_name
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with db_connection() as conn, conn.cursor() as cursor:
             cursor.execute(query, (host_id,))
             results = cursor.fetchall()
         return {"items": results}
     except Exception as e:
         logger.error(f"Erro ao buscar itens com métricas: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar itens com métricas")
-    finally:
-        conn.close()
 
 
 @router.get("/zabbix/db/graph-to-item")
 def get_item_id_from_graph_id(graph_id: int = Query(..., description="ID do gráfico")):
     """
-    Retorna o item_id associado a um graph_id específico da view v_zabbix.
-    """
-    query = """
-        SELECT item_id
-        FROM v_zabbix
-        WHERE FIND_IN_SET(%s, graph_ids) > 0
-        LIMIT 1
+    Retorna o item_id associado a um graph_id específico (mapa gráfico -> itens do índice da view v_zabbix).
     """
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(query, (graph_id,))
-            result = cursor.fetchone()
-        
-        if not result:
-            raise HTTPException(status_code=404, detail="Item ID não encontrado para o gráfico fornecido")
-            
-        return {"item_id": result["item_id"]}
+        item_id = get_topology().item_for_graph(graph_id)
     except Exception as e:
         logger.error(f"Erro ao buscar item_id para graph_id {graph_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar item_id para o gráfico")
-    finally:
-        conn.close()
+    if item_id is None:
+        raise HTTPException(status_code=404, detail="Item ID não encontrado para o gráfico fornecido")
+    return {"item_id": item_id}
+
+
+@router.get("/zabbix/db/trigger-items")
+def get_items_by_trigger_id(trigger_id: int = Query(..., description="ID da trigger")):
+    """
+    Retorna os item_ids usados por uma trigger (mapa trigger -> itens do índice da view v_zabbix).
+    """
+    try:
+        item_ids = get_topology().items_for_trigger(trigger_id)
+    except Exception as e:
+        logger.error(f"Erro ao buscar itens da trigger {trigger_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar itens da trigger")
+    if not item_ids:
+        raise HTTPException(status_code=404, detail="Nenhum item encontrado para a trigger fornecida")
+    return {"item_ids": item_ids}
 
 @router.get("/zabbix/db/graph-items")
 def get_items_by_graph(graph_id: int = Query(...)):
@@ -408,67 +509,87 @@ def get_items_by_graph(graph_id: int = Query(...)):
         JOIN items i ON gi.itemid = i.itemid
         WHERE gi.graphid = %s
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        with db_connection() as conn, conn.cursor() as cursor:
             cursor.execute(query, (graph_id,))
             rows = cursor.fetchall()
             return [{"itemid": r["itemid"], "name": r["item_name"]} for r in rows]
     except Exception as e:
         logger.error(f"Erro ao buscar itens do gráfico: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar itens do gráfico")
-    finally:
-        if conn:
-            conn.close()
+
+
+def _collect_report_metrics(payload: dict, max_points: Optional[int], format: str) -> dict:
+    """Métricas do payload de get_report_metrics (bloqueante: roda no executor "db")."""
+    hosts = payload.get("hosts", [])
+    # Itens (com value_type) de todos os gráficos do payload em uma consulta
+    items_by_graph = get_items_by_graphs(
+        graph["id"] for host in hosts for graph in host.get("graphs", [])
+    )
+    result = {}
+    for host in hosts:
+        host_id = host.get("id")
+        host_name = host.get("name")
+        result[host_id] = {"name": host_name, "graphs": {}}
+        for graph in host.get("graphs", []):
+            graph_id = graph["id"]
+            from_time = graph["from_time"]
+            to_time = graph["to_time"]
+            graph_items = items_by_graph.get(int(graph_id), [])
+            # Histórico de todos os itens numéricos do gráfico: uma consulta por tabela
+            numeric_items = [item for item in graph_items if item["value_type"] in [0, 3]]
+            if format == "columns":
+                metrics = get_items_series(numeric_items, from_time, to_time, max_points=max_points)
+            else:
+                metrics = get_items_metrics(
+                    numeric_items, from_time, to_time, limit=None if max_points else 2000, max_points=max_points
+                )
+            graph_data = []
+            for item in graph_items:
+                itemid = item["itemid"]
+                item_name = item["item_name"]
+                value_type = item["value_type"]
+                if value_type in [0, 3]:  # Numéricos
+                    entry = {"itemid": itemid, "item_name": item_name, "type": "numeric"}
+                    if format == "columns":
+                        series = metrics.get(itemid)
+                        entry["series"] = series.to_dict() if series is not None else None
+                    else:
+                        entry["data"] = metrics[itemid]
+                    graph_data.append(entry)
+                else:  # Texto/log/str
+                    last = get_last_value_of_item(itemid, value_type)
+                    graph_data.append({
+                        "itemid": itemid,
+                        "item_name": item_name,
+                        "last_value": last,
+                        "type": "text"
+                    })
+            result[host_id]["graphs"][graph_id] = {
+                "name": graph["name"],
+                "data": graph_data
+            }
+    return result
 
 
 @router.post("/zabbix/db/report-metrics")
-async def get_report_metrics(request: Request):
+async def get_report_metrics(
+    request: Request,
+    max_points: Optional[int] = Query(None, ge=1, le=10000, description="Agrega no banco em até N pontos por item"),
+    format: str = Query("rows", description="rows (lista de pontos) ou columns (arrays clock/value)")
+):
     """
     Recebe um JSON de configuração de relatório e devolve as métricas históricas
     para cada gráfico definido, pronto para o frontend gerar os gráficos.
+    Com max_points, cada item numérico vem agregado no MySQL (value = média, mais min/max/count).
+    Com format=columns, cada item numérico traz "series" (arrays clock/value) em vez de "data".
     """
+    if format not in ("rows", "columns"):
+        raise HTTPException(status_code=400, detail="format deve ser 'rows' ou 'columns'.")
     try:
         payload = await request.json()
-        hosts = payload.get("hosts", [])
-        result = {}
-        for host in hosts:
-            host_id = host.get("id")
-            host_name = host.get("name")
-            result[host_id] = {"name": host_name, "graphs": {}}
-            for graph in host.get("graphs", []):
-                graph_id = graph["id"]
-                from_time = graph["from_time"]
-                to_time = graph["to_time"]
-                # Busca todos os itemids associados a esse graph_id
-                items = get_items_by_graph(int(graph_id))
-                graph_data = []
-                for item in items:
-                    itemid = item["itemid"]
-                    item_name = item["name"]
-                    value_type = get_item_value_type(itemid)
-                    if value_type in [0, 3]:  # Numéricos
-                        data = get_item_metrics(itemid, from_time, to_time, limit=2000)
-                        graph_data.append({
-                            "itemid": itemid,
-                            "item_name": item_name,
-                            "data": data,
-                            "type": "numeric"
-                        })
-                    else:  # Texto/log/str
-                        last = get_last_value_of_item(itemid)
-                        graph_data.append({
-                            "itemid": itemid,
-                            "item_name": item_name,
-                            "last_value": last,
-                            "type": "text"
-                        })
-                result[host_id]["graphs"][graph_id] = {
-                    "name": graph["name"],
-                    "data": graph_data
-                }
-        return result
+        # Consultas MySQL (pymysql, bloqueante) fora do event loop
+        return await run_blocking("db", _collect_report_metrics, payload, max_points, format)
     except Exception as e:
         logger.error(f"Erro ao buscar métricas para relatório customizado: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro ao buscar métricas para relatório")
@@ -0,0 +1,134 @@
+# app/zabbix/series.py
+# ------------------------------------------------------------
+# Estrutura compacta de série temporal de um item do Zabbix.
+#
+# Todas as fontes de métricas (MySQL direto ou API history.get /
+# trend.get) devolvem ItemSeries, e o renderizador dos relatórios
+# não precisa saber de onde os dados vieram. As rotas devolvem a
+# série em formato colunar (to_dict): metadados uma vez + arrays.
+#
+# BucketAggregator: agregação incremental (média/mín/máx/contagem)
+# em buckets fixos, para consumir histórico em blocos (streaming) com
+# memória limitada a max_points, qualquer que seja a janela.
+# ------------------------------------------------------------
+
+import math
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+NUMERIC_VALUE_TYPES = (0, 3)  # 0=float, 3=uint
+
+
+@dataclass
+class ItemSeries:
+    itemid: str
+    name: str
+    clock: np.ndarray                         # int64, epoch em segundos, ordem crescente
+    value: np.ndarray                         # float64 (média quando vier de trends)
+    value_min: Optional[np.ndarray] = None    # trends e séries agregadas
+    value_max: Optional[np.ndarray] = None    # trends e séries agregadas
+    units: str = ""
+    value_type: int = 0
+    source: str = field(default="history")    # "history" | "trends"
+    count: Optional[np.ndarray] = None        # int64, pontos brutos por bucket (séries agregadas)
+
+    def __len__(self) -> int:
+        return int(self.clock.size)
+
+    @classmethod
+    def empty(cls, itemid, name: str, **kwargs) -> "ItemSeries":
+        return cls(str(itemid), name, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), **kwargs)
+
+    @classmethod
+    def from_points(cls, itemid, name: str, clocks, values, **kwargs) -> "ItemSeries":
+        """Cria a série a partir de sequências (qualquer ordem) de clock/valor."""
+        clock = np.asarray(clocks, dtype=np.int64)
+        value = np.asarray(values, dtype=np.float64)
+        order = np.argsort(clock, kind="stable")
+        extra = {
+            k: np.asarray(v, dtype=np.float64)[order]
+            for k, v in kwargs.items() if k in ("value_min", "value_max") and v is not None
+        }
+        kwargs.update(extra)
+        return cls(str(itemid), name, clock[order], value[order], **kwargs)
+
+    def downsample(self, target_points: int = 500) -> "ItemSeries":
+        """Amostragem uniforme por índice (np.linspace sobre as posições)."""
+        n = len(self)
+        if n <= target_points:
+            return self
+        idx = np.linspace(0, n - 1, target_points).astype(np.int64)
+        pick = lambda arr: None if arr is None else arr[idx]
+        return ItemSeries(
+            self.itemid, self.name, self.clock[idx], self.value[idx],
+            pick(self.value_min), pick(self.value_max), self.units, self.value_type, self.source,
+            pick(self.count)
+        )
+
+    def datetime_at(self, index: int, tz=None) -> datetime:
+        """Clock da posição 'index' como datetime (no fuso tz, sem tzinfo)."""
+        return datetime.fromtimestamp(int(self.clock[index]), tz=timezone.utc).astimezone(tz).replace(tzinfo=None)
+
+    def datetimes(self, tz=None) -> list:
+        """Clocks como datetime (no fuso tz, sem tzinfo) para plotagem."""
+        return [
+            datetime.fromtimestamp(int(ts), tz=timezone.utc).astimezone(tz).replace(tzinfo=None)
+            for ts in self.clock
+        ]
+
+    def to_dict(self) -> dict:
+        """Formato colunar para a API: metadados uma vez e arrays clock (epoch) / value."""
+        data = {
+            "itemid": self.itemid,
+            "item_name": self.name,
+            "units": self.units,
+            "value_type": self.value_type,
+            "source": self.source,
+            "clock": self.clock.tolist(),
+            "value": self.value.tolist(),
+        }
+        if self.value_min is not None:
+            data["min"] = self.value_min.tolist()
+            data["max"] = self.value_max.tolist()
+        if self.count is not None:
+            data["count"] = self.count.tolist()
+        return data
+
+
+class BucketAggregator:
+    """
+    Acumula pontos (em blocos, em qualquer ordem) em até max_points buckets alinhados
+    como no MySQL (clock DIV bucket), guardando só soma/mín/máx/contagem por bucket.
+    """
+
+    def __init__(self, from_ts: int, to_ts: int, max_points: int):
+        self.bucket = max(1, math.ceil((to_ts - from_ts) / max(1, max_points)))
+        self.first = from_ts // self.bucket
+        size = to_ts // self.bucket - self.first + 1
+        self.sum = np.zeros(size, dtype=np.float64)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+
+    def feed(self, clock: np.ndarray, value: np.ndarray) -> None:
+        """Pontos fora dos buckets da janela são descartados (não empilhados nas bordas)."""
+        idx = clock // self.bucket - self.first
+        inside = (idx >= 0) & (idx < self.count.size)
+        if not inside.all():
+            idx, value = idx[inside], value[inside]
+        np.add.at(self.sum, idx, value)
+        np.add.at(self.count, idx, 1)
+        np.minimum.at(self.min, idx, value)
+        np.maximum.at(self.max, idx, value)
+
+    def to_series(self, itemid, name: str, **kwargs) -> ItemSeries:
+        """Série com value = média do bucket e envelope mín/máx (buckets vazios omitidos)."""
+        filled = np.flatnonzero(self.count)
+        clock = (filled + self.first) * self.bucket
+        return ItemSeries(
+            str(itemid), name, clock.astype(np.int64), self.sum[filled] / self.count[filled],
+            self.min[filled], self.max[filled], count=self.count[filled], **kwargs
+        )
@@ -2,17 +2,51 @@
 
 import requests
 from app.core.logging import logger
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
 from collections import Counter
 
+from app.core.config import ZABBIX_EVENT_PAGE_SIZE, ZABBIX_HTTP_TIMEOUT
+from app.core.deadline import call_timeout
+from app.core.governor import governor
+from app.zabbix.downtime import DowntimeEngine
+from app.zabbix.incidents import IncidentHistogram
+from app.zabbix.event_store import event_store_for
+from app.zabbix.cache import cached_call, cache_key, metadata_cache, cached_triggers, store_triggers, source_of
+
 from zoneinfo import ZoneInfo
 ZABBIX_TIMEZONE = ZoneInfo("America/Sao_Paulo")
 
 
+class ZabbixAPIError(Exception):
+    """Erro retornado pela API JSON-RPC do Zabbix (campo "error" da resposta)."""
+
+    AUTH_MARKERS = ("re-login", "session terminated", "not authorized", "not authorised", "session expired")
+
+    def __init__(self, message: str, code: int = None, data: str = None):
+        super().__init__(data or message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    @property
+    def is_auth_error(self) -> bool:
+        """True quando o erro indica token/sessão inválidos (necessário novo login)."""
+        text = f"{self.message or ''} {self.data or ''}".lower()
+        return any(marker in text for marker in self.AUTH_MARKERS)
+
+
+def _client(client=None):
+    """Retorna o cliente informado ou o cliente Zabbix compartilhado do processo."""
+    if client is not None:
+        return client
+    from app.zabbix.client import get_zabbix_client
+    return get_zabbix_client()
+
+
 class ZabbixService:
 
     @staticmethod
-    def get_version(api_url: str) -> str:
+    def get_version(api_url: str, session: requests.Session = None) -> str:
         """Obtém a versão do Zabbix via API JSON-RPC."""
         payload = {
             "jsonrpc": "2.0",
@@ -20,9 +54,11 @@ class ZabbixService:
             "params": {},
             "id": 1
         }
+        http = session or requests
         try:
             logger.info(f"Detectando versão do Zabbix: {api_url}")
-            response = requests.post(api_url, json=payload)
+            with governor("zabbix_api").acquire():
+                response = http.post(api_url, json=payload, timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, "apiinfo.version"))
             response.raise_for_status()
             return response.json().get("result")
         except Exception as e:
@@ -30,7 +66,7 @@ class ZabbixService:
             raise
 
     @staticmethod
-    def authenticate_api(api_url: str, username: str, password: str) -> str:
+    def authenticate_api(api_url: str, username: str, password: str, session: requests.Session = None) -> str:
         """Autentica via API JSON-RPC e retorna o token."""
         payload = {
             "jsonrpc": "2.0",
@@ -38,21 +74,24 @@ class ZabbixService:
             "params": {"username": username, "password": password},
             "id": 1
         }
+        http = session or requests
         try:
             logger.info(f"Autenticando via API: {api_url} - usuário: {username}")
-            response = requests.post(api_url, json=payload)
+            with governor("zabbix_api").acquire():
+                response = http.post(api_url, json=payload, timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, "user.login"))
             response.raise_for_status()
             data = response.json()
             if "result" in data:
                 logger.info(f"Token obtido com sucesso")
                 return data["result"]
-            raise Exception(data.get("error", {}).get("data", "Erro desconhecido"))
+            error = data.get("error", {})
+            raise ZabbixAPIError(error.get("message", "Erro desconhecido"), error.get("code"), error.get("data"))
         except Exception as e:
             logger.error(f"Erro ao autenticar via API: {str(e)}")
             raise
 
     @staticmethod
-    def authenticate_web(web_url: str, username: str, password: str) -> str:
+    def authenticate_web(web_url: str, username: str, password: str, session: requests.Session = None) -> str:
         """Autentica na interface web do Zabbix e retorna o cookie zbx_session."""
         login_payload = {
             "name": username,
@@ -62,8 +101,11 @@ class ZabbixService:
         }
         try:
             logger.info(f"Autenticando via WEB: {web_url} - usuário: {username}")
-            session = requests.Session()
-            response = session.post(f"{web_url}/index.php", data=login_payload)
+            session = session or requests.Session()
+            with governor("zabbix_api").acquire():
+                response = session.post(
+                    f"{web_url}/index.php", data=login_payload, timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, "login Web")
+                )
             if "zbx_session" in session.cookies:
                 logger.info("Sessão Web autenticada com sucesso")
                 return session.cookies["zbx_session"]
@@ -73,44 +115,127 @@ class ZabbixService:
             raise
 
     @staticmethod
-    def call_zabbix_api(api_url: str, method: str, params: dict, auth_token: str = None, version: str = "7.2") -> dict:
+    def build_rpc_request(calls: list, auth_token: str = None, version: str = "7.2"):
         """
-        Chamada genérica à API do Zabbix.
+        Monta (payload, headers) para uma ou mais chamadas (method, params).
         - Para versões < 7.2: usa campo "auth" no body
         - Para versões >= 7.2: usa Authorization: Bearer TOKEN no cabeçalho
+        Com uma única chamada o payload é um objeto; com várias, uma lista (batch).
+        Compartilhado pelos clientes síncrono (requests) e assíncrono (httpx).
         """
-        payload = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "params": params,
-            "id": 1
-        }
-
         headers = {"Content-Type": "application/json"}
+        use_bearer = version >= "7.2"
+        if use_bearer and auth_token:
+            headers["Authorization"] = f"Bearer {auth_token}"
+
+        payload = []
+        for idx, (method, params) in enumerate(calls, 1):
+            item = {"jsonrpc": "2.0", "method": method, "params": params, "id": idx}
+            if not use_bearer and auth_token:
+                item["auth"] = auth_token
+            payload.append(item)
+        return (payload[0] if len(payload) == 1 else payload), headers
+
+    @staticmethod
+    def parse_rpc_response(data: dict):
+        """Extrai o "result" de uma resposta JSON-RPC ou lança ZabbixAPIError."""
+        if "result" in data:
+            return data["result"]
+        error = data.get("error", {})
+        raise ZabbixAPIError(error.get("message", "Erro desconhecido"), error.get("code"), error.get("data"))
+
+    @staticmethod
+    def parse_batch_response(calls: list, data) -> list:
+        """
+        Casa as respostas de um lote com 'calls' pelo id.
+        Cada posição recebe o "result" ou uma instância de ZabbixAPIError.
+        """
+        # Erro global (ex.: lote malformado) vem como objeto único
+        if isinstance(data, dict):
+            ZabbixService.parse_rpc_response(data)
+            data = [data]
+
+        by_id = {item.get("id"): item for item in data}
+        results = []
+        for idx, (method, _) in enumerate(calls, 1):
+            item = by_id.get(idx)
+            if item is None:
+                results.append(ZabbixAPIError("Resposta ausente no lote", data=f"{method} (id {idx})"))
+                continue
+            try:
+                results.append(ZabbixService.parse_rpc_response(item))
+            except ZabbixAPIError as e:
+                logger.error(f"Erro na chamada {method} (lote): {e}")
+                results.append(e)
+        return results
 
-        if version >= "7.2":
-            if auth_token:
-                headers["Authorization"] = f"Bearer {auth_token}"
-        else:
-            if auth_token:
-                payload["auth"] = auth_token
+    @staticmethod
+    def call_zabbix_api(
+        api_url: str,
+        method: str,
+        params: dict,
+        auth_token: str = None,
+        version: str = "7.2",
+        session: requests.Session = None
+    ) -> dict:
+        """
+        Chamada genérica à API do Zabbix.
+        - session: requests.Session opcional (reaproveita conexões keep-alive)
+        - timeout: ZABBIX_HTTP_TIMEOUT, limitado ao deadline ativo (app.core.deadline)
+        Erros retornados pela API são lançados como ZabbixAPIError.
+        """
+        payload, headers = ZabbixService.build_rpc_request([(method, params)], auth_token, version)
 
+        http = session or requests
         logger.info(f"Chamando método Zabbix: {method} - versão {version}")
         try:
-            response = requests.post(api_url, json=payload, headers=headers)
+            with governor("zabbix_api").acquire():
+                response = http.post(api_url, json=payload, headers=headers, timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, method))
             response.raise_for_status()
-            data = response.json()
-            if "result" in data:
-                return data["result"]
-            raise Exception(data.get("error", {}).get("data", "Erro desconhecido"))
+            return ZabbixService.parse_rpc_response(response.json())
         except Exception as e:
             logger.error(f"Erro na chamada {method}: {str(e)}")
             raise
 
+    @staticmethod
+    def call_zabbix_api_batch(
+        api_url: str,
+        calls: list,
+        auth_token: str = None,
+        version: str = "7.2",
+        session: requests.Session = None
+    ) -> list:
+        """
+        Envia várias chamadas em um único POST (batch JSON-RPC).
+        - calls: lista de tuplas (method, params)
+        Retorna uma lista na mesma ordem de 'calls'; cada posição contém o "result"
+        da chamada ou uma instância de ZabbixAPIError (erro individual).
+        """
+        if not calls:
+            return []
+        payload, headers = ZabbixService.build_rpc_request(calls, auth_token, version)
+        if isinstance(payload, dict):
+            payload = [payload]
+
+        http = session or requests
+        methods = ", ".join(method for method, _ in calls)
+        logger.info(f"Chamando lote Zabbix ({len(calls)} métodos): {methods} - versão {version}")
+        try:
+            with governor("zabbix_api").acquire():
+                response = http.post(api_url, json=payload, headers=headers, timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, methods))
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            logger.error(f"Erro na chamada em lote ({methods}): {str(e)}")
+            raise
+        return ZabbixService.parse_batch_response(calls, data)
+
     @staticmethod
     def authenticate(api_url: str, web_url: str, username: str, password: str) -> dict:
         """
         Realiza autenticação API + Web e retorna token + cookie + versão.
+        Usado apenas para diagnóstico; as rotas usam o ZabbixClient compartilhado,
+        que mantém essas credenciais em cache.
         """
         logger.info("Iniciando autenticação unificada no Zabbix")
 
@@ -125,54 +250,97 @@ class ZabbixService:
         }
 
 
+### Parâmetros das consultas de topologia (compartilhados com AsyncZabbixService)
+    @staticmethod
+    def hostgroups_params() -> dict:
+        return {"output": ["groupid", "name"], "sortfield": "name"}
+
+    @staticmethod
+    def hosts_by_group_params(group_id: str) -> dict:
+        return {"output": ["hostid", "name", "status", "available"], "groupids": group_id, "sortfield": "name"}
+
+    @staticmethod
+    def graphs_by_host_params(host_id: str) -> dict:
+        return {"output": ["graphid", "name", "width", "height", "graphtype"], "hostids": host_id, "sortfield": "name"}
+
+    @staticmethod
+    def tree_params(group_id: str) -> list:
+        """Chamadas (em lote) da árvore hostgroup -> hosts -> gráficos de um grupo."""
+        return [
+            ("hostgroup.get", {"output": ["groupid", "name"], "groupids": group_id}),
+            ("host.get", {
+                **ZabbixService.hosts_by_group_params(group_id),
+                "selectGraphs": ["graphid", "name", "width", "height", "graphtype"]
+            }),
+        ]
+
+    @staticmethod
+    def build_tree(group_id: str, groups: list, hosts: list) -> dict:
+        """Monta a resposta de /zabbix/tree (gráficos ordenados por nome)."""
+        group = groups[0] if groups else {"groupid": group_id, "name": None}
+        for host in hosts:
+            host["graphs"] = sorted(host.get("graphs", []), key=lambda g: g.get("name", ""))
+        return {"groupid": group["groupid"], "name": group["name"], "hosts": hosts}
+
 ### Listar Hostgroup (GET http://127.0.0.1:8000/zabbix/hostgroups)
     @staticmethod
-    def list_hostgroups(api_url: str, auth_token: str, version: str) -> list:
+    def list_hostgroups(client=None) -> list:
         """
-        Retorna todos os hostgroups disponíveis no Zabbix.
+        Retorna todos os hostgroups disponíveis no Zabbix (cache de metadados).
         """
-        return ZabbixService.call_zabbix_api(api_url, "hostgroup.get", {
-            "output": ["groupid", "name"],
-            "sortfield": "name"
-        }, auth_token=auth_token, version=version)
+        return cached_call(_client(client), "hostgroup.get", ZabbixService.hostgroups_params())
 
 ### Listar Hosts por HostgroupID (GET http://127.0.0.1:8000/zabbix/hosts?group_id=5)
     @staticmethod
-    def list_hosts_by_group(api_url: str, auth_token: str, version: str, group_id: str) -> list:
+    def list_hosts_by_group(group_id: str, client=None) -> list:
         """
-        Lista os hosts vinculados a um determinado hostgroup.
+        Lista os hosts vinculados a um determinado hostgroup (cache de metadados).
         """
-        return ZabbixService.call_zabbix_api(
-            api_url=api_url,
-            method="host.get",
-            params={
-                "output": ["hostid", "name", "status", "available"],
-                "groupids": group_id,
-                "sortfield": "name"
-            },
-            auth_token=auth_token,
-            version=version
-        )
+        return cached_call(_client(client), "host.get", ZabbixService.hosts_by_group_params(group_id))
 
 ### Listar Graphs por HostID (GET http://127.0.0.1:8000/zabbix/graphs?host_id=10532)
     @staticmethod
-    def list_graphs_by_host(api_url: str, auth_token: str, version: str, host_id: str) -> list:
+    def list_graphs_by_host(host_id: str, client=None) -> list:
         """
-        Retorna todos os gráficos associados a um host específico.
+        Retorna todos os gráficos associados a um host específico (cache de metadados).
         """
-        return ZabbixService.call_zabbix_api(
-            api_url=api_url,
-            method="graph.get",
-            params={
-                "output": ["graphid", "name", "width", "height", "graphtype"],
-                "hostids": host_id,
-                "sortfield": "name"
-            },
-            auth_token=auth_token,
-            version=version
-        )
+        return cached_call(_client(client), "graph.get", ZabbixService.graphs_by_host_params(host_id))
+
+### Listar Graphs de vários hosts em um único POST (GET /zabbix/graphs/batch?host_id=1&host_id=2)
+    @staticmethod
+    def list_graphs_by_hosts(host_ids: list, client=None) -> dict:
+        """
+        Retorna {host_id: [gráficos]} para vários hosts usando uma única chamada em lote.
+        Só os hosts fora do cache entram no lote.
+        """
+        client = _client(client)
+        result, missing = {}, []
+        for host_id in host_ids:
+            cached = metadata_cache.get(cache_key("graph.get", ZabbixService.graphs_by_host_params(host_id), source_of(client)))
+            if cached is None:
+                missing.append(host_id)
+            else:
+                result[host_id] = cached
+        if missing:
+            calls = [("graph.get", ZabbixService.graphs_by_host_params(host_id)) for host_id in missing]
+            for (method, params), host_id, graphs in zip(calls, missing, client.call_many(calls)):
+                metadata_cache.set(cache_key(method, params, source_of(client)), graphs)
+                result[host_id] = graphs
+        return {host_id: result[host_id] for host_id in host_ids}
 
 ###Obter Grafico
+    @staticmethod
+    def graph_image_params(graph_id: str, from_time: str, to_time: str, width: int = 900, height: int = 200) -> dict:
+        return {
+            "graphid": graph_id,
+            "from": from_time,
+            "to": to_time,
+            "width": width,
+            "height": height,
+            "profileIdx": "web.charts.filter",
+            "resolve_macros": 1
+        }
+
     @staticmethod
     def get_graph_image(
         web_url: str,
@@ -181,28 +349,29 @@ class ZabbixService:
         from_time: str,
         to_time: str,
         width: int = 900,
-        height: int = 200
+        height: int = 200,
+        session: requests.Session = None
     ) -> bytes:
         """
         Obtém a imagem de um gráfico via frontend Web do Zabbix.
+        Se o frontend devolver algo que não seja imagem (ex.: tela de login por
+        sessão expirada), lança ZabbixAPIError de autenticação.
         """
         chart_url = f"{web_url}/chart2.php"
-        params = {
-            "graphid": graph_id,
-            "from": from_time,
-            "to": to_time,
-            "width": width,
-            "height": height,
-            "profileIdx": "web.charts.filter",
-            "resolve_macros": 1
-        }
+        params = ZabbixService.graph_image_params(graph_id, from_time, to_time, width, height)
 
         headers = {"Cookie": f"zbx_session={auth_token}"}
 
+        http = session or requests
         logger.info(f"Buscando imagem do gráfico {graph_id} de {from_time} até {to_time}")
         try:
-            response = requests.get(chart_url, params=params, headers=headers)
+            with governor("zabbix_api").acquire():
+                response = http.get(
+                    chart_url, params=params, headers=headers, timeout=call_timeout(ZABBIX_HTTP_TIMEOUT, f"chart2.php {graph_id}")
+                )
             response.raise_for_status()
+            if not response.headers.get("Content-Type", "").startswith("image/"):
+                raise ZabbixAPIError("Not authorized", data="chart2.php não retornou imagem (sessão Web expirada?)")
             return response.content
         except Exception as e:
             logger.error(f"Erro ao obter imagem do gráfico: {str(e)}")
@@ -210,27 +379,17 @@ class ZabbixService:
 
 
     @staticmethod
-    def get_events_by_hosts(api_url, auth_token, host_ids, time_from, time_till):
-        payload = {
-            "jsonrpc": "2.0",
-            "method": "event.get",
-            "params": {
-                "output": "extend",
-                "hostids": host_ids,
-                "time_from": time_from,   # ✅ Correto
-                "time_till": time_till,   # ✅ Correto
-                "value": [0, 1],          # OK e PROBLEM
-                "object": 0,              # Trigger
-                "sortfield": ["clock"],
-                "sortorder": "ASC"
-            },
-            "auth": auth_token,
-            "id": 1
-        }
-
-        response = requests.post(api_url, json=payload)
-        response.raise_for_status()
-        return response.json().get("result", [])
+    def get_events_by_hosts(host_ids, time_from, time_till, client=None):
+        return _client(client).call("event.get", {
+            "output": "extend",
+            "hostids": host_ids,
+            "time_from": time_from,   # ✅ Correto
+            "time_till": time_till,   # ✅ Correto
+            "value": [0, 1],          # OK e PROBLEM
+            "object": 0,              # Trigger
+            "sortfield": ["clock"],
+            "sortorder": "ASC"
+        })
 
 
 
@@ -238,7 +397,7 @@ class ZabbixService:
 
 
     @staticmethod
-    def count_incidents(api_url, auth_token, version, from_time, to_time, group_id=None):
+    def count_incidents(from_time, to_time, group_id=None, client=None):
         """Conta o número de incidentes (eventos de problema) em um período."""
         try:
             from_timestamp = int(datetime.strptime(from_time, "%Y-%m-%d %H:%M:%S").timestamp())
@@ -255,7 +414,12 @@ class ZabbixService:
                 params["groupids"] = group_id
 
             logger.info(f"[Zabbix] Contando incidentes de {from_time} a {to_time}")
-            return ZabbixService.call_zabbix_api(api_url, "event.get", params, auth_token, version)
+            client = _client(client)
+            store = event_store_for(client, from_timestamp)
+            if store:
+                # Mesmo formato do countOutput (string)
+                return str(store.count(from_timestamp, to_timestamp, group_id))
+            return client.call("event.get", params)
         except Exception as e:
             logger.error(f"[Zabbix] Erro ao contar incidentes: {str(e)}")
             raise
@@ -263,8 +427,97 @@ class ZabbixService:
     
 
     @staticmethod
-    def list_top_triggers(api_url, auth_token, version, from_time, to_time, group_id=None, limit=5):
-        """Lista as triggers mais ativadas em um período."""
+    def incident_histogram(from_time, to_time, group_id=None, bucket: str = "day", top: int = 5, client=None) -> dict:
+        """
+        Contagens, séries (hora/dia/semana × severidade), distribuição por hora do dia
+        e top N triggers a partir de uma única leitura paginada dos eventos PROBLEM.
+        """
+        try:
+            from_ts = int(datetime.strptime(from_time, "%Y-%m-%d %H:%M:%S").replace(tzinfo=ZABBIX_TIMEZONE).timestamp())
+            to_ts = int(datetime.strptime(to_time, "%Y-%m-%d %H:%M:%S").replace(tzinfo=ZABBIX_TIMEZONE).timestamp())
+            client = _client(client)
+            params = {
+                "source": 0,
+                "object": 0,
+                "time_from": from_ts,
+                "time_till": to_ts,
+                "value": 1,  # Apenas problemas
+                "output": ["eventid", "clock", "severity", "objectid"]
+            }
+            if group_id:
+                params["groupids"] = group_id
+
+            logger.info(f"[Zabbix] Histograma de incidentes ({bucket}) de {from_time} a {to_time}")
+            histogram = IncidentHistogram(from_ts, to_ts, bucket, ZABBIX_TIMEZONE)
+            store = event_store_for(client, from_ts)
+            if store:
+                pages = store.iter_event_pages(from_ts, to_ts, (1,), group_id, with_details=False)
+            else:
+                pages = ZabbixService.iter_event_pages(params, client=client)
+            for page in pages:
+                histogram.feed(page)
+
+            top_ids = [trigger_id for trigger_id, _ in histogram.top_triggers(top)]
+            return histogram.to_dict(top, ZabbixService._trigger_details(top_ids, client))
+        except Exception as e:
+            logger.error(f"[Zabbix] Erro ao gerar histograma de incidentes: {str(e)}")
+            raise
+
+    @staticmethod
+    def iter_event_pages(params: dict, page_size: int = ZABBIX_EVENT_PAGE_SIZE, client=None, first_page: list = None,
+                         method: str = "event.get", eventid_from: int = None):
+        """
+        Percorre event.get (ou problem.get) em páginas de até 'page_size' eventos, usando
+        o eventid como cursor (sortfield=eventid ASC + eventid_from). Cada página é um POST
+        separado, decodificado e entregue ao consumidor antes da próxima, então a
+        memória fica limitada ao tamanho da página.
+        - first_page: página já obtida com event_page_params(params, page_size)
+          (ex.: enviada em lote junto com outra chamada); a paginação continua dela.
+        - eventid_from: começa a partir deste eventid (inclusivo).
+        """
+        client = _client(client)
+        page = first_page
+        if page is None:
+            page = client.call(method, ZabbixService.event_page_params(params, page_size, eventid_from))
+        while page:
+            yield page
+            if len(page) < page_size:
+                return
+            next_from = int(page[-1]["eventid"]) + 1
+            page = client.call(method, ZabbixService.event_page_params(params, page_size, next_from))
+
+    @staticmethod
+    def event_page_params(params: dict, page_size: int = ZABBIX_EVENT_PAGE_SIZE, eventid_from: int = None) -> dict:
+        """Parâmetros de uma página de event.get (ordenação por eventid + limite)."""
+        page_params = {**params, "sortfield": "eventid", "sortorder": "ASC", "limit": page_size}
+        if eventid_from is not None:
+            page_params["eventid_from"] = str(eventid_from)
+        return page_params
+
+    @staticmethod
+    def _trigger_details(trigger_ids, client=None) -> dict:
+        """Retorna {triggerid: {description, priority, hosts}} para os ids informados (com cache)."""
+        if not trigger_ids:
+            return {}
+        client = _client(client)
+        details, missing = cached_triggers(trigger_ids, source_of(client))
+        if missing:
+            triggers = client.call("trigger.get", ZabbixService.trigger_details_params(missing))
+            store_triggers(triggers, source_of(client))
+            details.update({t["triggerid"]: t for t in triggers})
+        return details
+
+    @staticmethod
+    def trigger_details_params(trigger_ids) -> dict:
+        return {
+            "triggerids": list(trigger_ids),
+            "output": ["triggerid", "description", "priority"],
+            "selectHosts": ["hostid", "name"]
+        }
+
+    @staticmethod
+    def list_top_triggers(from_time, to_time, group_id=None, limit=5, client=None):
+        """Lista as triggers mais ativadas em um período (eventos lidos em páginas)."""
         try:
             from_timestamp = int(datetime.strptime(from_time, "%Y-%m-%d %H:%M:%S").timestamp())
             to_timestamp = int(datetime.strptime(to_time, "%Y-%m-%d %H:%M:%S").timestamp())
@@ -275,16 +528,23 @@ class ZabbixService:
                 "time_from": from_timestamp,
                 "time_till": to_timestamp,
                 "value": 1,
-                "output": ["objectid"]
+                "output": ["eventid", "objectid"]
             }
             if group_id:
                 params["groupids"] = group_id
 
             logger.info(f"[Zabbix] Buscando eventos para top triggers de {from_time} a {to_time}")
-            events = ZabbixService.call_zabbix_api(api_url, "event.get", params, auth_token, version)
 
-            # Contar ativações por objectid
-            counts = Counter(event["objectid"] for event in events)
+            client = _client(client)
+            store = event_store_for(client, from_timestamp)
+            if store:
+                # Agregação direto no espelho local (GROUP BY objectid)
+                counts = Counter(dict(store.top_triggers(from_timestamp, to_timestamp, group_id, limit)))
+            else:
+                # Contar ativações por objectid, página a página
+                counts = Counter()
+                for page in ZabbixService.iter_event_pages(params, client=client):
+                    counts.update(event["objectid"] for event in page)
 
             # Pegar os top N triggers
             top_trigger_ids = [trigger_id for trigger_id, _ in counts.most_common(limit)]
@@ -292,11 +552,7 @@ class ZabbixService:
                 return []
 
             # Buscar detalhes das triggers
-            triggers = ZabbixService.call_zabbix_api(api_url, "trigger.get", {
-                "triggerids": top_trigger_ids,
-                "output": ["triggerid", "description", "priority"],
-                "selectHosts": ["hostid", "name"]
-            }, auth_token, version)
+            triggers = ZabbixService._trigger_details(top_trigger_ids, client).values()
 
             # Combinar contagem com detalhes
             result = []
@@ -315,37 +571,85 @@ class ZabbixService:
             raise
 
     @staticmethod
-    def list_open_problems(
-        api_url: str,
-        auth_token: str,
-        version: str,
-        group_id: str = None
-    ) -> list:
+    def list_open_problems(group_id: str = None, client=None) -> list:
         """
-        Lista os problemas em aberto.
+        Lista os problemas em aberto (mais recentes primeiro).
+        Servido pelo snapshot incremental de app/zabbix/problems.py; para paginar
+        e filtrar por severidade/tag use problems_feed (GET /zabbix/problems).
         Parâmetros:
         - group_id: Filtra por hostgroup (opcional)
         """
+        from app.zabbix.problems import get_snapshot
         try:
-            params = {
-                "output": ["eventid", "name", "severity", "clock"],
-                "selectAcknowledges": ["userid", "action", "message"],
-                "selectTags": ["tag", "value"],
-                "sortfield": "eventid",
-                "sortorder": "DESC"
-            }
-            if group_id:
-                params["groupids"] = group_id
-
-            logger.info(f"Buscando problemas em aberto")
-            return ZabbixService.call_zabbix_api(api_url, "problem.get", params, auth_token, version)
+            snapshot = get_snapshot(group_id, client=client)
+            snapshot.refresh(client)
+            return snapshot.page(limit=len(snapshot.problems))["problems"]
         except Exception as e:
             logger.error(f"Erro ao listar problemas em aberto: {str(e)}")
             raise
-    
+
     @staticmethod
-    def calculate_downtime(api_url, auth_token, version, from_time, to_time, trigger_id=None, group_id=None):
-        """Calcula o tempo total de downtime com detalhes por intervalo."""
+    def build_downtime(from_ts: int, to_ts: int, trigger_id=None, group_id=None, client=None) -> DowntimeEngine:
+        """
+        Alimenta um DowntimeEngine com os eventos (paginados) do período. Cada página
+        é processada e descartada; só os intervalos compactos ficam em memória.
+        """
+        client = _client(client)
+        params = {
+            "source": 0,
+            "object": 0,
+            "time_from": from_ts,
+            "time_till": to_ts,
+            "value": [0, 1],  # PROBLEM e RESOLVED
+            "output": ["eventid", "clock", "value", "objectid", "acknowledged", "severity"],
+            "selectHosts": ["hostid", "name"],
+            "selectTags": ["tag", "value"]
+        }
+        if trigger_id:
+            params["objectids"] = [trigger_id]
+        if group_id:
+            params["groupids"] = [group_id]
+
+        store = event_store_for(client, from_ts)
+        if store:
+            # Eventos do espelho local, no mesmo formato do event.get
+            pages = store.iter_event_pages(from_ts, to_ts, (0, 1), group_id, trigger_id)
+            return ZabbixService._feed_downtime(DowntimeEngine(from_ts, to_ts), pages, {}, client)
+
+        triggers_info = {}
+        first_page = None
+        if trigger_id:
+            triggers_info, missing = cached_triggers([trigger_id], source_of(client))
+            if missing:
+                # Trigger fora do cache: 1ª página de event.get e trigger.get seguem no mesmo POST
+                first_page, trigger_details = client.call_many([
+                    ("event.get", ZabbixService.event_page_params(params)),
+                    ("trigger.get", ZabbixService.trigger_details_params(missing))
+                ])
+                store_triggers(trigger_details, source_of(client))
+                triggers_info = {t["triggerid"]: t for t in trigger_details}
+
+        pages = ZabbixService.iter_event_pages(params, client=client, first_page=first_page)
+        return ZabbixService._feed_downtime(DowntimeEngine(from_ts, to_ts), pages, triggers_info, client)
+
+    @staticmethod
+    def _feed_downtime(engine: DowntimeEngine, pages, triggers_info: dict, client) -> DowntimeEngine:
+        for page in pages:
+            # Detalhes só das triggers ainda não vistas nesta página
+            missing = {e["objectid"] for e in page} - triggers_info.keys()
+            triggers_info.update(ZabbixService._trigger_details(missing, client))
+            engine.feed(page, triggers_info)
+        engine.finish()
+        return engine
+
+    @staticmethod
+    def calculate_downtime(from_time, to_time, trigger_id=None, group_id=None, client=None):
+        """
+        Calcula o downtime do período com detalhes por intervalo.
+        - Estado PROBLEM/OK por trigger; problemas simultâneos de triggers diferentes
+          geram intervalos próprios.
+        - downtime_seconds: união dos intervalos (hostgroup); "hosts": união por host.
+        """
         try:
             # Converte períodos para timestamp UTC, considerando o fuso horário local
             from_dt = datetime.strptime(from_time, "%Y-%m-%d %H:%M:%S").replace(tzinfo=ZABBIX_TIMEZONE)
@@ -353,119 +657,9 @@ class ZabbixService:
             from_ts = int(from_dt.timestamp())
             to_ts = int(to_dt.timestamp())
 
-            # Monta parâmetros para event.get
-            params = {
-                "source": 0,
-                "object": 0,
-                "time_from": from_ts,
-                "time_till": to_ts,
-                "value": [0, 1],  # PROBLEM e RESOLVED
-                "sortfield": "clock",
-                "sortorder": "ASC",
-                "output": ["eventid", "clock", "value", "objectid", "acknowledged", "severity"],
-                "selectHosts": ["hostid", "name"],
-                "selectTags": ["tag", "value"]
-            }
-            if trigger_id:
-                params["objectids"] = [trigger_id]
-            if group_id:
-                params["groupids"] = [group_id]
-
             logger.info(f"[Zabbix] Buscando eventos para cálculo de downtime")
-            events = ZabbixService.call_zabbix_api(api_url, "event.get", params, auth_token, version)
-
-            if not events:
-                return {"downtime_seconds": 0, "downtime_human": "0s", "intervals": []}
-
-            # Coletar todos os trigger_ids únicos para buscar nomes depois
-            trigger_ids = list({e["objectid"] for e in events})
-
-            # Buscar detalhes das triggers
-            triggers_info = {}
-            if trigger_ids:
-                trigger_details = ZabbixService.call_zabbix_api(api_url, "trigger.get", {
-                    "triggerids": trigger_ids,
-                    "output": ["triggerid", "description", "priority"],
-                    "selectHosts": ["hostid", "name"]
-                }, auth_token, version)
-
-                for trig in trigger_details:
-                    triggers_info[trig["triggerid"]] = {
-                        "description": trig["description"],
-                        "priority": trig["priority"]
-                    }
-
-            total_downtime = 0
-            current_problem = None
-            intervals = []
-
-            for event in events:
-                event_time = int(event["clock"])
-                event_value = int(event["value"])  # 1 = PROBLEM, 0 = RESOLVED
-
-                if event_value == 1 and current_problem is None:
-                    current_problem = {
-                        "start_ts": event_time,
-                        "event_id_start": event["eventid"],
-                        "trigger_id": event["objectid"],
-                        "acknowledged": bool(event.get("acknowledged", 0)),
-                        "severity": event.get("severity", "unknown"),
-                        "tags": event.get("tags", []),
-                        "host": event.get("hosts", [{}])[0].get("name", "Unknown"),
-                        "trigger_name": triggers_info.get(event["objectid"], {}).get("description", "N/A"),
-                        "trigger_priority": triggers_info.get(event["objectid"], {}).get("priority", "N/A")
-                    }
-                elif event_value == 0 and current_problem:
-                    start_ts = max(current_problem["start_ts"], from_ts)
-                    end_ts = min(event_time, to_ts)
-
-                    if start_ts < end_ts:
-                        downtime = end_ts - start_ts
-                        total_downtime += downtime
-                        intervals.append({
-                            "start": datetime.fromtimestamp(start_ts, tz=timezone.utc).astimezone(ZABBIX_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S"),
-                            "end": datetime.fromtimestamp(end_ts, tz=timezone.utc).astimezone(ZABBIX_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S"),
-                            "duration_seconds": downtime,
-                            "event_id_start": current_problem["event_id_start"],
-                            "event_id_end": event["eventid"],
-                            "trigger_id": current_problem["trigger_id"],
-                            "trigger_name": current_problem["trigger_name"],
-                            "trigger_priority": current_problem["trigger_priority"],
-                            "host": current_problem["host"],
-                            "severity": current_problem["severity"],
-                            "acknowledged": current_problem["acknowledged"],
-                            "tags": current_problem["tags"]
-                        })
-                    current_problem = None
-
-            # Se ainda houver PROBLEM aberto no final do período
-            if current_problem:
-                start_ts = max(current_problem["start_ts"], from_ts)
-                end_ts = to_ts
-                if start_ts < end_ts:
-                    downtime = end_ts - start_ts
-                    total_downtime += downtime
-                    intervals.append({
-                        "start": datetime.fromtimestamp(start_ts, tz=timezone.utc).astimezone(ZABBIX_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S"),
-                        "end": datetime.fromtimestamp(end_ts, tz=timezone.utc).astimezone(ZABBIX_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S"),
-                        "duration_seconds": downtime,
-                        "event_id_start": current_problem["event_id_start"],
-                        "event_id_end": None,
-                        "trigger_id": current_problem["trigger_id"],
-                        "trigger_name": current_problem["trigger_name"],
-                        "trigger_priority": current_problem["trigger_priority"],
-                        "host": current_problem["host"],
-                        "severity": current_problem["severity"],
-                        "acknowledged": current_problem["acknowledged"],
-                        "tags": current_problem["tags"]
-                    })
-
-            return {
-                "downtime_seconds": total_downtime,
-                "downtime_human": str(timedelta(seconds=total_downtime)),
-                "intervals": intervals
-            }
+            engine = ZabbixService.build_downtime(from_ts, to_ts, trigger_id, group_id, client)
+            return engine.to_dict(ZABBIX_TIMEZONE)
         except Exception as e:
             logger.error(f"[Zabbix] Erro ao calcular downtime: {str(e)}")
             raise
-
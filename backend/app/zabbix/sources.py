@@ -0,0 +1,110 @@
+# app/zabbix/sources.py
+# ------------------------------------------------------------
+# Vários servidores Zabbix ("sources") em uma única instalação.
+#
+# - A fonte "default" vem das variáveis ZABBIX_* / MYSQL_* do .env.
+# - Fontes adicionais: ZABBIX_SOURCES (JSON) ou ZABBIX_SOURCES_FILE
+#   (arquivo JSON), no formato:
+#     {"sp": {"api_url": "...", "web_url": "...", "user": "...", "password": "...",
+#             "pool_size": 10, "max_connections": 50,
+#             "mysql": {"host": "...", "user": "...", "password": "...", "db": "..."}}}
+# - Cada fonte tem seus próprios clientes (pool/limites) em
+#   app/zabbix/client.py e app/zabbix/async_client.py.
+# - use_source(nome): define a fonte do contexto atual (contextvar);
+#   clientes e conexões MySQL sem fonte explícita usam essa.
+# ------------------------------------------------------------
+
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.core.config import (
+    ZABBIX_API_URL, ZABBIX_WEB_URL, ZABBIX_USER, ZABBIX_PASS,
+    MYSQL_HOST, MYSQL_USER, MYSQL_PASS, MYSQL_DB,
+    ZABBIX_HTTP_POOL_SIZE, ZABBIX_ASYNC_MAX_CONNECTIONS, ZABBIX_ASYNC_MAX_KEEPALIVE,
+    ZABBIX_SOURCES, ZABBIX_SOURCES_FILE,
+)
+from app.core.logging import logger
+
+DEFAULT_SOURCE = "default"
+
+_current_source = ContextVar("zabbix_source", default=DEFAULT_SOURCE)
+
+
+@dataclass
+class ZabbixSource:
+    name: str
+    api_url: str
+    web_url: str
+    user: str
+    password: str
+    pool_size: int = ZABBIX_HTTP_POOL_SIZE
+    max_connections: int = ZABBIX_ASYNC_MAX_CONNECTIONS
+    max_keepalive: int = ZABBIX_ASYNC_MAX_KEEPALIVE
+    mysql: dict = field(default_factory=dict)  # host, user, password, db
+
+    def public(self) -> dict:
+        """Dados seguros para exibir (sem senhas)."""
+        return {"name": self.name, "api_url": self.api_url, "web_url": self.web_url, "has_db": bool(self.mysql.get("host"))}
+
+
+def _load_sources() -> dict:
+    sources = {
+        DEFAULT_SOURCE: ZabbixSource(
+            DEFAULT_SOURCE, ZABBIX_API_URL, ZABBIX_WEB_URL, ZABBIX_USER, ZABBIX_PASS,
+            mysql={"host": MYSQL_HOST, "user": MYSQL_USER, "password": MYSQL_PASS, "db": MYSQL_DB}
+        )
+    }
+    raw = {}
+    try:
+        if ZABBIX_SOURCES_FILE and Path(ZABBIX_SOURCES_FILE).exists():
+            raw.update(json.loads(Path(ZABBIX_SOURCES_FILE).read_text(encoding="utf-8")))
+        if ZABBIX_SOURCES:
+            raw.update(json.loads(ZABBIX_SOURCES))
+    except (OSError, ValueError) as e:
+        logger.error(f"[ZABBIX] Configuração de fontes inválida (ZABBIX_SOURCES/ZABBIX_SOURCES_FILE): {e}")
+        raise
+
+    for name, cfg in raw.items():
+        sources[name] = ZabbixSource(name=name, **cfg)
+    if len(sources) > 1:
+        logger.info(f"[ZABBIX] Fontes configuradas: {', '.join(sources)}")
+    return sources
+
+
+SOURCES = _load_sources()
+
+
+def resolve_source_name(name: str = None) -> str:
+    """Nome informado (ou o do contexto atual); erro se a fonte não existir."""
+    name = name or _current_source.get()
+    if name not in SOURCES:
+        raise KeyError(f"Fonte Zabbix desconhecida: {name}")
+    return name
+
+
+def get_source(name: str = None) -> ZabbixSource:
+    return SOURCES[resolve_source_name(name)]
+
+
+def list_sources() -> list:
+    return [source.public() for source in SOURCES.values()]
+
+
+def set_current_source(name: str = None) -> str:
+    """Fixa a fonte no contexto atual sem restaurar (usado por dependências de rota)."""
+    name = resolve_source_name(name)
+    _current_source.set(name)
+    return name
+
+
+@contextmanager
+def use_source(name: str = None):
+    """Define a fonte do contexto atual (None mantém a atual)."""
+    token = _current_source.set(resolve_source_name(name))
+    try:
+        yield get_source()
+    finally:
+        _current_source.reset(token)
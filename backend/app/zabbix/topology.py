@@ -0,0 +1,188 @@
+# app/zabbix/topology.py
+# ------------------------------------------------------------
+# Índice em memória da topologia do Zabbix (view v_zabbix):
+# hostgroup -> host -> item -> gráficos / triggers.
+#
+# - Montado com UMA leitura da view (cursor em streaming, tuplas),
+#   por fonte Zabbix; graph_ids/trigger_ids (listas separadas por
+#   vírgula) viram mapas reversos gráfico -> itens e trigger -> itens.
+# - As respostas das rotas /zabbix/db/hostgroups, hosts, items,
+#   item-info e graph-to-item já ficam prontas (listas ordenadas),
+#   servidas direto da memória.
+# - Atualização: após a primeira montagem, uma thread por fonte
+#   reconstrói o índice a cada ZABBIX_TOPOLOGY_REFRESH_SECONDS,
+#   independente de leituras; o novo índice substitui o antigo de uma
+#   vez (troca de referência, sem lock na leitura).
+# - Só a primeira leitura de cada fonte espera a montagem, feita fora
+#   do lock global (uma trava por fonte): as outras fontes continuam
+#   respondendo enquanto isso.
+# ------------------------------------------------------------
+
+import threading
+import time
+from datetime import datetime
+
+from app.core.config import ZABBIX_TOPOLOGY_REFRESH_SECONDS
+from app.core.logging import logger
+from app.zabbix.sources import resolve_source_name
+
+COLUMNS = (
+    "hostgroup_id", "hostgroup_name", "host_id", "host_name", "item_id", "item_name",
+    "graph_ids", "graph_names", "trigger_ids", "trigger_names",
+)
+
+
+def _split_ids(raw) -> list:
+    """"1,2,3" (GROUP_CONCAT da view) -> [1, 2, 3]."""
+    if not raw:
+        return []
+    return [int(part) for part in str(raw).split(",") if part.strip().isdigit()]
+
+
+class TopologyIndex:
+    """Índice imutável: construído inteiro por build() e só lido depois."""
+
+    def __init__(self, source: str, rows):
+        self.source = source
+        self.built_at = time.time()
+        self._built_mono = time.monotonic()
+
+        groups = {}           # hostgroup_id -> nome
+        group_hosts = {}      # hostgroup_id -> {host_id: nome}
+        host_items = {}       # host_id -> {item_id: nome}
+        self.item_info = {}   # item_id -> linha da view (a primeira encontrada)
+        self.item_host = {}   # item_id -> host_id
+        self.graph_items = {}  # graph_id -> [item_id]
+        self.trigger_items = {}  # trigger_id -> [item_id]
+        for row in rows:
+            row = dict(zip(COLUMNS, row))
+            group_id, host_id, item_id = row["hostgroup_id"], row["host_id"], row["item_id"]
+            groups[group_id] = row["hostgroup_name"]
+            group_hosts.setdefault(group_id, {})[host_id] = row["host_name"]
+            host_items.setdefault(host_id, {})[item_id] = row["item_name"]
+            if item_id in self.item_info:
+                continue  # mesmo item em outro hostgroup
+            self.item_info[item_id] = row
+            self.item_host[item_id] = host_id
+            for graph_id in _split_ids(row["graph_ids"]):
+                self.graph_items.setdefault(graph_id, []).append(item_id)
+            for trigger_id in _split_ids(row["trigger_ids"]):
+                self.trigger_items.setdefault(trigger_id, []).append(item_id)
+
+        # Respostas prontas, na mesma ordem do ORDER BY das consultas antigas
+        self.hostgroups = [
+            {"hostgroup_id": gid, "hostgroup_name": name}
+            for gid, name in sorted(groups.items(), key=lambda kv: (kv[1] or ""))
+        ]
+        self.hosts_by_group = {
+            gid: [{"host_id": hid, "host_name": name} for hid, name in sorted(hosts.items(), key=lambda kv: (kv[1] or ""))]
+            for gid, hosts in group_hosts.items()
+        }
+        self.items_by_host = {
+            hid: [{"item_id": iid, "item_name": name} for iid, name in sorted(items.items(), key=lambda kv: (kv[1] or ""))]
+            for hid, items in host_items.items()
+        }
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self._built_mono
+
+    def hosts(self, hostgroup_id: int) -> list:
+        return self.hosts_by_group.get(hostgroup_id, [])
+
+    def items(self, host_id: int) -> list:
+        return self.items_by_host.get(host_id, [])
+
+    def item_for_graph(self, graph_id: int):
+        """Primeiro item do gráfico (None se o gráfico não estiver na view)."""
+        items = self.graph_items.get(graph_id)
+        return items[0] if items else None
+
+    def items_for_trigger(self, trigger_id: int) -> list:
+        """Itens usados na expressão da trigger (vazio se a trigger não estiver na view)."""
+        return self.trigger_items.get(trigger_id, [])
+
+    def stats(self) -> dict:
+        return {
+            "source": self.source,
+            "built_at": datetime.fromtimestamp(self.built_at).isoformat(),
+            "age_seconds": round(self.age, 1),
+            "hostgroups": len(self.hostgroups),
+            "hosts": len(self.items_by_host),
+            "items": len(self.item_info),
+            "graphs": len(self.graph_items),
+            "triggers": len(self.trigger_items),
+        }
+
+
+def build_index(source: str) -> TopologyIndex:
+    """Lê a view v_zabbix inteira (uma consulta) e monta o índice."""
+    from app.zabbix.db_service import db_connection, ZabbixStreamingCursor
+
+    started = time.monotonic()
+    with db_connection(source) as conn, conn.cursor(ZabbixStreamingCursor) as cursor:
+        cursor.execute(f"SELECT {', '.join(COLUMNS)} FROM v_zabbix")
+        index = TopologyIndex(source, cursor)
+    logger.info(
+        f"[ZABBIX] Índice de topologia ({source}) montado em {time.monotonic() - started:.2f}s: "
+        f"{len(index.hostgroups)} hostgroups, {len(index.item_info)} itens, {len(index.graph_items)} gráficos, "
+        f"{len(index.trigger_items)} triggers"
+    )
+    return index
+
+
+# ---------------------- registro de índices ----------------------
+
+_indexes = {}
+_build_locks = {}   # fonte -> trava da primeira montagem
+_refreshers = set()
+_lock = threading.Lock()  # só protege os dicionários acima, nunca uma montagem
+
+
+def _refresh_loop(source: str) -> None:
+    """Reconstrói o índice da fonte a cada ZABBIX_TOPOLOGY_REFRESH_SECONDS (thread daemon)."""
+    while True:
+        time.sleep(ZABBIX_TOPOLOGY_REFRESH_SECONDS)
+        try:
+            index = build_index(source)
+        except Exception as e:
+            logger.error(f"[ZABBIX] Falha ao atualizar índice de topologia ({source}): {e}")
+            continue
+        with _lock:
+            _indexes[source] = index  # troca atômica da referência
+
+
+def _start_refresher(source: str) -> None:
+    with _lock:
+        if source in _refreshers:
+            return
+        _refreshers.add(source)
+    threading.Thread(target=_refresh_loop, args=(source,), name=f"topology-{source}", daemon=True).start()
+
+
+def get_topology(source: str = None) -> TopologyIndex:
+    """
+    Índice da fonte (atual do contexto, se None), sempre servido da memória. Só a
+    primeira chamada da fonte monta na hora; daí em diante a thread de atualização
+    mantém o índice.
+    """
+    source = resolve_source_name(source)
+    index = _indexes.get(source)
+    if index is not None:
+        return index
+    with _lock:
+        build_lock = _build_locks.setdefault(source, threading.Lock())
+    with build_lock:
+        index = _indexes.get(source)
+        if index is None:
+            index = build_index(source)  # fora de _lock: outras fontes não esperam
+            with _lock:
+                _indexes[source] = index
+            _start_refresher(source)
+    return index
+
+
+def topology_stats() -> list:
+    with _lock:
+        indexes = sorted(_indexes.items())
+    return [index.stats() for _, index in indexes]
@@ -0,0 +1,20 @@
+# tests/conftest.py
+# ------------------------------------------------------------
+# Testes do backend: rodar a partir de backend/ com `python -m pytest`.
+# Garante que o pacote "app" seja importável e que STORAGE_DIR aponte
+# para uma pasta temporária (paths.py cria as pastas na importação).
+# Configuração de e-mail mínima: app/mail/service.py valida a
+# ConnectionConfig na importação (usuário/senha obrigatórios e o
+# remetente padrão .local é recusado pelo email-validator).
+# ------------------------------------------------------------
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="z3-tests-"))
+os.environ.setdefault("MAIL_USERNAME", "")
+os.environ.setdefault("MAIL_PASSWORD", "")
+os.environ.setdefault("MAIL_FROM", "Z3 Reports <reports@example.com>")
@@ -0,0 +1,29 @@
+# tests/test_downtime.py
+from zoneinfo import ZoneInfo
+
+from app.zabbix.downtime import DowntimeEngine
+
+HOST = [{"hostid": "10", "name": "srv"}]
+
+
+def _event(eventid, value, clock, objectid="100"):
+    return {"eventid": str(eventid), "objectid": objectid, "value": str(value), "clock": str(clock), "hosts": HOST}
+
+
+def _downtime(events, from_ts=1000, to_ts=100000):
+    engine = DowntimeEngine(from_ts, to_ts)
+    engine.feed(events)
+    engine.finish()
+    return engine.to_dict(ZoneInfo("UTC"))
+
+
+def test_duplicate_ok_does_not_open_interval_from_window_start():
+    result = _downtime([_event(1, 1, 50000), _event(2, 0, 50100), _event(3, 0, 50200)])
+    assert result["downtime_seconds"] == 100
+    assert len(result["intervals"]) == 1
+
+
+def test_first_event_ok_means_problem_started_before_window():
+    result = _downtime([_event(1, 0, 5000), _event(2, 0, 6000)])
+    assert result["downtime_seconds"] == 4000
+    assert result["intervals"][0]["event_id_start"] is None
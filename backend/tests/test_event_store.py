@@ -0,0 +1,32 @@
+# tests/test_event_store.py
+import time
+
+import app.zabbix.event_store as event_store
+
+
+class _Client:
+    source = "default"
+
+    def call_many(self, calls):
+        raise AssertionError("a requisição não deve sincronizar o espelho")
+
+
+def _store(synced_at, covered_from):
+    store = event_store.get_event_store("default")
+    with store.conn:
+        store._set_state("synced_at", synced_at)
+        store._set_state("covered_from", covered_from)
+    return store
+
+
+def test_stale_store_falls_back_to_api_without_syncing(monkeypatch):
+    monkeypatch.setattr(event_store, "ZABBIX_EVENT_STORE", True)
+    _store(time.time() - 86400, 0)
+    assert event_store.event_store_for(_Client(), 1000) is None
+
+
+def test_fresh_store_is_used_only_when_it_covers_the_period(monkeypatch):
+    monkeypatch.setattr(event_store, "ZABBIX_EVENT_STORE", True)
+    store = _store(time.time(), 5000)
+    assert event_store.event_store_for(_Client(), 6000) is store
+    assert event_store.event_store_for(_Client(), 1000) is None
@@ -0,0 +1,62 @@
+# tests/test_governor.py
+import os
+import threading
+import time
+import uuid
+
+import pytest
+
+import app.core.governor as gov
+
+pytestmark = pytest.mark.skipif(gov.fcntl is None, reason="vagas compartilhadas exigem fcntl")
+
+
+def _resource(limit=2):
+    return gov.Resource(f"test-{uuid.uuid4().hex[:8]}", limit, shared=True)
+
+
+def test_slot_files_opened_once_and_never_double_granted(monkeypatch):
+    resource = _resource(limit=2)
+    opened = []
+    real_open = os.open
+    monkeypatch.setattr(gov.os, "open", lambda *a, **kw: opened.append(a[0]) or real_open(*a, **kw))
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work():
+        for _ in range(20):
+            with resource.acquire():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.001)
+                with lock:
+                    active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= 2
+    assert len([p for p in opened if p.endswith(".lock")]) == 2
+    assert resource._held == set()
+
+
+def test_forked_child_does_not_inherit_parent_slot():
+    resource = _resource(limit=2)
+    gov._resources[resource.name] = resource
+    held = resource.lease()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # filho: só a vaga livre deve ser obtida
+        os.close(read_fd)
+        first, second = resource._try_slot(), resource._try_slot()
+        os.write(write_fd, f"{first},{second}".encode())
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    result = os.read(read_fd, 64).decode()
+    os.close(read_fd)
+    held.release()
+    gov._resources.pop(resource.name)
+    assert result == f"{1 - held._slot},None"
@@ -0,0 +1,67 @@
+# tests/test_loop_lag.py
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("reportlab")
+pytest.importorskip("plotly")
+pytest.importorskip("fastapi_mail")
+
+from app.core.executors import LoopLagMonitor  # noqa: E402
+from app.reports import routes  # noqa: E402
+
+MAX_LAG = 0.2
+PAYLOAD = {
+    "data": {
+        "hosts": [{
+            "name": "srv",
+            "graphs": [{"id": "1", "from_time": "2025-06-01 00:00:00", "to_time": "2025-06-30 23:59:59"}],
+        }],
+    },
+}
+
+
+class _Request:
+    async def json(self):
+        return PAYLOAD
+
+
+def test_pdf_report_does_not_block_event_loop(monkeypatch, tmp_path):
+    pdf = tmp_path / "relatorio.pdf"
+
+    def slow_generate_pdf_db(cfg):
+        time.sleep(1.0)  # consultas + gráficos + ReportLab, todos bloqueantes
+        pdf.write_bytes(b"%PDF-1.4\n%%EOF\n")
+        return str(pdf)
+
+    monkeypatch.setattr(routes.ReportService, "generate_pdf_db", staticmethod(slow_generate_pdf_db))
+
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.02, warn_after=MAX_LAG)
+        monitor.start()
+        gaps = []
+
+        async def heartbeat():  # faz o papel do health check concorrente
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                gaps.append(now - last)
+                last = now
+
+        beat = asyncio.get_running_loop().create_task(heartbeat())
+        try:
+            response = await routes.generate_pdf_report_db(_Request())
+        finally:
+            beat.cancel()
+            stats = monitor.stats()
+            await monitor.stop()
+        return response, stats, gaps
+
+    response, stats, gaps = asyncio.run(scenario())
+    assert response.media_type == "application/pdf"
+    assert stats["lag_max_seconds"] < MAX_LAG
+    assert stats["warnings"] == 0
+    assert len(gaps) > 20
+    assert max(gaps) < MAX_LAG
@@ -0,0 +1,79 @@
+# tests/test_metrics_source.py
+from zoneinfo import ZoneInfo
+
+from app.zabbix.metrics_source import ApiMetricsSource
+
+ITEMS = [
+    {"itemid": "1", "item_name": "com trends", "value_type": 0},
+    {"itemid": "2", "item_name": "sem trends", "value_type": 3},
+]
+
+
+class _Client:
+    """Item 1 tem trends; o item 2 (trends=0) só tem histórico, um ponto a cada 2h."""
+
+    source = "default"
+
+    def __init__(self):
+        self.calls = []
+
+    def call_many(self, calls):
+        self.calls.extend(method for method, _ in calls)
+        results = []
+        for method, params in calls:
+            if method == "trend.get":
+                results.append([
+                    {"itemid": "1", "clock": str(params["time_from"]), "value_avg": "1", "value_min": "0", "value_max": "2"}
+                ])
+            else:
+                results.append([
+                    {"itemid": itemid, "clock": str(clock), "value": "3.5"}
+                    for itemid in params["itemids"] if itemid == "2"
+                    for clock in range(params["time_from"], params["time_till"], 7200)
+                ])
+        return results
+
+
+def test_items_without_trends_fall_back_to_history():
+    client = _Client()
+    series = ApiMetricsSource(client).fetch(
+        ITEMS, "2024-01-01 00:00:00", "2024-01-31 00:00:00", max_points=100, tz=ZoneInfo("UTC")
+    )
+    by_id = {s.itemid: s for s in series}
+    assert by_id["1"].source == "trends"
+    assert by_id["2"].source == "history"
+    assert 0 < len(by_id["2"]) <= 101
+    assert set(by_id["2"].value) == {3.5}
+    assert "history.get" in client.calls
+
+
+def test_trends_end_with_current_hour_from_history(monkeypatch):
+    import app.zabbix.metrics_source as metrics_source
+
+    now = 1_700_003_000  # 50 min após o início da hora
+    hour = now // 3600 * 3600
+    monkeypatch.setattr(metrics_source.time, "time", lambda: now)
+
+    class Client:
+        source = "default"
+
+        def __init__(self):
+            self.batches = []
+
+        def call_many(self, calls):
+            self.batches.append([method for method, _ in calls])
+            return [
+                [{"itemid": "1", "clock": str(hour - 3600 * k), "value_avg": "1", "value_min": "0", "value_max": "2"}
+                 for k in range(3)]
+                if method == "trend.get" else
+                [{"itemid": "1", "clock": str(hour + 60), "value": "7"}, {"itemid": "1", "clock": str(hour + 120), "value": "9"}]
+                for method, _ in calls
+            ]
+
+    client = Client()
+    tz = ZoneInfo("UTC")
+    fmt = lambda ts: metrics_source.datetime.fromtimestamp(ts, tz).strftime("%Y-%m-%d %H:%M:%S")
+    (series,) = ApiMetricsSource(client, use_trends=True).fetch(ITEMS[:1], fmt(hour - 7200), fmt(now), tz=tz)
+    assert client.batches == [["trend.get", "history.get"]]
+    assert series.clock.tolist() == [hour - 7200, hour - 3600, hour + 60, hour + 120]
+    assert series.value_max.tolist() == [2.0, 2.0, 7.0, 9.0]
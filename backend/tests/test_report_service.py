@@ -0,0 +1,27 @@
+# tests/test_report_service.py
+import pytest
+
+pytest.importorskip("reportlab")
+pytest.importorskip("plotly")
+pytest.importorskip("fastapi_mail")
+
+from app.core.deadline import current_deadline  # noqa: E402
+from app.reports.service import ReportService  # noqa: E402
+
+
+@pytest.fixture
+def budget_seen(monkeypatch):
+    seen = []
+    monkeypatch.setattr(ReportService, "_generate_pdf_db", staticmethod(lambda data, config_file=None: seen.append(current_deadline())))
+    return seen
+
+
+def test_interactive_report_has_default_budget(budget_seen):
+    ReportService.generate_pdf_db({})
+    assert budget_seen[0] is not None
+
+
+def test_scheduled_report_without_budget(budget_seen):
+    ReportService.generate_pdf_db({}, deadline_seconds=0)
+    ReportService.generate_pdf_db({}, deadline_seconds=None)
+    assert budget_seen == [None, None]
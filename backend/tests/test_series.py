@@ -0,0 +1,13 @@
+# tests/test_series.py
+import numpy as np
+
+from app.zabbix.series import BucketAggregator
+
+
+def test_feed_drops_points_outside_window():
+    agg = BucketAggregator(1000, 1999, 10)  # buckets de 100s
+    clock = np.array([-5000, 1000, 1050, 1999, 9000], dtype=np.int64)
+    agg.feed(clock, np.array([99.0, 1.0, 3.0, 5.0, 99.0]))
+    assert agg.count.sum() == 3
+    assert agg.count[0] == 2 and agg.max[0] == 3.0
+    assert agg.max.max() == 5.0
@@ -0,0 +1,45 @@
+# tests/test_topology.py
+import threading
+
+import app.zabbix.topology as topology
+from app.zabbix.topology import TopologyIndex
+
+ROWS = [
+    (1, "Linux", 10, "srv-a", 100, "CPU", "7,8", "g7,g8", "50", "t50"),
+    (1, "Linux", 10, "srv-a", 101, "Mem", "8", "g8", "50,51", "t50,t51"),
+    (2, "Web", 10, "srv-a", 100, "CPU", "7,8", "g7,g8", "50", "t50"),
+]
+
+
+def test_reverse_maps():
+    index = TopologyIndex("default", ROWS)
+    assert index.graph_items == {7: [100], 8: [100, 101]}
+    assert index.items_for_trigger(50) == [100, 101]
+    assert index.items_for_trigger(51) == [101]
+    assert index.items_for_trigger(99) == []
+    assert index.item_host[101] == 10
+    assert index.stats()["triggers"] == 2
+
+
+def test_first_build_does_not_hold_global_lock(monkeypatch):
+    building, release = threading.Event(), threading.Event()
+
+    def slow_build(source):
+        building.set()
+        release.wait(5)
+        return TopologyIndex(source, ROWS)
+
+    monkeypatch.setattr(topology, "build_index", slow_build)
+    monkeypatch.setattr(topology, "_start_refresher", lambda source: None)
+    monkeypatch.setattr(topology, "_indexes", {})
+    monkeypatch.setattr(topology, "_build_locks", {})
+    worker = threading.Thread(target=topology.get_topology, args=("default",))
+    worker.start()
+    try:
+        assert building.wait(5)
+        assert topology._lock.acquire(timeout=1)  # montagem em andamento não segura o lock global
+        topology._lock.release()
+    finally:
+        release.set()
+        worker.join(5)
+    assert topology.get_topology("default").items_for_trigger(51) == [101]